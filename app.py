@@ -1,15 +1,21 @@
 # app_enhanced.py - WITH DEPTH-CONTROLLED FOLDER SELECTION
 import streamlit as st
+import hashlib
 import os
-import zipfile
-import mimetypes
-import chardet
-from pathlib import Path
+import secrets
+import shutil
 from datetime import datetime
-import time
-from typing import Dict, List, Tuple, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import tempfile
-import pandas as pd
+import threading
+import urllib.parse
+from typing import Dict, List, Optional, Set, Tuple
+
+from code_aggregator import (
+    COMPLETE_EXTENSIONS, COMPRESSION_SUFFIXES, DEFAULT_EXCLUDED_DIRS, EXPORT_MIME_TYPES,
+    EXTENSION_CATEGORIES, LARGE_FILE_BYTES, AggregationJob, CodeAggregator, ExportCheckpoint,
+    SnapshotRegistry, available_compressions, open_export_reader,
+)
 
 # Set page config
 st.set_page_config(
@@ -107,28 +113,6 @@ st.markdown("""
         font-size: 0.8rem;
     }
     
-    .folder-checkbox-container {
-        max-height: 400px;
-        overflow-y: auto;
-        padding: 10px;
-        border: 1px solid #E0E0E0;
-        border-radius: 5px;
-        margin: 10px 0;
-    }
-    
-    .folder-item {
-        padding: 2px 0;
-        font-family: 'Consolas', monospace;
-        font-size: 0.9rem;
-    }
-    
-    .folder-indent-0 { margin-left: 0px; }
-    .folder-indent-1 { margin-left: 20px; }
-    .folder-indent-2 { margin-left: 40px; }
-    .folder-indent-3 { margin-left: 60px; }
-    .folder-indent-4 { margin-left: 80px; }
-    .folder-indent-5 { margin-left: 100px; }
-    
     .depth-control {
         background-color: #f0f2f6;
         padding: 10px;
@@ -144,488 +128,603 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# COMPLETE LIST OF FILE EXTENSIONS (Enhanced)
-COMPLETE_EXTENSIONS = {
-    # Programming Languages
-    '.py': 'Python', '.pyw': 'Python Window', '.pyx': 'Cython', '.pyi': 'Python Stub',
-    '.js': 'JavaScript', '.jsx': 'React JSX', '.ts': 'TypeScript', '.tsx': 'React TSX',
-    '.java': 'Java', '.class': 'Java Class', '.jar': 'Java Archive',
-    '.cpp': 'C++', '.cxx': 'C++', '.cc': 'C++', '.c': 'C', '.h': 'C Header',
-    '.hpp': 'C++ Header', '.hxx': 'C++ Header', '.cs': 'C#', '.vb': 'VB.NET',
-    '.fs': 'F#', '.fsx': 'F# Script', '.go': 'Go', '.rs': 'Rust', '.rb': 'Ruby',
-    '.rbw': 'Ruby Window', '.rake': 'Ruby Rake', '.php': 'PHP', '.php3': 'PHP',
-    '.php4': 'PHP', '.php5': 'PHP', '.phtml': 'PHP HTML', '.pl': 'Perl',
-    '.pm': 'Perl Module', '.t': 'Perl Test', '.pod': 'Perl POD', '.swift': 'Swift',
-    '.kt': 'Kotlin', '.kts': 'Kotlin Script', '.scala': 'Scala', '.sc': 'Scala Script',
-    '.groovy': 'Groovy', '.gvy': 'Groovy', '.gy': 'Groovy', '.gsh': 'Groovy Shell',
-    '.clj': 'Clojure', '.cljs': 'ClojureScript', '.cljc': 'Clojure Common',
-    '.lua': 'Lua', '.r': 'R', '.R': 'R', '.rdata': 'R Data', '.rds': 'R Data',
-    '.m': 'Objective-C/Matlab', '.mm': 'Objective-C++', '.f': 'Fortran',
-    '.f90': 'Fortran 90', '.f95': 'Fortran 95', '.f03': 'Fortran 2003',
-    '.pas': 'Pascal', '.pp': 'Pascal', '.d': 'D', '.dart': 'Dart',
-    '.elm': 'Elm', '.erl': 'Erlang', '.hrl': 'Erlang Header', '.ex': 'Elixir',
-    '.exs': 'Elixir Script', '.hs': 'Haskell', '.lhs': 'Literate Haskell',
-    '.ml': 'OCaml', '.mli': 'OCaml Interface', '.fsi': 'F# Signature',
-    '.fsx': 'F# Script', '.v': 'Verilog', '.vh': 'Verilog Header',
-    '.sv': 'SystemVerilog', '.svh': 'SystemVerilog Header', '.vhd': 'VHDL',
+class ExportFileServer:
+    """Side HTTP endpoint that streams exports too large for Streamlit's static serving.
     
-    # Web Technologies
-    '.html': 'HTML', '.htm': 'HTML', '.xhtml': 'XHTML', '.html5': 'HTML5',
-    '.css': 'CSS', '.scss': 'SASS', '.sass': 'SASS', '.less': 'LESS',
-    '.styl': 'Stylus', '.vue': 'Vue.js', '.svelte': 'Svelte', '.astro': 'Astro',
-    '.php': 'PHP', '.asp': 'ASP', '.aspx': 'ASP.NET', '.jsp': 'JavaServer Pages',
-    '.jspx': 'JavaServer Pages XML', '.wasm': 'WebAssembly',
+    Files are registered under an unguessable token (one per file) and served from disk
+    in fixed-size chunks. The server binds to CODE_AGGREGATOR_DOWNLOAD_HOST (default
+    127.0.0.1) on CODE_AGGREGATOR_DOWNLOAD_PORT (default: any free port) when the first
+    file is registered. Browsers on other machines can only use it when
+    CODE_AGGREGATOR_DOWNLOAD_URL gives the address it is reachable at (e.g. a forwarded port).
+    """
     
-    # Configuration Files
-    '.json': 'JSON', '.jsonc': 'JSON with Comments', '.json5': 'JSON5',
-    '.jsonld': 'JSON-LD', '.xml': 'XML', '.xml.dist': 'XML Distribution',
-    '.xsl': 'XSLT', '.xslt': 'XSLT', '.xsd': 'XML Schema', '.dtd': 'DTD',
-    '.yaml': 'YAML', '.yml': 'YAML', '.yaml.dist': 'YAML Distribution',
-    '.toml': 'TOML', '.ini': 'INI', '.cfg': 'Config', '.conf': 'Config',
-    '.properties': 'Properties', '.env': 'Environment', '.env.example': 'Env Example',
-    '.editorconfig': 'Editor Config', '.prettierrc': 'Prettier', '.eslintrc': 'ESLint',
-    '.babelrc': 'Babel', '.npmrc': 'NPM', '.yarnrc': 'Yarn', '.pnp.cjs': 'Plug n Play',
+    CHUNK_SIZE = 1024 * 1024
     
-    # Shell Scripts
-    '.sh': 'Shell', '.bash': 'Bash', '.zsh': 'Zsh', '.fish': 'Fish',
-    '.ps1': 'PowerShell', '.psm1': 'PowerShell Module', '.psd1': 'PowerShell Data',
-    '.ps1xml': 'PowerShell XML', '.bat': 'Batch', '.cmd': 'Command',
-    '.vbs': 'VBScript', '.vbe': 'VBScript Encoded', '.wsf': 'Windows Script',
-    '.wsh': 'Windows Script Host', '.awk': 'AWK', '.sed': 'SED',
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, public_url: Optional[str] = None):
+        self.host = host or os.environ.get('CODE_AGGREGATOR_DOWNLOAD_HOST', '127.0.0.1')
+        self.port = port if port is not None else int(os.environ.get('CODE_AGGREGATOR_DOWNLOAD_PORT', '0'))
+        self.public_url = (public_url or os.environ.get('CODE_AGGREGATOR_DOWNLOAD_URL', '')).rstrip('/') or None
+        self._files: Dict[str, Tuple[str, str, str]] = {}  # token -> (path, file name, mime)
+        self._tokens: Dict[str, str] = {}  # path -> token
+        self._httpd = None
+        self._lock = threading.Lock()
     
-    # Database
-    '.sql': 'SQL', '.psql': 'PostgreSQL', '.ddl': 'DDL', '.dml': 'DML',
-    '.sqlite': 'SQLite', '.db': 'Database', '.sqlitedb': 'SQLite DB',
-    '.mdb': 'Access DB', '.frm': 'MySQL Format', '.myi': 'MySQL Index',
-    '.myd': 'MySQL Data', '.ibd': 'InnoDB Data',
+    def _start(self) -> None:
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._serve(self)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
     
-    # Documentation
-    '.md': 'Markdown', '.markdown': 'Markdown', '.mdown': 'Markdown',
-    '.mdwn': 'Markdown', '.mkd': 'Markdown', '.mkdn': 'Markdown',
-    '.rst': 'reStructuredText', '.tex': 'LaTeX', '.ltx': 'LaTeX',
-    '.aux': 'LaTeX Aux', '.bib': 'BibTeX', '.txt': 'Text', '.rtf': 'Rich Text',
-    '.doc': 'Word', '.docx': 'Word', '.odt': 'OpenDocument Text',
+    def reachable_from(self, browser_host: Optional[str]) -> bool:
+        """Whether a browser that reached Streamlit at browser_host can download from this server."""
+        return self.public_url is not None or _hostname(browser_host) in LOOPBACK_HOSTS
     
-    # Build & Package Managers
-    '.dockerfile': 'Dockerfile', 'Dockerfile': 'Dockerfile',
-    '.makefile': 'Makefile', 'Makefile': 'Makefile', 'makefile': 'Makefile',
-    '.gradle': 'Gradle', '.gradle.kts': 'Gradle Kotlin', '.pom': 'Maven POM',
-    '.xml': 'Maven POM', '.cmake': 'CMake', '.bazel': 'Bazel', '.bzl': 'Bazel',
-    '.bazelrc': 'Bazel Config', '.buckconfig': 'Buck Config',
+    def register(self, path: str, file_name: str, mime: str, browser_host: Optional[str]) -> str:
+        """Expose a file for download and return its URL (the same token on every rerun)."""
+        with self._lock:
+            if self._httpd is None:
+                self._start()
+            token = self._tokens.get(path)
+            if token is None:
+                token = self._tokens[path] = secrets.token_urlsafe(16)
+            self._files[token] = (path, file_name, mime)
+        base = self.public_url or f"http://{_hostname(browser_host)}:{self.port}"
+        return f"{base}/{token}/{urllib.parse.quote(file_name)}"
     
-    # IDE & Editor
-    '.vscode': 'VS Code', '.code-workspace': 'VS Code Workspace',
-    '.idea': 'IntelliJ IDEA', '.iml': 'IntelliJ Module',
-    '.sln': 'Visual Studio', '.csproj': 'C# Project', '.vcxproj': 'C++ Project',
-    '.fsproj': 'F# Project', '.vbproj': 'VB Project', '.xproj': '.NET Core Project',
+    def release(self, path: str) -> None:
+        """Stop serving a file (its job was dropped)."""
+        with self._lock:
+            token = self._tokens.pop(path, None)
+            if token is not None:
+                self._files.pop(token, None)
     
-    # Data & Serialization
-    '.csv': 'CSV', '.tsv': 'TSV', '.xlsx': 'Excel', '.xls': 'Excel',
-    '.parquet': 'Parquet', '.feather': 'Feather', '.arrow': 'Arrow',
-    '.h5': 'HDF5', '.hdf5': 'HDF5', '.nc': 'NetCDF', '.zarr': 'Zarr',
-    '.avro': 'Avro', '.orc': 'ORC', '.pkl': 'Pickle', '.pickle': 'Pickle',
-    '.joblib': 'Joblib', '.npy': 'NumPy Array', '.npz': 'NumPy Zipped',
+    def _serve(self, request: BaseHTTPRequestHandler) -> None:
+        entry = self._files.get(request.path.lstrip('/').split('/', 1)[0])
+        if entry is None or not os.path.isfile(entry[0]):
+            request.send_error(404)
+            return
+        path, file_name, mime = entry
+        request.send_response(200)
+        request.send_header('Content-Type', mime)
+        request.send_header('Content-Length', str(os.path.getsize(path)))
+        request.send_header('Content-Disposition', f'attachment; filename="{file_name}"')
+        request.end_headers()
+        try:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, request.wfile, self.CHUNK_SIZE)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Browser cancelled the download
+
+LOOPBACK_HOSTS = {'localhost', '127.0.0.1', '::1'}
+
+def _hostname(host_header: Optional[str]) -> str:
+    """'example.com:8501' -> 'example.com', '[::1]:8501' -> '::1'."""
+    host = (host_header or '').strip()
+    if host.startswith('['):
+        return host[1:].partition(']')[0]
+    return host.rpartition(':')[0] if host.count(':') == 1 else host
+
+# Exports up to this size are handed to st.download_button; larger ones are streamed
+INLINE_DOWNLOAD_LIMIT_MB = 50
+
+# With server.enableStaticServing (.streamlit/config.toml), Streamlit serves the app's static/
+# folder at app/static/ from its own origin, so links work wherever the app does (forwarded
+# ports, proxies); it refuses files over 200 MB
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_DOWNLOAD_DIR = os.path.join(STATIC_DIR, 'exports')
+STATIC_DOWNLOAD_LIMIT_MB = 200
+
+@st.cache_resource
+def get_snapshot_registry() -> SnapshotRegistry:
+    """Directory snapshots shared across reruns and sessions."""
+    return SnapshotRegistry()
+
+@st.cache_resource
+def get_export_server() -> ExportFileServer:
+    """One streaming download server per Streamlit process (started on first use)."""
+    return ExportFileServer()
+
+@st.cache_resource
+def get_static_downloads() -> Dict[str, str]:
+    """Export path -> its link under STATIC_DOWNLOAD_DIR; leftovers of earlier processes are removed."""
+    shutil.rmtree(STATIC_DOWNLOAD_DIR, ignore_errors=True)
+    return {}
+
+def stage_static_download(path: str, file_name: str) -> Optional[str]:
+    """Hard-link (or copy) an export into the static folder; return its relative URL, or None."""
+    staged = get_static_downloads()
+    target = staged.get(path)
+    if target is None or not os.path.exists(target):
+        target = os.path.join(STATIC_DOWNLOAD_DIR, secrets.token_urlsafe(16), file_name)
+        try:
+            os.makedirs(os.path.dirname(target))
+            try:
+                os.link(path, target)
+            except OSError:
+                shutil.copyfile(path, target)  # Different filesystem
+        except OSError:
+            return None
+        staged[path] = target
+    # Relative, so it resolves under server.baseUrlPath and behind proxies
+    return 'app/static/' + urllib.parse.quote(os.path.relpath(target, STATIC_DIR).replace(os.sep, '/'))
+
+def release_downloads(paths: List[str]) -> None:
+    """Forget the download links of a dropped job's files."""
+    staged = get_static_downloads()
+    server = get_export_server()
+    for path in paths:
+        target = staged.pop(path, None)
+        if target is not None:
+            shutil.rmtree(os.path.dirname(target), ignore_errors=True)
+        server.release(path)
+
+# Resumable exports keep one checkpoint per source folder, so a restarted app finds it again
+CHECKPOINT_DIR = os.path.join(tempfile.gettempdir(), 'code_aggregator_checkpoints')
+
+def checkpoint_path_for(source_dir: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(source_dir).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CHECKPOINT_DIR, f"{digest}.json")
+
+def checkpoint_in_use(checkpoint_path: str) -> bool:
+    """True while a job of this server is still writing to checkpoint_path (and its export)."""
+    return any(not job.done and job.export_kwargs.get('checkpoint_path') == checkpoint_path
+               for job in list(get_job_registry().values()))
+
+def render_download(label: str, path: str, file_name: str, mime: str) -> None:
+    """Download control for a file on disk that never loads large files into memory.
+    
+    Small files go through st.download_button. Larger ones are linked through Streamlit's
+    static serving, then the side download server when the browser can reach it; failing
+    both, the file's location is shown.
+    """
+    size = os.path.getsize(path)
+    if size <= INLINE_DOWNLOAD_LIMIT_MB * 1024 * 1024:
+        with open(path, 'rb') as f:
+            st.download_button(label=label, data=f.read(), file_name=file_name,
+                               mime=mime, use_container_width=True)
+        return
     
-    # Web Assets
-    '.svg': 'SVG', '.svgz': 'SVG', '.ai': 'Illustrator', '.eps': 'EPS',
-    '.ps': 'PostScript', '.psd': 'Photoshop', '.xcf': 'GIMP',
-    '.sketch': 'Sketch', '.fig': 'Figma',
+    url = None
+    if size <= STATIC_DOWNLOAD_LIMIT_MB * 1024 * 1024 and st.get_option('server.enableStaticServing'):
+        url = stage_static_download(path, file_name)
+    if url is not None:
+        st.link_button(label, url, use_container_width=True)
+        st.caption("📡 Large file: served from disk by Streamlit (save the page if it opens in the browser)")
+        return
     
-    # Fonts
-    '.ttf': 'TrueType', '.otf': 'OpenType', '.woff': 'Web Open Font',
-    '.woff2': 'Web Open Font 2', '.eot': 'Embedded OpenType',
+    server = get_export_server()
+    browser_host = st.context.headers.get('Host')
+    if server.reachable_from(browser_host):
+        st.link_button(label, server.register(path, file_name, mime, browser_host), use_container_width=True)
+        st.caption("📡 Large file: streamed from disk by the download server")
+    else:
+        st.warning(f"**{file_name}** ({format_bytes(size)}) is too large to download through the "
+                   "browser here; copy it from the server:")
+        st.code(path, language=None)
+
+# The folder list and tree preview are memoized across reruns and sessions. Keys include
+# the snapshot's change token, so edits on disk (or an explicit refresh) give new entries.
+# Errors go to st.error, which Streamlit records and replays when an entry is reused
+@st.cache_data(max_entries=32, show_spinner=False)
+def cached_folders(directory: str, max_depth: int, change_token: str) -> List[Dict]:
+    return CodeAggregator(snapshots=get_snapshot_registry(), error_callback=st.error).get_folders(
+        directory, max_depth=max_depth)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_file_tree(directory: str, max_depth: int, max_files_per_dir: int,
+                     excluded_folders: Tuple[str, ...], folder_depth: int, change_token: str) -> str:
+    return CodeAggregator(snapshots=get_snapshot_registry(), error_callback=st.error).get_file_tree(
+        directory, max_depth=max_depth, max_files_per_dir=max_files_per_dir,
+        excluded_folders=list(excluded_folders), folder_depth=folder_depth
+    )
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def cached_child_folders(directory: str, rel_dir: str, change_token: str) -> List[Dict]:
+    return CodeAggregator(snapshots=get_snapshot_registry(), error_callback=st.error).get_child_folders(
+        directory, rel_dir)
+
+# Folder selector rows rendered per page; huge trees are paged instead of drawn in full
+FOLDERS_PER_PAGE = 50
+
+def visible_folder_rows(directory: str, change_token: str, expanded: Set[str], max_depth: int) -> List[Dict]:
+    """Top-level folders plus the children of expanded ones, in tree order.
     
-    # Executables & Libraries
-    '.exe': 'Executable', '.dll': 'Dynamic Library', '.so': 'Shared Object',
-    '.dylib': 'Dynamic Library', '.lib': 'Static Library', '.a': 'Static Archive',
-    '.o': 'Object File', '.obj': 'Object File', '.class': 'Java Class',
+    Children are listed only when their parent is expanded, so collapsed subtrees cost nothing.
+    """
+    rows = []
+    stack = list(reversed(cached_child_folders(directory, '', change_token)))
+    while stack:
+        folder = stack.pop()
+        rows.append(folder)
+        if folder['rel_path'] in expanded and folder['level'] < max_depth:
+            stack.extend(reversed(cached_child_folders(directory, folder['rel_path'], change_token)))
+    return rows
+
+def toggle_excluded_folder(rel_path: str):
+    if st.session_state[f"exclude::{rel_path}"]:
+        st.session_state.excluded_folders.add(rel_path)
+    else:
+        st.session_state.excluded_folders.discard(rel_path)
+
+def toggle_expanded_folder(rel_path: str):
+    st.session_state.expanded_folders ^= {rel_path}
+
+def set_excluded_folders(rel_paths: Set[str]):
+    st.session_state.excluded_folders = set(rel_paths)
+    # Forget checkbox states so the rows redraw from the new selection
+    for key in [key for key in st.session_state if str(key).startswith("exclude::")]:
+        del st.session_state[key]
+
+# Finished jobs kept for reattaching; older ones are dropped as new jobs start
+MAX_KEPT_JOBS = 20
+
+@st.cache_resource
+def get_job_registry() -> Dict[str, AggregationJob]:
+    """Background aggregation jobs by id, shared by all sessions of this server."""
+    return {}
+
+def start_job(job: AggregationJob) -> None:
+    """Start a job, register it and put its id in the URL so a refresh can reattach."""
+    jobs = get_job_registry()
+    finished = [job_id for job_id, known in jobs.items() if known.done]
+    for job_id in finished[:max(0, len(jobs) + 1 - MAX_KEPT_JOBS)]:
+        release_downloads(job_output_paths(jobs.pop(job_id)))
+    jobs[job.id] = job.start()
+    st.query_params["job"] = job.id
+
+def job_output_paths(job: AggregationJob) -> List[str]:
+    """Every file a job offers for download: export or manifest and shards, and ZIP."""
+    paths = [job.meta.get('output_path')]
+    if job.result is not None:
+        paths.append(job.result[1])
+        paths.extend(shard['path'] for shard in job.result[2].get('shards', []))
+    if job.zip_result is not None:
+        paths.append(job.zip_result[1])
+    return [path for path in paths if path]
+
+def current_job() -> Optional[AggregationJob]:
+    return get_job_registry().get(st.query_params.get("job"))
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.1f} {unit}" if unit != "B" else f"{size:,.0f} B"
+        size /= 1024
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "–"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+@st.fragment(run_every=1.0)
+def render_job_progress(job: AggregationJob) -> None:
+    """Live progress for a running job; polls once a second without rerunning the page."""
+    if job.done:
+        st.rerun()  # full rerun so the results replace the progress view
     
-    # Archives
-    '.zip': 'ZIP Archive', '.tar': 'TAR Archive', '.gz': 'GZIP Archive',
-    '.tgz': 'GZIP TAR', '.bz2': 'BZIP2 Archive', '.xz': 'XZ Archive',
-    '.rar': 'RAR Archive', '.7z': '7-Zip Archive', '.zst': 'Zstandard',
+    progress = job.progress
+    if not progress:
+        st.progress(0.0, text="Scanning directory...")
+    else:
+        if progress['bytes_total']:
+            fraction = min(progress['bytes_done'] / progress['bytes_total'], 1.0)
+        else:
+            fraction = 1.0 if progress['files_done'] else 0.0
+        st.progress(fraction, text=f"{progress['files_done']:,} / {progress['files_total']:,} files")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("📄 Files", f"{progress['files_done']:,}")
+        with col2:
+            st.metric("💾 Data", f"{format_bytes(progress['bytes_done'])} / {format_bytes(progress['bytes_total'])}")
+        with col3:
+            st.metric("⚡ Throughput", f"{format_bytes(progress['bytes_per_sec'])}/s")
+        with col4:
+            st.metric("⏳ ETA", format_duration(progress['eta']))
     
-    # Version Control
-    '.gitignore': 'Git Ignore', '.gitattributes': 'Git Attributes',
-    '.gitmodules': 'Git Modules', '.gitkeep': 'Git Keep',
-    '.svn': 'SVN', '.hgignore': 'Mercurial Ignore', '.hg': 'Mercurial',
+    if st.button("⏹️ Cancel", key=f"cancel_{job.id}"):
+        job.cancel()
+
+# Shards offered as individual downloads; the rest are listed by location
+MAX_SHARD_DOWNLOADS = 20
+
+def render_job_result(job: AggregationJob) -> None:
+    """Show the outcome of a finished job: metrics, downloads and file information."""
+    success, result, stats = job.result
+    meta = job.meta
+    if job.status == 'cancelled':
+        st.warning("⏹️ Aggregation cancelled.")
+        return
+    if not success:
+        st.error(f"❌ Error: {result}")
+        return
     
-    # CI/CD
-    '.travis.yml': 'Travis CI', '.circleci': 'CircleCI', '.gitlab-ci.yml': 'GitLab CI',
-    '.jenkinsfile': 'Jenkins', '.drone.yml': 'Drone CI', '.github': 'GitHub Actions',
-    '.azure-pipelines.yml': 'Azure Pipelines', '.codefresh.yml': 'Codefresh',
+    # Store in session state
+    st.session_state.processed_data = result
+    shards = stats.get('shards')
+    # Sharded runs return the manifest; the first shard stands in for the export in Preview
+    st.session_state.output_path = shards[0]['path'] if shards else meta['output_path']
+    st.session_state.stats = stats
     
-    # Logs & Outputs
-    '.log': 'Log', '.out': 'Output', '.err': 'Error', '.debug': 'Debug',
-    '.trace': 'Trace', '.dump': 'Dump',
+    # Success display, celebrated once per job
+    if st.session_state.get('celebrated_job') != job.id:
+        st.session_state.celebrated_job = job.id
+        st.balloons()
     
-    # Temporary
-    '.tmp': 'Temporary', '.temp': 'Temporary', '.bak': 'Backup',
-    '.backup': 'Backup', '.old': 'Old', '.orig': 'Original',
+    st.markdown('<div class="success-msg">', unsafe_allow_html=True)
+    st.success("✅ Processing completed successfully!")
+    st.markdown('</div>', unsafe_allow_html=True)
+    if stats.get('resumed_files'):
+        st.info(f"⏯️ Resumed: {stats['resumed_files']:,} files were already exported before the interruption")
     
-    # Misc
-    '.lock': 'Lock', '.pid': 'PID', '.socket': 'Socket',
-    '.key': 'Key', '.pem': 'PEM', '.crt': 'Certificate', '.csr': 'CSR',
-}
-
-class CodeAggregator:
-    def __init__(self):
-        self.stats = {
-            'total_files': 0,
-            'total_lines': 0,
-            'total_bytes': 0,
-            'files_by_type': {},
-            'processing_time': 0,
-            'ignored_files': 0,
-            'errors': 0,
-            'binary_files': 0,
-            'large_files': 0
-        }
-        self.processed_files = []
+    # Statistics cards
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("📄 Files Processed", stats['total_files'])
+    with col2:
+        st.metric("📏 Total Lines", f"{stats['total_lines']:,}")
+    with col3:
+        st.metric("⏱️ Processing Time", f"{stats['processing_time']:.2f}s")
+    with col4:
+        st.metric("📊 File Types", len(stats['files_by_type']))
     
-    def detect_encoding(self, file_path: str) -> str:
-        """Detect file encoding using chardet."""
-        try:
-            with open(file_path, 'rb') as f:
-                raw_data = f.read(min(10000, os.path.getsize(file_path)))  # Read up to 10KB
-                if not raw_data:
-                    return 'utf-8'
-                result = chardet.detect(raw_data)
-                return result.get('encoding', 'utf-8') or 'utf-8'
-        except Exception as e:
-            return 'utf-8'
+    # Additional stats
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("⚠️ Errors", stats['errors'])
+    with col2:
+        st.metric("💾 Binary Skipped", stats['binary_files'])
+    with col3:
+        st.metric("📦 Large Skipped", stats['large_files'])
     
-    def is_binary(self, file_path: str) -> bool:
-        """Check if file is binary by reading first chunk."""
-        try:
-            with open(file_path, 'rb') as f:
-                chunk = f.read(1024)
-                return b'\0' in chunk  # Binary files typically contain null bytes
-        except:
-            return True
+    # Download section
+    st.subheader("📥 Download Results")
     
-    def get_folders(self, directory: str, max_depth: int = None) -> List[Dict]:
-        """Get all folders recursively with their paths and levels, limited by max_depth."""
-        folders = []
-        try:
-            for root, dirs, files in os.walk(directory):
-                # Skip hidden directories
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                
-                level = root.replace(directory, '').count(os.sep)
-                
-                # Skip if beyond max depth
-                if max_depth is not None and level > max_depth:
-                    dirs[:] = []  # Don't traverse deeper
-                    continue
-                
-                rel_path = os.path.relpath(root, directory)
-                if rel_path == '.':
-                    continue
-                    
-                folders.append({
-                    'path': root,
-                    'name': os.path.basename(root),
-                    'rel_path': rel_path,
-                    'level': level
-                })
-        except Exception as e:
-            st.error(f"Error reading folders: {str(e)}")
+    try:
+        # Download buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            if shards:
+                render_download("⬇️ Download Manifest", result, os.path.basename(result), "application/json")
+            else:
+                render_download(meta['download_label'], meta['output_path'], meta['output_filename'], meta['mime'])
         
-        return sorted(folders, key=lambda x: x['rel_path'])
+        with col2:
+            # ZIP is built by the job when requested
+            if job.zip_result is not None:
+                zip_success, zip_path, zip_count = job.zip_result
+                if zip_success and zip_count > 0:
+                    render_download(
+                        f"📦 Download ZIP ({zip_count} files)",
+                        zip_path, meta['zip_filename'], "application/zip"
+                    )
+                elif not zip_success:
+                    st.error(f"ZIP creation failed: {zip_path}")
     
-    def get_file_tree(self, directory: str, max_depth: int = 3, max_files_per_dir: int = 10, 
-                      excluded_folders: List[str] = None, folder_depth: int = None) -> str:
-        """Generate ASCII file tree structure with excluded folders and depth control."""
-        tree = []
-        if excluded_folders is None:
-            excluded_folders = []
-            
-        try:
-            for root, dirs, files in os.walk(directory):
-                # Skip hidden directories
-                dirs[:] = [d for d in dirs if not d.startswith('.')]
-                
-                level = root.replace(directory, '').count(os.sep)
-                
-                # Apply depth limit for tree display
-                if max_depth is not None and level > max_depth:
-                    dirs[:] = []  # Don't traverse deeper
-                    continue
-                
-                # Check if current directory should be excluded
-                rel_path = os.path.relpath(root, directory)
-                if rel_path != '.' and any(rel_path.startswith(excluded) for excluded in excluded_folders):
-                    continue
-                
-                # Filter out excluded subdirectories
-                dirs[:] = [d for d in dirs if not any(
-                    os.path.join(rel_path, d).startswith(excluded) 
-                    for excluded in excluded_folders
-                )]
-                
-                indent = ' ' * 2 * level
-                dir_name = os.path.basename(root)
-                if level == 0:
-                    dir_name = os.path.basename(directory) or directory
-                tree.append(f"{indent}📁 {dir_name}/")
-                
-                subindent = ' ' * 2 * (level + 1)
-                # Sort files by extension
-                files.sort()
-                shown_files = 0
-                for file in files:
-                    if shown_files >= max_files_per_dir:
-                        break
-                    # Skip hidden files
-                    if file.startswith('.'):
-                        continue
-                    ext = os.path.splitext(file)[1]
-                    icon = "📄" if ext in COMPLETE_EXTENSIONS else "📎"
-                    tree.append(f"{subindent}{icon} {file}")
-                    shown_files += 1
-                
-                if len(files) > max_files_per_dir:
-                    tree.append(f"{subindent}... and {len(files) - max_files_per_dir} more files")
-        except Exception as e:
-            tree.append(f"Error reading directory: {str(e)}")
+        if shards:
+            with st.expander(f"🧩 Shards ({len(shards)})", expanded=True):
+                for shard in shards[:MAX_SHARD_DOWNLOADS]:
+                    st.caption(f"Shard {shard['index']}: {shard['file_count']:,} files, "
+                               f"{shard['tokens']:,} tokens, {format_bytes(shard['bytes'])}")
+                    render_download(f"⬇️ {os.path.basename(shard['path'])}", shard['path'],
+                                    os.path.basename(shard['path']), meta['mime'])
+                if len(shards) > MAX_SHARD_DOWNLOADS:
+                    st.info(f"... and {len(shards) - MAX_SHARD_DOWNLOADS} more shards next to the manifest in "
+                            f"`{os.path.dirname(result)}`")
         
-        return '\n'.join(tree)
+        # File info
+        with st.expander("📋 File Information", expanded=True):
+            st.info(f"**Location:** `{result}`")
+            if shards:
+                st.info(f"**Size:** {sum(os.path.getsize(shard['path']) for shard in shards):,} bytes "
+                        f"in {len(shards)} shards")
+            else:
+                st.info(f"**Size:** {os.path.getsize(meta['output_path']):,} bytes")
+            
+            # Show excluded folders
+            exclude_list = meta['exclude_list']
+            if exclude_list:
+                st.info(f"**Excluded Folders:** {', '.join(exclude_list[:10])}")
+                if len(exclude_list) > 10:
+                    st.info(f"... and {len(exclude_list) - 10} more")
+            
+            # File type distribution
+            if stats['files_by_type']:
+                st.subheader("📊 File Type Distribution")
+                for file_type, count in sorted(stats['files_by_type'].items(), key=lambda x: x[1], reverse=True)[:15]:
+                    percentage = (count / stats['total_files']) * 100
+                    st.write(f"• {file_type}: {count} files ({percentage:.1f}%)")
+    
+    except Exception as e:
+        st.error(f"Error reading output file: {str(e)}")
+
+def render_statistics_tab() -> None:
+    """Render the Statistics tab; pandas is imported here so other runs never load it."""
+    import pandas as pd
     
-    def should_ignore_file(self, filename: str, gitignore_patterns: List[str]) -> bool:
-        """Check if file should be ignored based on gitignore patterns."""
-        for pattern in gitignore_patterns:
-            if pattern in filename or (pattern.endswith('/') and pattern[:-1] in filename):
-                return True
-        return False
+    st.subheader("📊 Statistics Dashboard")
     
-    def traverse_and_write_code(self, source_dir: str, output_file: str, 
-                               include_ext: List[str] = None,
-                               exclude_ext: List[str] = None,
-                               exclude_dirs: List[str] = None,
-                               include_line_numbers: bool = False,
-                               respect_gitignore: bool = False,
-                               max_file_size_mb: int = 5,
-                               include_hidden: bool = False) -> Tuple[bool, str, Dict]:
-        """Enhanced version with exact paths and all features."""
+    if st.session_state.stats:
+        stats = st.session_state.stats
         
-        # Reset stats
-        self.stats = {
-            'total_files': 0,
-            'total_lines': 0,
-            'total_bytes': 0,
-            'files_by_type': {},
-            'processing_time': 0,
-            'ignored_files': 0,
-            'errors': 0,
-            'binary_files': 0,
-            'large_files': 0
-        }
-        self.processed_files = []
+        # Overview metrics
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("📄 Total Files", stats['total_files'])
+        with col2:
+            st.metric("📏 Lines of Code", f"{stats['total_lines']:,}")
+        with col3:
+            st.metric("💾 Total Size", f"{stats['total_bytes'] / 1024:.2f} KB")
+        with col4:
+            st.metric("⏱️ Processing Time", f"{stats['processing_time']:.2f}s")
         
-        start_time = time.time()
+        # Processing details
+        st.subheader("⚙️ Processing Details")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("⚠️ Errors", stats['errors'])
+        with col2:
+            st.metric("💾 Binary Files Skipped", stats['binary_files'])
+        with col3:
+            st.metric("📦 Large Files Skipped", stats['large_files'])
         
-        # Default values
-        if include_ext is None:
-            include_ext = list(COMPLETE_EXTENSIONS.keys())
-        if exclude_ext is None:
-            exclude_ext = []
-        if exclude_dirs is None:
-            exclude_dirs = ['.git', '__pycache__', 'node_modules', '.venv', 'venv', 
-                           'env', 'dist', 'build', '.idea', '.vscode', '.DS_Store']
+        # Encoding detection paths
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("⚡ UTF-8 Fast Path", stats['encoding_fast_path'])
+        with col2:
+            st.metric("🧠 Learned Encoding", stats['encoding_learned'])
+        with col3:
+            st.metric("🔍 chardet Fallback", stats['encoding_chardet'])
         
-        # Convert to sets for faster lookup
-        include_ext_set = set(include_ext)
-        exclude_ext_set = set(exclude_ext)
+        # Persistent cache
+        if stats['cache_hits'] or stats['cache_misses']:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("♻️ Cache Hit Rate", f"{stats['cache_hit_rate']:.1%}")
+            with col2:
+                st.metric("✅ Cache Hits", stats['cache_hits'])
+            with col3:
+                st.metric("🔄 Cache Misses", stats['cache_misses'])
         
-        # Read .gitignore if requested
-        gitignore_patterns = []
-        if respect_gitignore:
-            gitignore_path = os.path.join(source_dir, '.gitignore')
-            if os.path.exists(gitignore_path):
-                try:
-                    with open(gitignore_path, 'r', encoding='utf-8') as f:
-                        gitignore_patterns = [line.strip() for line in f 
-                                            if line.strip() and not line.startswith('#')]
-                except:
-                    pass
+        # Content deduplication
+        if stats.get('duplicate_files'):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("👯 Duplicate Files", stats['duplicate_files'])
+            with col2:
+                st.metric("✂️ Bytes Saved", format_bytes(stats['duplicate_bytes_saved']))
+            with col3:
+                unique = stats['total_files'] - stats['duplicate_files']
+                st.metric("🧬 Unique Files", unique)
         
-        try:
-            # Ensure output directory exists
-            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        # Stage timings (runs with "Record stage timings")
+        timings = stats.get('timings')
+        if timings:
+            st.subheader("⏱️ Stage Timings")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("📄 Files per Second", f"{timings['files_per_sec']:,.0f}")
+            with col2:
+                st.metric("⚡ Throughput", f"{format_bytes(timings['bytes_per_sec'])}/s")
+            with col3:
+                slowest = timings['slowest_files'][0]['seconds'] * 1000 if timings['slowest_files'] else 0
+                st.metric("🐢 Slowest File", f"{slowest:.1f} ms")
             
-            with open(output_file, 'w', encoding='utf-8') as txt_file:
-                # Write header
-                txt_file.write(f"Code Aggregator Export\n")
-                txt_file.write(f"=" * 100 + "\n")
-                txt_file.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                txt_file.write(f"Source Directory: {os.path.abspath(source_dir)}\n")
-                txt_file.write(f"Total Files Found: {sum(1 for _ in Path(source_dir).rglob('*') if _.is_file())}\n")
-                txt_file.write("=" * 100 + "\n\n")
-                
-                # Write excluded folders
-                if exclude_dirs:
-                    txt_file.write(f"Excluded Folders:\n")
-                    for folder in exclude_dirs:
-                        txt_file.write(f"  - {folder}\n")
-                    txt_file.write("=" * 100 + "\n\n")
-                
-                # Traverse through all directories and files
-                file_count = 0
-                for root, dirs, files in os.walk(source_dir):
-                    # Check if current directory should be excluded
-                    rel_path = os.path.relpath(root, source_dir)
-                    if rel_path != '.' and any(rel_path.startswith(excluded) for excluded in exclude_dirs):
-                        continue
-                    
-                    # Remove excluded directories from traversal
-                    dirs[:] = [d for d in dirs if not any(
-                        os.path.join(rel_path, d).startswith(excluded) 
-                        for excluded in exclude_dirs
-                    )]
-                    
-                    # Remove hidden directories if not included
-                    if not include_hidden:
-                        dirs[:] = [d for d in dirs if not d.startswith('.')]
-                    
-                    # Sort for consistent output
-                    dirs.sort()
-                    files.sort()
-                    
-                    for file in files:
-                        # Skip hidden files if not included
-                        if not include_hidden and file.startswith('.'):
-                            self.stats['ignored_files'] += 1
-                            continue
-                        
-                        file_path = os.path.join(root, file)
-                        file_ext = os.path.splitext(file)[1].lower()
-                        
-                        # Skip based on gitignore patterns
-                        if respect_gitignore and self.should_ignore_file(file_path, gitignore_patterns):
-                            self.stats['ignored_files'] += 1
-                            continue
-                        
-                        # Check file size first
-                        try:
-                            file_size = os.path.getsize(file_path)
-                            if file_size > max_file_size_mb * 1024 * 1024:
-                                self.stats['large_files'] += 1
-                                continue
-                        except:
-                            self.stats['errors'] += 1
-                            continue
-                        
-                        # Check if it's a text file
-                        if self.is_binary(file_path):
-                            self.stats['binary_files'] += 1
-                            continue
-                        
-                        # Apply extension filters
-                        if include_ext and file_ext not in include_ext_set:
-                            continue
-                        if exclude_ext and file_ext in exclude_ext_set:
-                            continue
-                        
-                        try:
-                            # Get EXACT absolute path
-                            abs_path = os.path.abspath(file_path)
-                            
-                            # Detect encoding
-                            encoding = self.detect_encoding(file_path)
-                            
-                            # Read file content
-                            with open(file_path, 'r', encoding=encoding, errors='ignore') as code_file:
-                                content = code_file.read()
-                            
-                            # Calculate line count
-                            line_count = content.count('\n') + 1 if content else 0
-                            
-                            # Update statistics
-                            self.stats['total_files'] += 1
-                            self.stats['total_lines'] += line_count
-                            self.stats['total_bytes'] += file_size
-                            
-                            # Count by file type
-                            file_type = COMPLETE_EXTENSIONS.get(file_ext, 'Unknown')
-                            self.stats['files_by_type'][file_type] = self.stats['files_by_type'].get(file_type, 0) + 1
-                            
-                            # Store for processed files list
-                            self.processed_files.append({
-                                'path': abs_path,
-                                'type': file_type,
-                                'lines': line_count,
-                                'size': file_size
-                            })
-                            
-                            # Write to output file with EXACT path
-                            txt_file.write(f"// FILE: {abs_path}\n")
-                            txt_file.write(f"// RELATIVE: {rel_path}\n")
-                            txt_file.write(f"// TYPE: {file_type} | SIZE: {file_size:,} bytes | LINES: {line_count:,}\n")
-                            txt_file.write("=" * 100 + "\n\n")
-                            
-                            # Add line numbers if requested
-                            if include_line_numbers:
-                                lines = content.split('\n')
-                                numbered_content = '\n'.join(f"{i+1:4d} | {line}" for i, line in enumerate(lines))
-                                txt_file.write(numbered_content)
-                            else:
-                                txt_file.write(content)
-                            
-                            txt_file.write("\n\n" + "=" * 100 + "\n\n")
-                            
-                            file_count += 1
-                            
-                            # Update progress every 10 files
-                            if file_count % 10 == 0:
-                                st.session_state['progress'] = file_count
-                            
-                        except Exception as e:
-                            error_msg = f"// Error reading {file_path}: {str(e)[:200]}\n"
-                            txt_file.write(error_msg)
-                            txt_file.write("=" * 100 + "\n\n")
-                            self.stats['errors'] += 1
-                            continue
+            stage_df = pd.DataFrame({
+                'Stage': [s['stage'] for s in timings['stages']],
+                'Where': [s['where'] for s in timings['stages']],
+                'Seconds': [round(s['seconds'], 4) for s in timings['stages']],
+                'Calls': [s['calls'] for s in timings['stages']],
+                'ms per Call': [round(s['seconds'] * 1000 / s['calls'], 3) if s['calls'] else 0.0
+                                for s in timings['stages']],
+                '% of Wall Time': [round(100 * s['seconds'] / timings['wall_time'], 1) if timings['wall_time'] else 0.0
+                                   for s in timings['stages']],
+            })
+            st.bar_chart(stage_df.set_index('Stage')['Seconds'])
+            st.caption("Writer stages run one after another; worker stages run in parallel and are "
+                       "summed over all workers, so they can add up to more than the wall time.")
+            with st.expander("📋 Stage Details"):
+                st.dataframe(stage_df, use_container_width=True)
+            if timings['slowest_files']:
+                with st.expander("🐢 Slowest Files"):
+                    st.dataframe(pd.DataFrame({
+                        'File': [f['path'] for f in timings['slowest_files']],
+                        'Size': [format_bytes(f['size']) for f in timings['slowest_files']],
+                        'ms': [round(f['seconds'] * 1000, 2) for f in timings['slowest_files']],
+                        'Slowest Stage': [max(f['stages'], key=f['stages'].get) if f['stages'] else ''
+                                          for f in timings['slowest_files']],
+                    }), use_container_width=True)
+            st.caption(f"Saved as JSON: `{stats['timings_path']}`")
+        
+        # File type distribution
+        if stats['files_by_type']:
+            st.subheader("📊 File Type Distribution")
             
-            self.stats['processing_time'] = time.time() - start_time
-            return True, output_file, self.stats
+            # Create DataFrame for visualization
+            df = pd.DataFrame({
+                'File Type': list(stats['files_by_type'].keys()),
+                'Count': list(stats['files_by_type'].values())
+            }).sort_values('Count', ascending=False)
             
-        except Exception as e:
-            return False, str(e), self.stats
-    
-    def create_zip_archive(self, source_dir: str, output_zip: str, 
-                          include_ext: List[str] = None,
-                          exclude_dirs: List[str] = None) -> Tuple[bool, str, int]:
-        """Create ZIP archive of all code files."""
-        file_count = 0
-        try:
-            with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(source_dir):
-                    # Check if current directory should be excluded
-                    rel_path = os.path.relpath(root, source_dir)
-                    if rel_path != '.' and exclude_dirs and any(rel_path.startswith(excluded) for excluded in exclude_dirs):
-                        continue
-                    
-                    # Remove excluded directories from traversal
-                    if exclude_dirs:
-                        dirs[:] = [d for d in dirs if not any(
-                            os.path.join(rel_path, d).startswith(excluded) 
-                            for excluded in exclude_dirs
-                        )]
-                    
-                    for file in files:
-                        file_ext = os.path.splitext(file)[1].lower()
-                        if include_ext and file_ext not in include_ext:
-                            continue
-                        
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, source_dir)
-                        zipf.write(file_path, arcname)
-                        file_count += 1
+            # Display as bar chart
+            st.bar_chart(df.set_index('File Type'))
             
-            return True, output_zip, file_count
-        except Exception as e:
-            return False, str(e), file_count
+            # Display as table
+            with st.expander("📋 Detailed Distribution"):
+                st.dataframe(df, use_container_width=True)
+    else:
+        st.info("📌 Process a directory first to see statistics.")
+    
+    # Global statistics
+    st.subheader("🌍 Global Statistics")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Extensions", len(COMPLETE_EXTENSIONS))
+    with col2:
+        text_files = sum(1 for ext in COMPLETE_EXTENSIONS.keys() 
+                       if ext in ['.txt', '.md', '.rst', '.tex', '.log'])
+        st.metric("Documentation", text_files)
+    with col3:
+        config_files = len([ext for ext in COMPLETE_EXTENSIONS.keys() 
+                          if ext in ['.json', '.yaml', '.toml', '.ini', '.xml', '.env']])
+        st.metric("Config Files", config_files)
+    with col4:
+        code_files = len([ext for ext in COMPLETE_EXTENSIONS.keys() 
+                        if ext in ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php']])
+        st.metric("Code Files", code_files)
+    
+    # File type categories visualization
+    st.subheader("📁 File Categories")
+    
+    # Categorize extensions
+    categories = {
+        "Programming": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+                      if ext in ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php', '.cs', '.swift', '.kt']],
+        "Web": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+               if ext in ['.html', '.css', '.jsx', '.tsx', '.vue', '.svelte', '.scss', '.less']],
+        "Config": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+                  if ext in ['.json', '.yaml', '.toml', '.ini', '.xml', '.env']],
+        "Scripts": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+                   if ext in ['.sh', '.bash', '.ps1', '.bat', '.cmd', '.vbs']],
+        "Data": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+                if ext in ['.csv', '.sql', '.parquet', '.json', '.xml']],
+        "Documentation": [ext for ext in COMPLETE_EXTENSIONS.keys() 
+                        if ext in ['.md', '.txt', '.rst', '.tex']],
+        "Other": []
+    }
+    
+    # Calculate counts
+    category_counts = {}
+    for category, extensions in categories.items():
+        if category != "Other":
+            category_counts[category] = len(extensions)
+    
+    # Add other category
+    all_extensions = set(COMPLETE_EXTENSIONS.keys())
+    categorized_extensions = set()
+    for exts in categories.values():
+        categorized_extensions.update(exts)
+    category_counts["Other"] = len(all_extensions - categorized_extensions)
+    
+    # Create DataFrame for chart
+    chart_data = pd.DataFrame({
+        'Category': list(category_counts.keys()),
+        'Count': list(category_counts.values())
+    })
+    
+    st.bar_chart(chart_data.set_index('Category'))
 
 def main():
     # Initialize session state
@@ -635,12 +734,10 @@ def main():
         st.session_state.output_path = None
     if 'stats' not in st.session_state:
         st.session_state.stats = None
-    if 'progress' not in st.session_state:
-        st.session_state.progress = 0
     if 'excluded_folders' not in st.session_state:
-        st.session_state.excluded_folders = []
-    if 'folder_list' not in st.session_state:
-        st.session_state.folder_list = []
+        st.session_state.excluded_folders = set()
+    if 'expanded_folders' not in st.session_state:
+        st.session_state.expanded_folders = set()
     if 'current_source_dir' not in st.session_state:
         st.session_state.current_source_dir = None
     if 'folder_depth' not in st.session_state:
@@ -648,8 +745,8 @@ def main():
     if 'tree_depth' not in st.session_state:
         st.session_state.tree_depth = 3
     
-    # Initialize aggregator
-    aggregator = CodeAggregator()
+    # Reattach to the aggregation named in the URL, if it is still known
+    job = current_job()
     
     # Header
     st.markdown('<h1 class="main-header">🧬 Ultimate Code Aggregator</h1>', unsafe_allow_html=True)
@@ -662,14 +759,7 @@ def main():
         st.subheader("📄 File Types")
         
         # Category selection
-        categories = {
-            "Programming": ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php', '.cs', '.swift', '.kt'],
-            "Web": ['.html', '.css', '.jsx', '.tsx', '.vue', '.svelte', '.scss', '.less'],
-            "Config": ['.json', '.yaml', '.toml', '.ini', '.xml', '.env'],
-            "Scripts": ['.sh', '.bash', '.ps1', '.bat', '.cmd', '.vbs'],
-            "Data": ['.csv', '.sql', '.parquet', '.json', '.xml'],
-            "Docs": ['.md', '.txt', '.rst', '.tex']
-        }
+        categories = EXTENSION_CATEGORIES
         
         selected_categories = []
         for cat, exts in categories.items():
@@ -689,10 +779,38 @@ def main():
                                           help="Add line numbers to each file")
         respect_gitignore = st.checkbox("Respect .gitignore", value=True,
                                        help="Skip files listed in .gitignore")
+        git_tracked = st.checkbox("Only files tracked by git", value=False,
+                                  help="In a git repository, list files from the git index instead of "
+                                       "walking the folder; untracked files are skipped")
         create_zip = st.checkbox("Create ZIP archive", value=False,
                                 help="Create a ZIP file with all processed files")
+        zip_level = st.slider("ZIP compression level:", 0, 9, 6, disabled=not create_zip,
+                              help="0 stores files uncompressed; higher is smaller but slower")
         include_hidden = st.checkbox("Include hidden files", value=False,
                                     help="Include files and folders starting with '.'")
+        deduplicate = st.checkbox("Deduplicate identical files", value=False,
+                                  help="Write repeated file contents once; later copies reference the first")
+        max_file_size = st.number_input("Max file size (MB):", min_value=1, max_value=100_000, value=10,
+                                        help="Larger files are skipped. UTF-8 files over "
+                                             f"{LARGE_FILE_BYTES // (1024 * 1024)} MB are copied in chunks, "
+                                             "so big fixtures do not need matching memory")
+        
+        # Performance
+        st.subheader("⚡ Performance")
+        workers = st.number_input("Parallel workers:", min_value=1, max_value=64,
+                                  value=min(4, os.cpu_count() or 1),
+                                  help="Files read and prepared concurrently; output order is unchanged")
+        executor_type = st.selectbox("Worker pool:", ["thread", "process"],
+                                     help="Threads suit I/O-bound trees; processes parallelize encoding detection")
+        use_cache = st.checkbox("Use persistent cache", value=False,
+                                help="Reuse prepared blocks of unchanged files from previous exports")
+        cache_dir = os.path.join(tempfile.gettempdir(), 'code_aggregator_cache') if use_cache else None
+        resumable = st.checkbox("Resumable export", value=False,
+                                help="Save progress every 30 seconds; after a crash or restart, starting the same "
+                                     "export again continues where it stopped (uncompressed, unsharded output)")
+        profile_stages = st.checkbox("Record stage timings", value=False,
+                                     help="Time each stage (walk, read, decode, write, ...) and find the slowest "
+                                          "files; shown in the Statistics tab")
         
         # Depth Control Section
         st.subheader("📏 Depth Control")
@@ -728,73 +846,91 @@ def main():
         # Check if source directory is valid
         source_dir = st.session_state.get('dir_input', '')
         if source_dir and os.path.exists(source_dir):
-            # Get folders if source directory changed or depth changed
+            # Selections reset when the source directory or depth changes
             if (st.session_state.current_source_dir != source_dir or 
                 st.session_state.get('last_folder_depth') != folder_depth):
                 st.session_state.current_source_dir = source_dir
-                st.session_state.folder_list = aggregator.get_folders(source_dir, max_depth=folder_depth)
-                st.session_state.excluded_folders = []
+                set_excluded_folders(set())
+                st.session_state.expanded_folders = set()
                 st.session_state.last_folder_depth = folder_depth
+            # Cheap on reruns: one mtime check per scanned folder, then a cache hit
+            change_token = get_snapshot_registry().get(source_dir).change_token
+            
+            folder_filter = st.text_input(
+                "🔍 Filter folders:",
+                key="folder_filter",
+                placeholder="Name or path fragment",
+                help=f"Search all folders up to depth {folder_depth}; clear to browse the tree"
+            ).strip().lower()
+            if folder_filter:
+                folder_rows = [f for f in cached_folders(source_dir, folder_depth, change_token)
+                               if folder_filter in f['rel_path'].lower()]
+            else:
+                folder_rows = visible_folder_rows(source_dir, change_token,
+                                                  st.session_state.expanded_folders, folder_depth)
             
             # Display folder checkboxes
-            if st.session_state.folder_list:
+            if folder_rows:
                 with st.container():
-                    st.markdown('<div class="folder-checkbox-container">', unsafe_allow_html=True)
-                    
                     # Select/Deselect all buttons
                     col1, col2 = st.columns(2)
                     with col1:
-                        if st.button("Select All", key="select_all_folders"):
-                            st.session_state.excluded_folders = [f['rel_path'] for f in st.session_state.folder_list]
-                            st.rerun()
+                        st.button("Select All", key="select_all_folders",
+                                  help="Exclude every folder listed below",
+                                  on_click=set_excluded_folders,
+                                  args=(st.session_state.excluded_folders | {f['rel_path'] for f in folder_rows},))
                     with col2:
-                        if st.button("Deselect All", key="deselect_all_folders"):
-                            st.session_state.excluded_folders = []
-                            st.rerun()
+                        st.button("Deselect All", key="deselect_all_folders",
+                                  on_click=set_excluded_folders, args=(set(),))
                     
                     st.markdown("---")
                     
-                    # Create checkboxes for each folder with indentation
-                    for folder in st.session_state.folder_list:
-                        indent_class = f"folder-indent-{folder['level']}"
-                        folder_name = folder['name']
+                    # Only the current page is drawn
+                    page_count = (len(folder_rows) + FOLDERS_PER_PAGE - 1) // FOLDERS_PER_PAGE
+                    page = 1
+                    if page_count > 1:
+                        if st.session_state.get('folder_page', 1) > page_count:
+                            st.session_state.folder_page = page_count
+                        page = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count,
+                                               key="folder_page")
+                    first = (page - 1) * FOLDERS_PER_PAGE
+                    
+                    for folder in folder_rows[first:first + FOLDERS_PER_PAGE]:
                         rel_path = folder['rel_path']
-                        
-                        # Create unique key for each checkbox
-                        checkbox_key = f"folder_{rel_path.replace(os.sep, '_')}"
-                        
-                        # Check if folder is currently excluded
-                        is_checked = rel_path in st.session_state.excluded_folders
-                        
-                        # Display checkbox with indentation using CSS classes
-                        st.markdown(f'<div class="folder-item {indent_class}">', unsafe_allow_html=True)
-                        checked = st.checkbox(
-                            f"📁 {folder_name}",
-                            value=is_checked,
-                            key=checkbox_key,
+                        if folder_filter:
+                            label, row = f"📁 {rel_path}", st.container()
+                        else:
+                            indent = '\u2003' * (folder['level'] - 1)
+                            label = f"{indent}📁 {folder['name']}"
+                            toggle_col, row = st.columns([1, 7])
+                            if folder['level'] < folder_depth:
+                                expanded = rel_path in st.session_state.expanded_folders
+                                toggle_col.button("▾" if expanded else "▸", key=f"expand::{rel_path}",
+                                                  on_click=toggle_expanded_folder, args=(rel_path,))
+                        row.checkbox(
+                            label,
+                            value=rel_path in st.session_state.excluded_folders,
+                            key=f"exclude::{rel_path}",
+                            on_change=toggle_excluded_folder,
+                            args=(rel_path,),
                             help=f"Path: {rel_path}"
                         )
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        
-                        # Update excluded folders list
-                        if checked and rel_path not in st.session_state.excluded_folders:
-                            st.session_state.excluded_folders.append(rel_path)
-                        elif not checked and rel_path in st.session_state.excluded_folders:
-                            st.session_state.excluded_folders.remove(rel_path)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
                     
                     # Show summary
-                    total_folders = len(st.session_state.folder_list)
                     excluded_count = len(st.session_state.excluded_folders)
                     
                     st.markdown('<div class="folder-summary">', unsafe_allow_html=True)
-                    st.info(f"📊 **{total_folders}** folders found at depth {folder_depth}")
+                    if folder_filter:
+                        st.info(f"📊 **{len(folder_rows)}** folders match at depth {folder_depth}")
+                    else:
+                        st.info(f"📊 **{len(folder_rows)}** folders shown; expand ▸ to list subfolders")
                     if excluded_count > 0:
                         st.warning(f"🚫 Excluding **{excluded_count}** folder(s)")
                     else:
                         st.success(f"✅ No folders excluded")
                     st.markdown('</div>', unsafe_allow_html=True)
+            elif folder_filter:
+                st.info(f"🔍 No folders match \"{folder_filter}\" at depth {folder_depth}")
             else:
                 st.info(f"📂 No folders found at depth {folder_depth}")
         else:
@@ -812,7 +948,12 @@ def main():
             st.progress(count/len(exts), text=f"{cat}: {count}/{len(exts)}")
     
     # Main content
-    tab1, tab2, tab3, tab4 = st.tabs(["📁 Process", "🔍 Preview", "📊 Statistics", "ℹ️ About"])
+    tab_labels = ["📁 Process", "🔍 Preview", "📊 Statistics", "ℹ️ About"]
+    try:
+        # Rerun on tab switch so each tab can tell whether it is the one being shown
+        tab1, tab2, tab3, tab4 = st.tabs(tab_labels, key="main_tabs", on_change="rerun")
+    except TypeError:
+        tab1, tab2, tab3, tab4 = st.tabs(tab_labels)
     
     with tab1:
         # Directory input
@@ -840,22 +981,25 @@ def main():
                     st.caption(f"Tree depth: {st.session_state.tree_depth}")
                 with col2:
                     if st.button("🔄 Refresh Tree"):
+                        # Rescan from scratch; memoized views are keyed on the new snapshot
+                        get_snapshot_registry().invalidate(source_dir)
                         st.rerun()
                 
                 with st.spinner("Generating tree..."):
-                    file_tree = aggregator.get_file_tree(
-                        source_dir, 
-                        max_depth=st.session_state.tree_depth,
-                        max_files_per_dir=8,
-                        excluded_folders=st.session_state.excluded_folders,
-                        folder_depth=st.session_state.folder_depth
+                    file_tree = cached_file_tree(
+                        source_dir,
+                        st.session_state.tree_depth,
+                        8,
+                        tuple(sorted(st.session_state.excluded_folders)),
+                        st.session_state.folder_depth,
+                        get_snapshot_registry().get(source_dir).change_token
                     )
                     st.code(file_tree, language="text")
                     
                     # Show excluded folders summary
                     if st.session_state.excluded_folders:
                         st.markdown("**🚫 Excluded Folders:**")
-                        for folder in st.session_state.excluded_folders[:10]:
+                        for folder in sorted(st.session_state.excluded_folders)[:10]:
                             st.markdown(f"- `{folder}`")
                         if len(st.session_state.excluded_folders) > 10:
                             st.markdown(f"... and {len(st.session_state.excluded_folders) - 10} more")
@@ -880,11 +1024,54 @@ def main():
                 help="Output file format"
             )
         
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            compression = st.selectbox(
+                "Compression:",
+                ["none"] + available_compressions(),
+                help="Compress the export while it is written (zstd needs the `zstandard` package)"
+            )
+        
+        with col2:
+            # Each codec has its own level scale and sensible default
+            level_range = {'gzip': (1, 9, 6), 'xz': (0, 9, 6), 'zstd': (1, 22, 3)}
+            low, high, default = level_range.get(compression, (0, 9, 6))
+            compression_level = st.slider(
+                "Compression level:", low, high, default,
+                disabled=compression == "none",
+                help="Higher is smaller but slower"
+            )
+        
+        with col3:
+            background_compression = st.checkbox(
+                "Compress on background thread",
+                value=False,
+                disabled=compression == "none",
+                help="Overlap compression with reading files"
+            )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            split_shards = st.checkbox(
+                "Split into shards",
+                value=False,
+                help="Write several files sized for LLM context windows, plus a JSON manifest"
+            )
+        
+        with col2:
+            shard_tokens = st.number_input(
+                "Max tokens per shard:",
+                min_value=1_000, max_value=10_000_000, value=100_000, step=10_000,
+                disabled=not split_shards,
+                help="Estimated at about 3.5 characters per token; files are only split when larger than a shard"
+            )
+        
         # Process button
         st.markdown("---")
         process_col1, process_col2, process_col3 = st.columns([1, 2, 1])
         with process_col2:
-            if st.button("🚀 Start Aggregation", type="primary", use_container_width=True):
+            running = job is not None and not job.done
+            if st.button("🚀 Start Aggregation", type="primary", use_container_width=True, disabled=running):
                 if not source_dir or not os.path.exists(source_dir):
                     st.error("❌ Please enter a valid directory path!")
                 else:
@@ -904,143 +1091,89 @@ def main():
                     
                     # Prepare output path
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_filename = f"{output_name}_{timestamp}{output_format}"
+                    compression_suffix = COMPRESSION_SUFFIXES.get(compression, '')
+                    output_filename = f"{output_name}_{timestamp}{output_format}{compression_suffix}"
                     output_path = os.path.join(tempfile.gettempdir(), output_filename)
+                    zip_filename = f"{output_name}_{timestamp}.zip"
+                    
+                    checkpoint_path = None
+                    if resumable and (compression != "none" or split_shards):
+                        st.warning("⏯️ Resumable exports need uncompressed, unsharded output; "
+                                   "running without checkpoints.")
+                    elif resumable and checkpoint_in_use(checkpoint_path_for(source_dir_clean)):
+                        # Resuming would reopen the running export's file and truncate it
+                        st.warning("⏯️ A resumable export of this folder is already running; "
+                                   "running without checkpoints.")
+                    elif resumable:
+                        checkpoint_path = checkpoint_path_for(source_dir_clean)
+                        saved = ExportCheckpoint.peek(checkpoint_path)
+                        # Write to the interrupted export's file so the run can continue it
+                        if saved and saved['output_file'].endswith(output_format) and os.path.exists(saved['output_file']):
+                            output_path = saved['output_file']
+                            output_filename = os.path.basename(output_path)
+                            st.info(f"⏯️ Continuing an interrupted export ({saved['position']:,} files done) "
+                                    "if its settings are unchanged.")
                     
                     # Get excluded folders from session state
-                    exclude_list = st.session_state.excluded_folders.copy()
+                    exclude_list = sorted(st.session_state.excluded_folders)
                     
                     # Add default excluded directories
-                    default_excludes = ['.git', '__pycache__', 'node_modules', '.venv', 'venv', 
-                                       'env', 'dist', 'build', '.idea', '.vscode', '.DS_Store']
+                    default_excludes = DEFAULT_EXCLUDED_DIRS
                     exclude_list.extend([d for d in default_excludes if d not in exclude_list])
                     
-                    # Advanced options
-                    max_file_size = 10  # Default value
-                    
-                    # Process
-                    with st.spinner("Processing files... This may take a while."):
-                        # Progress bar
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        # Process files
-                        success, result, stats = aggregator.traverse_and_write_code(
+                    # Run in the background; the job survives reruns and is found again via the URL
+                    job = AggregationJob(
+                        CodeAggregator(snapshots=get_snapshot_registry()),
+                        export_kwargs=dict(
                             source_dir=source_dir_clean,
                             output_file=output_path,
                             include_ext=include_extensions,
                             exclude_dirs=exclude_list,
                             include_line_numbers=include_line_numbers,
                             respect_gitignore=respect_gitignore,
-                            max_file_size_mb=max_file_size,
-                            include_hidden=include_hidden
+                            git_tracked=git_tracked,
+                            max_file_size_mb=int(max_file_size),
+                            include_hidden=include_hidden,
+                            workers=int(workers),
+                            executor_type=executor_type,
+                            compression=None if compression == "none" else compression,
+                            compression_level=compression_level,
+                            background_compression=background_compression,
+                            cache_dir=cache_dir,
+                            shard_max_tokens=int(shard_tokens) if split_shards else None,
+                            deduplicate=deduplicate,
+                            profile=profile_stages,
+                            checkpoint_path=checkpoint_path,
+                            resume=checkpoint_path is not None
+                        ),
+                        zip_kwargs=dict(
+                            output_zip=os.path.join(tempfile.gettempdir(), zip_filename),
+                            compression_level=zip_level,
+                            workers=int(workers)
+                        ) if create_zip else None,
+                        meta=dict(
+                            output_path=output_path,
+                            output_filename=output_filename,
+                            download_label=f"⬇️ Download {(output_format + compression_suffix).upper()}",
+                            mime=EXPORT_MIME_TYPES.get(compression, "text/plain"),
+                            zip_filename=zip_filename,
+                            exclude_list=exclude_list
                         )
-                        
-                        progress_bar.progress(100)
-                        
-                        if success:
-                            # Store in session state
-                            st.session_state.processed_data = result
-                            st.session_state.output_path = output_path
-                            st.session_state.stats = stats
-                            
-                            # Success display
-                            st.balloons()
-                            
-                            st.markdown('<div class="success-msg">', unsafe_allow_html=True)
-                            st.success("✅ Processing completed successfully!")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                            
-                            # Statistics cards
-                            col1, col2, col3, col4 = st.columns(4)
-                            with col1:
-                                st.metric("📄 Files Processed", stats['total_files'])
-                            with col2:
-                                st.metric("📏 Total Lines", f"{stats['total_lines']:,}")
-                            with col3:
-                                st.metric("⏱️ Processing Time", f"{stats['processing_time']:.2f}s")
-                            with col4:
-                                st.metric("📊 File Types", len(stats['files_by_type']))
-                            
-                            # Additional stats
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric("⚠️ Errors", stats['errors'])
-                            with col2:
-                                st.metric("💾 Binary Skipped", stats['binary_files'])
-                            with col3:
-                                st.metric("📦 Large Skipped", stats['large_files'])
-                            
-                            # Download section
-                            st.subheader("📥 Download Results")
-                            
-                            # Read output file
-                            try:
-                                with open(output_path, 'r', encoding='utf-8') as f:
-                                    file_content = f.read()
-                                
-                                # Download buttons
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    st.download_button(
-                                        label=f"⬇️ Download {output_format.upper()}",
-                                        data=file_content,
-                                        file_name=output_filename,
-                                        mime="text/plain",
-                                        use_container_width=True
-                                    )
-                                
-                                with col2:
-                                    # Create ZIP if requested
-                                    if create_zip and stats['total_files'] > 0:
-                                        zip_filename = output_filename.replace(output_format, '.zip')
-                                        zip_path = os.path.join(tempfile.gettempdir(), zip_filename)
-                                        
-                                        zip_success, zip_result, zip_count = aggregator.create_zip_archive(
-                                            source_dir_clean, zip_path, include_extensions, exclude_list
-                                        )
-                                        
-                                        if zip_success and zip_count > 0:
-                                            with open(zip_path, 'rb') as zf:
-                                                zip_data = zf.read()
-                                            st.download_button(
-                                                label=f"📦 Download ZIP ({zip_count} files)",
-                                                data=zip_data,
-                                                file_name=zip_filename,
-                                                mime="application/zip",
-                                                use_container_width=True
-                                            )
-                            
-                                # File info
-                                with st.expander("📋 File Information", expanded=True):
-                                    st.info(f"**Location:** `{output_path}`")
-                                    st.info(f"**Size:** {os.path.getsize(output_path):,} bytes")
-                                    
-                                    # Show excluded folders
-                                    if exclude_list:
-                                        st.info(f"**Excluded Folders:** {', '.join(exclude_list[:10])}")
-                                        if len(exclude_list) > 10:
-                                            st.info(f"... and {len(exclude_list) - 10} more")
-                                    
-                                    # File type distribution
-                                    if stats['files_by_type']:
-                                        st.subheader("📊 File Type Distribution")
-                                        for file_type, count in sorted(stats['files_by_type'].items(), key=lambda x: x[1], reverse=True)[:15]:
-                                            percentage = (count / stats['total_files']) * 100
-                                            st.write(f"• {file_type}: {count} files ({percentage:.1f}%)")
-                            
-                            except Exception as e:
-                                st.error(f"Error reading output file: {str(e)}")
-                        
-                        else:
-                            st.error(f"❌ Error: {result}")
+                    )
+                    start_job(job)
+            
+            if job is not None:
+                if job.done:
+                    render_job_result(job)
+                else:
+                    render_job_progress(job)
     
     with tab2:
         st.subheader("🔍 File Preview")
         
         if st.session_state.output_path and os.path.exists(st.session_state.output_path):
             try:
-                with open(st.session_state.output_path, 'r', encoding='utf-8') as f:
+                with open_export_reader(st.session_state.output_path) as f:
                     preview_content = f.read(5000)  # Show first 5000 chars
                 
                 st.code(preview_content, language='text')
@@ -1049,122 +1182,23 @@ def main():
                     st.caption("📝 Showing first 5,000 characters. Use download for full file.")
                     
                 # Show processed files list
-                if hasattr(aggregator, 'processed_files') and aggregator.processed_files:
+                processed_files = job.aggregator.processed_files if job is not None and job.done else []
+                if processed_files:
                     with st.expander("📋 Processed Files"):
-                        for file_info in aggregator.processed_files[:50]:  # Show first 50
+                        for file_info in processed_files[:50]:  # Show first 50
                             st.text(f"📄 {file_info['path']} ({file_info['lines']} lines)")
-                        if len(aggregator.processed_files) > 50:
-                            st.info(f"... and {len(aggregator.processed_files) - 50} more files")
+                        if len(processed_files) > 50:
+                            st.info(f"... and {len(processed_files) - 50} more files")
             except Exception as e:
                 st.error(f"Error reading preview: {str(e)}")
         else:
             st.info("📌 Process a directory first to see preview here.")
     
     with tab3:
-        st.subheader("📊 Statistics Dashboard")
-        
-        if st.session_state.stats:
-            stats = st.session_state.stats
-            
-            # Overview metrics
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("📄 Total Files", stats['total_files'])
-            with col2:
-                st.metric("📏 Lines of Code", f"{stats['total_lines']:,}")
-            with col3:
-                st.metric("💾 Total Size", f"{stats['total_bytes'] / 1024:.2f} KB")
-            with col4:
-                st.metric("⏱️ Processing Time", f"{stats['processing_time']:.2f}s")
-            
-            # Processing details
-            st.subheader("⚙️ Processing Details")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("⚠️ Errors", stats['errors'])
-            with col2:
-                st.metric("💾 Binary Files Skipped", stats['binary_files'])
-            with col3:
-                st.metric("📦 Large Files Skipped", stats['large_files'])
-            
-            # File type distribution
-            if stats['files_by_type']:
-                st.subheader("📊 File Type Distribution")
-                
-                # Create DataFrame for visualization
-                df = pd.DataFrame({
-                    'File Type': list(stats['files_by_type'].keys()),
-                    'Count': list(stats['files_by_type'].values())
-                }).sort_values('Count', ascending=False)
-                
-                # Display as bar chart
-                st.bar_chart(df.set_index('File Type'))
-                
-                # Display as table
-                with st.expander("📋 Detailed Distribution"):
-                    st.dataframe(df, use_container_width=True)
-        else:
-            st.info("📌 Process a directory first to see statistics.")
-        
-        # Global statistics
-        st.subheader("🌍 Global Statistics")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Extensions", len(COMPLETE_EXTENSIONS))
-        with col2:
-            text_files = sum(1 for ext in COMPLETE_EXTENSIONS.keys() 
-                           if ext in ['.txt', '.md', '.rst', '.tex', '.log'])
-            st.metric("Documentation", text_files)
-        with col3:
-            config_files = len([ext for ext in COMPLETE_EXTENSIONS.keys() 
-                              if ext in ['.json', '.yaml', '.toml', '.ini', '.xml', '.env']])
-            st.metric("Config Files", config_files)
-        with col4:
-            code_files = len([ext for ext in COMPLETE_EXTENSIONS.keys() 
-                            if ext in ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php']])
-            st.metric("Code Files", code_files)
-        
-        # File type categories visualization
-        st.subheader("📁 File Categories")
-        
-        # Categorize extensions
-        categories = {
-            "Programming": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                          if ext in ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php', '.cs', '.swift', '.kt']],
-            "Web": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                   if ext in ['.html', '.css', '.jsx', '.tsx', '.vue', '.svelte', '.scss', '.less']],
-            "Config": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                      if ext in ['.json', '.yaml', '.toml', '.ini', '.xml', '.env']],
-            "Scripts": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                       if ext in ['.sh', '.bash', '.ps1', '.bat', '.cmd', '.vbs']],
-            "Data": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                    if ext in ['.csv', '.sql', '.parquet', '.json', '.xml']],
-            "Documentation": [ext for ext in COMPLETE_EXTENSIONS.keys() 
-                            if ext in ['.md', '.txt', '.rst', '.tex']],
-            "Other": []
-        }
-        
-        # Calculate counts
-        category_counts = {}
-        for category, extensions in categories.items():
-            if category != "Other":
-                category_counts[category] = len(extensions)
-        
-        # Add other category
-        all_extensions = set(COMPLETE_EXTENSIONS.keys())
-        categorized_extensions = set()
-        for exts in categories.values():
-            categorized_extensions.update(exts)
-        category_counts["Other"] = len(all_extensions - categorized_extensions)
-        
-        # Create DataFrame for chart
-        chart_data = pd.DataFrame({
-            'Category': list(category_counts.keys()),
-            'Count': list(category_counts.values())
-        })
-        
-        st.bar_chart(chart_data.set_index('Category'))
+        # Only build the dashboard (and import pandas) when the tab is actually open;
+        # .open is None when this Streamlit version does not track the selected tab
+        if getattr(tab3, "open", None) is not False:
+            render_statistics_tab()
     
     with tab4:
         st.subheader("ℹ️ About")
@@ -0,0 +1,91 @@
+"""Benchmark: export throughput and size per compression codec and level.
+
+Generates a synthetic source tree, then runs traverse_and_write_code once
+uncompressed and once per codec/level, inline and with the background
+compression thread. Reports wall time, throughput of uncompressed export
+bytes and compression ratio. Run from the repository root:
+
+    python benchmarks/bench_compression.py --size-mb 200 --levels 1,6,9
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import COMPRESSION_SUFFIXES, CodeAggregator, available_compressions  # noqa: E402
+
+# zstd uses a wider level scale; map the requested levels onto it
+ZSTD_LEVELS = {1: 1, 6: 3, 9: 9}
+
+
+def make_tree(root: str, size_mb: int, file_kb: int) -> int:
+    lines = [
+        "def handler_%d(request, context):\n",
+        "    value = compute_something(request.alpha, request.beta)  # synthetic\n",
+        "    if value is None:\n",
+        "        raise ValueError('missing value for %d')\n",
+        "    return {'status': 'ok', 'value': value, 'id': %d}\n",
+    ]
+    n_files = max(1, size_mb * 1024 // file_kb)
+    for i in range(n_files):
+        sub = os.path.join(root, f"pkg{i % 64}")
+        os.makedirs(sub, exist_ok=True)
+        body = []
+        size = 0
+        j = 0
+        while size < file_kb * 1024:
+            line = lines[j % len(lines)]
+            line = line % (i * 1000 + j) if '%d' in line else line
+            body.append(line)
+            size += len(line)
+            j += 1
+        with open(os.path.join(sub, f"module_{i}.py"), 'w', encoding='utf-8') as f:
+            f.write(''.join(body))
+    return n_files
+
+
+def run(source: str, output: str, **kwargs) -> float:
+    start = time.perf_counter()
+    ok, result, _ = CodeAggregator().traverse_and_write_code(source, output, workers=4, **kwargs)
+    if not ok:
+        sys.exit(f"aggregation failed: {result}")
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--file-kb", type=int, default=64)
+    parser.add_argument("--levels", default="1,6,9", help="Comma-separated levels (gzip/xz scale)")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "src")
+        n_files = make_tree(source, args.size_mb, args.file_kb)
+        plain = os.path.join(work, "export.txt")
+        elapsed = run(source, plain)
+        raw_size = os.path.getsize(plain)
+        print(f"{n_files} files, export {raw_size / 1e6:.1f} MB")
+        print(f"{'codec':<6} {'level':>5} {'thread':>6} {'time':>8} {'MB/s':>8} {'size MB':>8} {'ratio':>6}")
+        print(f"{'none':<6} {'-':>5} {'-':>6} {elapsed:>7.2f}s {raw_size / 1e6 / elapsed:>8.1f} "
+              f"{raw_size / 1e6:>8.1f} {1.0:>6.2f}")
+
+        for codec in available_compressions():
+            for level in levels:
+                codec_level = ZSTD_LEVELS.get(level, level) if codec == 'zstd' else level
+                for background in (False, True):
+                    output = plain + COMPRESSION_SUFFIXES[codec]
+                    elapsed = run(source, output, compression=codec, compression_level=codec_level,
+                                  background_compression=background)
+                    size = os.path.getsize(output)
+                    print(f"{codec:<6} {codec_level:>5} {'yes' if background else 'no':>6} {elapsed:>7.2f}s "
+                          f"{raw_size / 1e6 / elapsed:>8.1f} {size / 1e6:>8.1f} {raw_size / size:>6.2f}")
+                    os.remove(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark: legacy startswith() folder exclusion vs. ExclusionTrie.
+
+Walks a tree with a large folder exclusion list using the old
+any(...startswith(...)) pruning and the shared trie. Run from the repository root:
+
+    python benchmarks/bench_exclusions.py --excluded 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import ExclusionTrie  # noqa: E402
+
+
+def make_tree(root: str, top: int, per_dir: int) -> list:
+    folders = []
+    for i in range(top):
+        for j in range(per_dir):
+            rel = os.path.join(f"area{i}", f"pkg{j}")
+            os.makedirs(os.path.join(root, rel, "src"), exist_ok=True)
+            folders.append(rel)
+    return folders
+
+
+def legacy_walk(source_dir: str, exclude_dirs: list) -> int:
+    visited = 0
+    for root, dirs, files in os.walk(source_dir):
+        rel_path = os.path.relpath(root, source_dir)
+        if rel_path != '.' and any(rel_path.startswith(excluded) for excluded in exclude_dirs):
+            continue
+        dirs[:] = [d for d in dirs if not any(
+            os.path.join(rel_path, d).startswith(excluded) for excluded in exclude_dirs
+        )]
+        visited += 1
+    return visited
+
+
+def trie_walk(source_dir: str, exclude_dirs: list) -> int:
+    exclusions = ExclusionTrie(exclude_dirs)
+    visited = 0
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = exclusions.prune(os.path.relpath(root, source_dir), dirs)
+        visited += 1
+    return visited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--excluded", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        folders = make_tree(root, top=100, per_dir=max(20, args.excluded // 50))
+        # Exclude every other folder so half the tree is still walked
+        exclude_dirs = folders[::2][:args.excluded]
+        for name, fn in (("legacy", legacy_walk), ("trie", trie_walk)):
+            start = time.perf_counter()
+            visited = fn(root, exclude_dirs)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<7} excluded={len(exclude_dirs)}  dirs_visited={visited:>6}  time={elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Memory check: aggregate a multi-GB synthetic tree and stream the download under an RSS cap.
+
+Generates --size-gb of text files, runs traverse_and_write_code on them, then
+downloads the export through ExportFileServer in chunks. Exits non-zero if the
+process's peak RSS exceeds --max-rss-mb. Run from the repository root:
+
+    python benchmarks/bench_export_memory.py --size-gb 2 --max-rss-mb 512
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ExportFileServer  # noqa: E402
+from code_aggregator import CodeAggregator  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def make_tree(root: str, size_gb: float, file_mb: int) -> int:
+    line = b"    result = compute_something(alpha, beta, gamma)  # synthetic source line\n"
+    chunk = line * (1024 * 1024 // len(line))
+    n_files = max(1, int(size_gb * 1024 / file_mb))
+    for i in range(n_files):
+        sub = os.path.join(root, f"pkg{i % 64}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"module_{i}.py"), 'wb') as f:
+            for _ in range(file_mb):
+                f.write(chunk)
+    return n_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-gb", type=float, default=2.0)
+    parser.add_argument("--file-mb", type=int, default=4)
+    parser.add_argument("--max-rss-mb", type=float, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "src")
+        n_files = make_tree(source, args.size_gb, args.file_mb)
+        print(f"generated {n_files} files ({args.size_gb:.2f} GB); rss={peak_rss_mb():.0f} MB")
+
+        output = os.path.join(work, "export.txt")
+        start = time.perf_counter()
+        ok, result, stats = CodeAggregator().traverse_and_write_code(
+            source, output, max_file_size_mb=args.file_mb + 1)
+        if not ok:
+            sys.exit(f"aggregation failed: {result}")
+        print(f"aggregated {stats['total_files']} files, {os.path.getsize(output) / 1e9:.2f} GB "
+              f"in {time.perf_counter() - start:.1f}s; peak rss={peak_rss_mb():.0f} MB")
+
+        server = ExportFileServer()
+        url = server.register(output, "export.txt", "text/plain")
+        start = time.perf_counter()
+        received = 0
+        with urllib.request.urlopen(url) as response:
+            while True:
+                chunk = response.read(ExportFileServer.CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+        print(f"streamed {received / 1e9:.2f} GB in {time.perf_counter() - start:.1f}s; "
+              f"peak rss={peak_rss_mb():.0f} MB")
+
+    peak = peak_rss_mb()
+    if peak > args.max_rss_mb:
+        sys.exit(f"FAIL: peak RSS {peak:.0f} MB exceeds cap of {args.max_rss_mb:.0f} MB")
+    print(f"OK: peak RSS {peak:.0f} MB within cap of {args.max_rss_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: legacy three-open file handling vs. the single-read probe.
+
+Counts open()/read() calls made per file and wall time for both strategies
+on a synthetic tree. Run from the repository root:
+
+    python benchmarks/bench_file_probe.py --files 2000
+"""
+import argparse
+import builtins
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import CodeAggregator  # noqa: E402
+
+
+class IOCounter:
+    """Wrap builtins.open and count opens and read() calls."""
+
+    def __init__(self):
+        self.opens = 0
+        self.reads = 0
+        self._real_open = builtins.open
+
+    def __enter__(self):
+        counter = self
+
+        def counting_open(*args, **kwargs):
+            counter.opens += 1
+            f = counter._real_open(*args, **kwargs)
+            real_read = f.read
+
+            def counting_read(*a):
+                counter.reads += 1
+                return real_read(*a)
+
+            try:
+                f.read = counting_read
+            except AttributeError:
+                pass
+            return f
+
+        builtins.open = counting_open
+        return self
+
+    def __exit__(self, *exc):
+        builtins.open = self._real_open
+
+
+def make_tree(root: str, n_files: int, size_kb: int) -> list:
+    line = "def function_%d(x):\n    return x * 2  # some code comment\n"
+    paths = []
+    for i in range(n_files):
+        sub = os.path.join(root, f"pkg{i % 50}")
+        os.makedirs(sub, exist_ok=True)
+        path = os.path.join(sub, f"module_{i}.py")
+        body = "".join(line % j for j in range(size_kb * 1024 // 50))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(body)
+        paths.append(path)
+    return paths
+
+
+def legacy(aggregator: CodeAggregator, path: str) -> str:
+    if aggregator.is_binary(path):
+        return ""
+    encoding = aggregator.detect_encoding(path)
+    with open(path, "r", encoding=encoding, errors="ignore") as f:
+        return f.read()
+
+
+def probe(aggregator: CodeAggregator, path: str) -> str:
+    return aggregator.probe_file(path)[2]
+
+
+def run(name, fn, aggregator, paths):
+    with IOCounter() as counter:
+        start = time.perf_counter()
+        total = 0
+        for path in paths:
+            total += len(fn(aggregator, path))
+        elapsed = time.perf_counter() - start
+    print(f"{name:<8} files={len(paths):>6}  opens={counter.opens:>7}  reads={counter.reads:>7}  "
+          f"opens/file={counter.opens / len(paths):.2f}  time={elapsed:.3f}s  chars={total:,}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=8)
+    args = parser.parse_args()
+
+    aggregator = CodeAggregator()
+    with tempfile.TemporaryDirectory() as root:
+        paths = make_tree(root, args.files, args.size_kb)
+        before = run("legacy", legacy, aggregator, paths)
+        after = run("probe", probe, aggregator, paths)
+        print(f"speedup: {before / after:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark: legacy substring .gitignore filter vs. the compiled GitIgnoreMatcher.
+
+Builds a tree plus a .gitignore with several hundred patterns and times the
+filtering walk both ways. Run from the repository root:
+
+    python benchmarks/bench_gitignore.py --patterns 500 --files 20000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import CodeAggregator, ExclusionTrie, GitIgnoreMatcher  # noqa: E402
+
+
+def make_tree(root: str, n_files: int, n_patterns: int) -> None:
+    rng = random.Random(42)
+    exts = ['.py', '.js', '.log', '.tmp', '.md', '.json', '.pyc', '.cache']
+    dirs = [f"pkg{i}/mod{j}" for i in range(40) for j in range(5)] + [f"gen{i}/out" for i in range(20)]
+    for d in dirs:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    for i in range(n_files):
+        d = rng.choice(dirs)
+        with open(os.path.join(root, d, f"file{i}{rng.choice(exts)}"), 'w') as f:
+            f.write("x = 1\n")
+
+    patterns = ['*.log', '!keep.log', '*.py[co]', '/gen*/', '**/out/*.tmp', '*.cache']
+    while len(patterns) < n_patterns:
+        kind = rng.randrange(4)
+        if kind == 0:
+            patterns.append(f"*.ext{len(patterns)}")
+        elif kind == 1:
+            patterns.append(f"/pkg{rng.randrange(1000, 2000)}/")
+        elif kind == 2:
+            patterns.append(f"**/build{len(patterns)}/**")
+        else:
+            patterns.append(f"generated_{len(patterns)}_*.js")
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write('\n'.join(patterns) + '\n')
+
+
+def legacy_walk(source_dir: str) -> int:
+    with open(os.path.join(source_dir, '.gitignore'), 'r', encoding='utf-8') as f:
+        patterns = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    kept = 0
+    for root, dirs, files in os.walk(source_dir):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if any(p in file_path or (p.endswith('/') and p[:-1] in file_path) for p in patterns):
+                continue
+            kept += 1
+    return kept
+
+
+def compiled_walk(source_dir: str) -> int:
+    aggregator = CodeAggregator()
+    candidates = aggregator._iter_candidates(source_dir, aggregator.snapshots.get(source_dir), set(), set(),
+                                             ExclusionTrie(), GitIgnoreMatcher(source_dir),
+                                             max_file_size_mb=1024, include_hidden=True)
+    return sum(1 for _ in candidates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patterns", type=int, default=500)
+    parser.add_argument("--files", type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        make_tree(root, args.files, args.patterns)
+        for name, fn in (("legacy", legacy_walk), ("compiled", compiled_walk)):
+            start = time.perf_counter()
+            kept = fn(root)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<9} patterns={args.patterns}  files={args.files}  kept={kept:>6}  time={elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Import-time report for app.py and the code_aggregator package, with a budget.
+
+Runs each import in a fresh interpreter under ``python -X importtime``, prints
+the slowest modules by cumulative time, and fails if a module that should be
+deferred (pandas, chardet, ...) is imported eagerly or a total exceeds its
+budget. Modules already loaded by a baseline (the bare interpreter for the
+engine, `import streamlit` for the app) are not held against our code. Run
+from the repository root:
+
+    python benchmarks/bench_import_time.py --top 15 --app-budget-ms 900 --engine-budget-ms 80
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded only by the feature that needs them; importing any of these up front is a regression
+DEFERRED_MODULES = ['pandas', 'chardet', 'mimetypes', 'zipfile', 'sqlite3', 'zstandard',
+                    'multiprocessing']
+
+
+def import_times(statement: str) -> dict:
+    """Return {module name: cumulative microseconds} for running `statement` cold."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        times.setdefault(name.strip(), int(cumulative_us))
+    return times
+
+
+def report(module: str, baseline: str, top: int, budget_ms: float) -> bool:
+    baseline_modules = import_times(baseline)
+    times = {name: us for name, us in import_times(f"import {module}").items() if name not in baseline_modules}
+    total_ms = times.get(module, 0) / 1000
+    print(f"\nimport {module}: {total_ms:.1f} ms cumulative (budget {budget_ms:.0f} ms)")
+    for name, us in sorted(times.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    eager = [name for name in DEFERRED_MODULES if name in times]
+    if eager:
+        print(f"  FAIL: imported eagerly: {', '.join(eager)}")
+        ok = False
+    if total_ms > budget_ms:
+        print(f"  FAIL: {total_ms:.1f} ms exceeds budget of {budget_ms:.0f} ms")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--app-budget-ms", type=float, default=900)
+    parser.add_argument("--engine-budget-ms", type=float, default=80)
+    args = parser.parse_args()
+
+    ok = report("code_aggregator", "pass", args.top, args.engine_budget_ms)
+    ok = report("app", "import streamlit", args.top, args.app_budget_ms) and ok
+    if not ok:
+        sys.exit(1)
+    print("\nOK: no deferred module imported eagerly and all totals within budget")
+
+
+if __name__ == "__main__":
+    main()
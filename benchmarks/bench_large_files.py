@@ -0,0 +1,84 @@
+"""Benchmark: exporting very large files, whole-file reads vs. the streaming path.
+
+Generates one large SQL fixture (default 200 MB) and exports it in a fresh
+interpreter per mode, so peak RSS is measured per run: once with streaming
+disabled (the file is read and rendered in memory) and once with the default
+LARGE_FILE_BYTES threshold. Run from the repository root:
+
+    python benchmarks/bench_large_files.py --size-mb 200 --line-numbers
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter: export, then report time and peak RSS as JSON
+CHILD = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import code_aggregator.engine as engine
+from code_aggregator import CodeAggregator
+if {whole_file}:
+    engine.LARGE_FILE_BYTES = float('inf')
+start = time.perf_counter()
+ok, result, stats = CodeAggregator().traverse_and_write_code(
+    {source!r}, {output!r}, include_line_numbers={line_numbers}, max_file_size_mb=100000)
+elapsed = time.perf_counter() - start
+if not ok:
+    sys.exit(result)
+print(json.dumps({{'time': elapsed, 'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   'streamed': stats['streamed_files']}}))
+"""
+
+
+def make_fixture(path: str, size_mb: int) -> None:
+    row = "INSERT INTO events (id, user_id, kind, payload) VALUES (%d, %d, 'click', '{\"x\": %d}');\n"
+    target = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            lines = ''.join(row % (i + j, (i + j) % 977, j) for j in range(1000))
+            f.write(lines)
+            written += len(lines)
+            i += 1000
+
+
+def run(source: str, output: str, whole_file: bool, line_numbers: bool) -> dict:
+    code = CHILD.format(root=ROOT, source=source, output=output, whole_file=whole_file,
+                        line_numbers=line_numbers)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--line-numbers", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "src")
+        os.makedirs(source)
+        make_fixture(os.path.join(source, "fixture.sql"), args.size_mb)
+        print(f"{args.size_mb} MB fixture, line numbers {'on' if args.line_numbers else 'off'}")
+        print(f"{'mode':<11} {'time':>8} {'MB/s':>8} {'peak RSS MB':>12}")
+        outputs = {}
+        for mode, whole_file in (("whole-file", True), ("streaming", False)):
+            outputs[mode] = os.path.join(work, f"{mode}.txt")
+            result = run(source, outputs[mode], whole_file, args.line_numbers)
+            print(f"{mode:<11} {result['time']:>7.2f}s {args.size_mb / result['time']:>8.1f} "
+                  f"{result['peak_rss_kb'] / 1024:>12.1f}")
+        # Identical apart from the Generated: timestamp line
+        with open(outputs["whole-file"], encoding='utf-8') as a, open(outputs["streaming"], encoding='utf-8') as b:
+            if [line for line in a if not line.startswith("Generated:")] != \
+                    [line for line in b if not line.startswith("Generated:")]:
+                sys.exit("outputs differ")
+
+
+if __name__ == "__main__":
+    main()
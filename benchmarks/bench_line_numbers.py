@@ -0,0 +1,95 @@
+"""Benchmark: line-numbered rendering, legacy split/join vs. chunked numbering.
+
+For each file size, renders one synthetic source file with line numbers and
+writes it to disk, first the old way (decode, split into a list of lines, an
+f-string per line, join, then one write) and then through the engine's
+_prepare_file_block and chunked writer. Reports throughput (best of --repeat
+runs) and peak traced memory. Run from the repository root:
+
+    python benchmarks/bench_line_numbers.py --sizes-mb 1,10,100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator.engine import _prepare_file_block, _write_text  # noqa: E402
+
+
+def make_file(path: str, size_mb: int) -> None:
+    line = "    result_%d = transform(payload['field'], index=%d)  # synthetic line\n"
+    target = size_mb * 1024 * 1024
+    written = 0
+    i = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            text = line % (i, i)
+            f.write(text)
+            written += len(text)
+            i += 1
+
+
+def legacy_render(file_path: str, output_path: str) -> None:
+    with open(file_path, 'rb') as f:
+        raw_data = f.read()
+    content = raw_data.decode('utf-8-sig')
+    line_count = content.count('\n') + 1 if content else 0
+    lines = content.split('\n')
+    content = '\n'.join(f"{i+1:4d} | {line}" for i, line in enumerate(lines))
+    text = (f"// FILE: {os.path.abspath(file_path)}\n"
+            f"// RELATIVE: .\n"
+            f"// TYPE: Python | SIZE: {len(raw_data):,} bytes | LINES: {line_count:,}\n"
+            + "=" * 100 + "\n\n"
+            + content
+            + "\n\n" + "=" * 100 + "\n\n")
+    with open(output_path, 'w', encoding='utf-8') as out:
+        out.write(text)
+
+
+def streaming_render(file_path: str, output_path: str) -> None:
+    block = _prepare_file_block(file_path, '.', '.py', os.path.getsize(file_path), True)
+    with open(output_path, 'w', encoding='utf-8') as out:
+        _write_text(out, block['text'])
+
+
+def measure(fn, file_path: str, output_path: str, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(file_path, output_path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(file_path, output_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mb", default="1,10,100")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'method':<10} {'time':>8} {'MB/s':>8} {'peak MB':>8} {'peak/size':>9}")
+    with tempfile.TemporaryDirectory() as work:
+        for size_mb in (int(size) for size in args.sizes_mb.split(',')):
+            source = os.path.join(work, f"source_{size_mb}.py")
+            make_file(source, size_mb)
+            outputs = {}
+            for name, fn in (("legacy", legacy_render), ("streaming", streaming_render)):
+                outputs[name] = os.path.join(work, f"{name}_{size_mb}.txt")
+                elapsed, peak = measure(fn, source, outputs[name], args.repeat)
+                print(f"{size_mb:>4}MB {name:<10} {elapsed:>7.3f}s {size_mb / elapsed:>8.1f} "
+                      f"{peak / 1e6:>8.1f} {peak / (size_mb * 1024 * 1024):>8.1f}x")
+            with open(outputs["legacy"], 'rb') as a, open(outputs["streaming"], 'rb') as b:
+                if a.read() != b.read():
+                    sys.exit(f"outputs differ for {size_mb} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Benchmark: cold-start time of the headless CLI vs. importing the Streamlit app.
+
+Runs each command in a fresh interpreter several times and reports the median
+wall time. Exits non-zero if the CLI's median exceeds --target-ms. Run from the
+repository root:
+
+    python benchmarks/bench_startup.py --runs 10 --target-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ("python (empty)", [sys.executable, "-c", "pass"]),
+    ("import code_aggregator", [sys.executable, "-c", "import code_aggregator"]),
+    ("cli --help", [sys.executable, "-m", "code_aggregator", "--help"]),
+    ("import app (streamlit)", [sys.executable, "-c", "import app"]),
+]
+
+
+def median_ms(command: list, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--target-ms", type=float, default=150)
+    args = parser.parse_args()
+
+    results = {}
+    for name, command in COMMANDS:
+        results[name] = median_ms(command, args.runs)
+        print(f"{name:<24} median={results[name]:8.1f} ms")
+
+    cli = results["cli --help"]
+    if cli > args.target_ms:
+        sys.exit(f"FAIL: CLI cold start {cli:.0f} ms exceeds target of {args.target_ms:.0f} ms")
+    print(f"OK: CLI cold start {cli:.0f} ms within target of {args.target_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Benchmark suite: folder list, tree preview, export and ZIP on synthetic repositories.
+
+For each tree size, generates (or reuses) a synthetic repository from
+synthetic_repo.py and times get_folders, get_file_tree, traverse_and_write_code
+and create_zip_archive separately, each in a fresh interpreter so no snapshot
+or import is shared and peak RSS is per stage. Reports files/s (tree files for
+the two walks, exported files for the rest), MB/s and peak RSS, and saves the
+results as JSON; --compare prints the change against an earlier results file.
+Trees are kept in --work-dir, so runs on different commits use the same input.
+Run from the repository root:
+
+    python benchmarks/bench_suite.py --files 10k,100k,1m --json before.json
+    python benchmarks/bench_suite.py --files 10k,100k,1m --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from code_aggregator import DEFAULT_EXCLUDED_DIRS, CodeAggregator  # noqa: E402
+from synthetic_repo import ensure_tree  # noqa: E402
+
+STAGES = ['get_folders', 'get_file_tree', 'traverse_and_write_code', 'create_zip_archive']
+
+
+def parse_count(value: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000."""
+    value = value.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * scale)
+
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak RSS counter (Linux only) so the next stage is measured alone."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_stage(stage: str, source: str, scratch: str, workers: int) -> Dict:
+    """Run one stage in this process and return its measurements."""
+    aggregator = CodeAggregator()
+    export_kwargs = dict(exclude_dirs=DEFAULT_EXCLUDED_DIRS, respect_gitignore=True,
+                         max_file_size_mb=10, workers=workers)
+    result = {'files': None, 'bytes': None}
+    if stage == 'create_zip_archive':
+        # The ZIP is built from the files of the preceding export, which is not timed
+        ok, message, _ = aggregator.traverse_and_write_code(source, os.path.join(scratch, 'export.txt'),
+                                                            **export_kwargs)
+        if not ok:
+            sys.exit(message)
+        reset_peak_rss()
+
+    start = time.perf_counter()
+    if stage == 'get_folders':
+        result['items'] = len(aggregator.get_folders(source))
+    elif stage == 'get_file_tree':
+        result['items'] = aggregator.get_file_tree(source, excluded_folders=DEFAULT_EXCLUDED_DIRS).count('\n')
+    elif stage == 'traverse_and_write_code':
+        ok, message, stats = aggregator.traverse_and_write_code(source, os.path.join(scratch, 'export.txt'),
+                                                                **export_kwargs)
+        if not ok:
+            sys.exit(message)
+        result['files'], result['bytes'] = stats['total_files'], stats['total_bytes']
+    elif stage == 'create_zip_archive':
+        ok, message, count = aggregator.create_zip_archive(os.path.join(scratch, 'export.zip'), workers=workers)
+        if not ok:
+            sys.exit(message)
+        result['files'], result['bytes'] = count, sum(f['size'] for f in aggregator.processed_files)
+    result['time'] = time.perf_counter() - start
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def measure(stage: str, source: str, tree: Dict, workers: int, repeat: int) -> Dict:
+    """Best of `repeat` runs of a stage, each in a fresh interpreter."""
+    best = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as scratch:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', stage,
+                                     '--source', source, '--scratch', scratch, '--workers', str(workers)],
+                                    capture_output=True, text=True, check=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        if best is None or run['time'] < best['time']:
+            best = run
+    if best['files'] is None:
+        best['files'] = tree['files']
+    best['files_per_sec'] = best['files'] / best['time']
+    best['mb_per_sec'] = best['bytes'] / 1e6 / best['time'] if best['bytes'] is not None else None
+    return best
+
+
+def git_revision() -> Optional[str]:
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return revision + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_comparison(results: List[Dict], baseline_path: str) -> None:
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    before = {(r['tree_files'], r['stage']): r for r in baseline['results']}
+    print(f"\nvs. {baseline_path} ({baseline.get('revision') or 'unknown revision'})")
+    print(f"{'files':>9} {'stage':<24} {'time':>16} {'peak RSS MB':>18}")
+    for r in results:
+        old = before.get((r['tree_files'], r['stage']))
+        if old is None:
+            continue
+        print(f"{r['tree_files']:>9,} {r['stage']:<24} {old['time']:>6.2f}s -> {r['time']:>6.2f}s "
+              f"{old['peak_rss_mb']:>7.1f} -> {r['peak_rss_mb']:>7.1f}  "
+              f"({old['time'] / r['time']:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", default="10k,100k", help="Tree sizes, comma-separated (e.g. 10k,100k,1m)")
+    parser.add_argument("--stages", default=','.join(STAGES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), 'code_aggregator_bench'),
+                        help="Where generated trees are kept between runs")
+    parser.add_argument("--json", help="Results file (default: <work-dir>/results/<revision>.json)")
+    parser.add_argument("--compare", metavar="JSON", help="Earlier results file to compare against")
+    parser.add_argument("--clean", action="store_true", help="Delete the generated trees afterwards")
+    # Internal: run a single stage and print its result
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--source", help=argparse.SUPPRESS)
+    parser.add_argument("--scratch", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_stage(args.child, args.source, args.scratch, args.workers)))
+        return
+
+    stages = [s for s in args.stages.split(',') if s]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"unknown stages: {', '.join(sorted(unknown))}")
+    os.makedirs(args.work_dir, exist_ok=True)
+    revision = git_revision()
+    results = []
+    print(f"{'files':>9} {'stage':<24} {'time':>8} {'files/s':>10} {'MB/s':>8} {'peak RSS MB':>12}")
+    for n_files in (parse_count(v) for v in args.files.split(',') if v.strip()):
+        start = time.perf_counter()
+        source = ensure_tree(args.work_dir, n_files, args.seed)
+        with open(source + '.json', encoding='utf-8') as f:
+            tree = json.load(f)
+        print(f"{n_files:>9,} tree: {tree['bytes'] / 1e6:,.1f} MB, ready in {time.perf_counter() - start:.1f}s")
+        for stage in stages:
+            result = measure(stage, source, tree, args.workers, args.repeat)
+            result.update(tree_files=n_files, stage=stage)
+            results.append(result)
+            mb_per_sec = f"{result['mb_per_sec']:>8.1f}" if result['mb_per_sec'] is not None else f"{'-':>8}"
+            print(f"{n_files:>9,} {stage:<24} {result['time']:>7.2f}s {result['files_per_sec']:>10,.0f} "
+                  f"{mb_per_sec} {result['peak_rss_mb']:>12.1f}")
+        if args.clean:
+            shutil.rmtree(source, ignore_errors=True)
+            os.remove(source + '.json')
+
+    json_path = args.json or os.path.join(args.work_dir, 'results', f"{revision or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(json_path)), exist_ok=True)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': revision,
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'settings': {'seed': args.seed, 'workers': args.workers, 'repeat': args.repeat},
+            'results': results,
+        }, f, indent=2)
+    print(f"\nresults saved to {json_path}")
+    if args.compare:
+        print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark: legacy walk-and-deflate ZIP vs. parallel ZIP from the accepted file set.
+
+Generates a synthetic repository (default 20,000 files), runs the text export
+once, then times the old approach (second os.walk, serial zipfile.write with
+ZIP_DEFLATED) against create_zip_archive at several worker counts. Run from
+the repository root:
+
+    python benchmarks/bench_zip.py --files 20000 --workers 1,4,8 --level 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import CodeAggregator  # noqa: E402
+
+
+def make_tree(root: str, n_files: int, size_kb: int) -> None:
+    line = "def function_%d(x):\n    return x * 2  # some code comment\n"
+    for i in range(n_files):
+        sub = os.path.join(root, f"pkg{i % 200}", f"mod{i % 7}")
+        os.makedirs(sub, exist_ok=True)
+        body = "".join(line % (i + j) for j in range(size_kb * 1024 // 50))
+        with open(os.path.join(sub, f"module_{i}.py"), "w", encoding="utf-8") as f:
+            f.write(body)
+
+
+def legacy_zip(source_dir: str, output_zip: str, level: int) -> int:
+    count = 0
+    with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=level) as zipf:
+        for root, dirs, files in os.walk(source_dir):
+            for file in files:
+                file_path = os.path.join(root, file)
+                zipf.write(file_path, os.path.relpath(file_path, source_dir))
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--size-kb", type=int, default=8)
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--level", type=int, default=6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, "src")
+        make_tree(source, args.files, args.size_kb)
+        aggregator = CodeAggregator()
+        ok, result, stats = aggregator.traverse_and_write_code(source, os.path.join(work, "export.txt"), workers=4)
+        if not ok:
+            sys.exit(f"aggregation failed: {result}")
+        print(f"exported {stats['total_files']} files")
+
+        output_zip = os.path.join(work, "export.zip")
+        start = time.perf_counter()
+        count = legacy_zip(source, output_zip, args.level)
+        baseline = time.perf_counter() - start
+        print(f"{'legacy':<12} members={count:>6}  time={baseline:.3f}s  size={os.path.getsize(output_zip) / 1e6:.1f} MB")
+
+        for workers in (int(w) for w in args.workers.split(',')):
+            os.remove(output_zip)
+            start = time.perf_counter()
+            ok, result, count = aggregator.create_zip_archive(output_zip, compression_level=args.level,
+                                                              workers=workers)
+            elapsed = time.perf_counter() - start
+            if not ok:
+                sys.exit(f"zip failed: {result}")
+            print(f"workers={workers:<4} members={count:>6}  time={elapsed:.3f}s  "
+                  f"size={os.path.getsize(output_zip) / 1e6:.1f} MB  speedup={baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Deterministic synthetic repositories for the benchmark suite.
+
+A tree of N files mixes the extensions in COMPLETE_EXTENSIONS with a few
+binaries, non-UTF-8 text files (latin-1 / cp1252, so chardet runs), a deeply
+nested chain of folders, gitignored logs and large node_modules / .venv /
+build style folders that the default exclusions skip. The same (files, seed)
+pair always produces the same tree, so results from different commits are
+comparable. Can also be run directly to create a tree:
+
+    python benchmarks/synthetic_repo.py /tmp/tree --files 100000 --seed 0
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_aggregator import COMPLETE_EXTENSIONS  # noqa: E402
+
+# Bump when the layout changes so cached trees are regenerated
+GENERATOR_VERSION = 1
+
+# Share of files per kind; the rest are ordinary UTF-8 source files
+EXCLUDED_SHARE = 0.25   # node_modules, .venv, build, dist
+DEEP_SHARE = 0.05       # one chain of folders up to DEEP_LEVELS deep
+BINARY_SHARE = 0.02
+NON_UTF8_SHARE = 0.02
+IGNORED_SHARE = 0.01    # *.log files matched by the root .gitignore
+
+DEEP_LEVELS = 24
+FILES_PER_DIR = 40
+MAX_FILE_BYTES = 256 * 1024
+
+# Most real trees are dominated by a handful of languages
+COMMON_EXTENSIONS = ['.py', '.js', '.ts', '.tsx', '.java', '.go', '.rs', '.c', '.h', '.cpp',
+                     '.md', '.json', '.yml', '.html', '.css', '.sql', '.sh', '.toml']
+
+SOURCE_LINE = "    value_{0} = compute(items[{0}], key='field_{0}')  # generated line\n"
+NON_UTF8_LINES = {
+    'latin-1': "# Größe, Straße, déjà vu, naïve café {0}\n",
+    'cp1252': "// “quoted” – text — with € signs {0}\n",
+}
+
+
+def _text_blob() -> str:
+    """About 2 MB of source-like text that file bodies are sliced from."""
+    return ''.join(SOURCE_LINE.format(i) for i in range(32768))
+
+
+def _file_size(rng: random.Random) -> int:
+    # Log-normal around 2 KB: many small files, a long tail of large ones
+    return max(64, min(MAX_FILE_BYTES, int(rng.lognormvariate(7.6, 1.1))))
+
+
+def tree_layout(n_files: int, seed: int = 0):
+    """Yield (relative path, kind, size) for every file of the tree, deterministically."""
+    rng = random.Random(seed)
+    extensions = sorted(COMPLETE_EXTENSIONS)
+    excluded_roots = ['node_modules', '.venv/lib/python3.11/site-packages', 'build', 'dist']
+    excluded = int(n_files * EXCLUDED_SHARE)
+    deep = excluded + int(n_files * DEEP_SHARE)
+    for index in range(n_files):
+        if index < excluded:
+            root = excluded_roots[index % len(excluded_roots)]
+            folder = os.path.join(root, f"pkg{index // (FILES_PER_DIR * 8)}", f"lib{index // FILES_PER_DIR % 8}")
+        elif index < deep:
+            depth = 1 + index % DEEP_LEVELS
+            folder = os.path.join('src', 'deep', *(f"level{i}" for i in range(depth)))
+        else:
+            local = index - deep
+            folder = os.path.join('src', f"pkg{local // (FILES_PER_DIR * 10)}", f"mod{local // FILES_PER_DIR % 10}")
+
+        roll = rng.random()
+        if roll < BINARY_SHARE:
+            kind = 'binary'
+        elif roll < BINARY_SHARE + NON_UTF8_SHARE:
+            kind = rng.choice(sorted(NON_UTF8_LINES))
+        elif roll < BINARY_SHARE + NON_UTF8_SHARE + IGNORED_SHARE:
+            kind = 'ignored'
+        else:
+            kind = 'text'
+        if kind == 'ignored':
+            ext = '.log'
+        elif rng.random() < 0.8:
+            ext = rng.choice(COMMON_EXTENSIONS)
+        else:
+            ext = rng.choice(extensions)
+        yield os.path.join(folder, f"file_{index}{ext}"), kind, _file_size(rng)
+
+
+def generate(root: str, n_files: int, seed: int = 0) -> Dict:
+    """Write the tree under root (which must not exist) and return a summary of what was written."""
+    os.makedirs(root)
+    with open(os.path.join(root, '.gitignore'), 'w', encoding='utf-8') as f:
+        f.write("*.log\ncoverage/\n")
+    blob = _text_blob()
+    binary = bytes(range(256)) * (MAX_FILE_BYTES // 256)
+    summary = {'files': n_files, 'seed': seed, 'bytes': 0, 'kinds': {}, 'version': GENERATOR_VERSION}
+    made = set()
+    for index, (rel_path, kind, size) in enumerate(tree_layout(n_files, seed)):
+        folder = os.path.dirname(rel_path)
+        if folder not in made:
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+            made.add(folder)
+        if kind == 'binary':
+            data = binary[:size]
+        elif kind in NON_UTF8_LINES:
+            line = NON_UTF8_LINES[kind]
+            data = ''.join(line.format(i) for i in range(size // len(line) + 1)).encode(kind)[:size]
+        else:
+            # A unique first line keeps files distinct for deduplication and caching
+            start = (index * 7919) % (len(blob) - size)
+            data = (f"# file {index}\n" + blob[start:start + size]).encode('utf-8')
+        with open(os.path.join(root, rel_path), 'wb') as f:
+            f.write(data)
+        summary['bytes'] += len(data)
+        summary['kinds'][kind] = summary['kinds'].get(kind, 0) + 1
+    return summary
+
+
+def ensure_tree(work_dir: str, n_files: int, seed: int = 0) -> str:
+    """Return a tree for (n_files, seed) under work_dir, generating it unless a complete one exists."""
+    root = os.path.join(work_dir, f"tree_{n_files}_s{seed}")
+    marker = root + '.json'
+    if os.path.exists(marker):
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f).get('version') == GENERATOR_VERSION and os.path.isdir(root):
+                return root
+    # Missing, outdated or interrupted: start over
+    if os.path.exists(marker):
+        os.remove(marker)
+    shutil.rmtree(root, ignore_errors=True)
+    summary = generate(root, n_files, seed)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to create")
+    parser.add_argument("--files", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.root):
+        sys.exit(f"{args.root} already exists")
+    summary = generate(args.root, args.files, args.seed)
+    print(f"wrote {summary['files']:,} files, {summary['bytes'] / 1e6:,.1f} MB: {summary['kinds']}")
+
+
+if __name__ == "__main__":
+    main()
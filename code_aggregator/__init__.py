@@ -0,0 +1,60 @@
+"""Streamlit-free core of the Ultimate Code Aggregator.
+
+Import CodeAggregator from here to script exports, or run the command line
+front end with ``python -m code_aggregator --help``.
+"""
+from .engine import (
+    COMPRESSION_SUFFIXES,
+    EXPORT_MIME_TYPES,
+    LARGE_FILE_BYTES,
+    AggregationCache,
+    AggregationCancelled,
+    AggregationJob,
+    BackgroundWriter,
+    BatchAggregator,
+    CodeAggregator,
+    DirectorySnapshot,
+    EncodingDetector,
+    ExclusionTrie,
+    ExportCheckpoint,
+    GitIndexSnapshot,
+    GitIgnoreMatcher,
+    ShardedExportWriter,
+    SnapshotRegistry,
+    StageTimer,
+    available_compressions,
+    estimate_tokens,
+    open_export_reader,
+    open_export_writer,
+    read_git_index,
+)
+from .extensions import COMPLETE_EXTENSIONS, DEFAULT_EXCLUDED_DIRS, EXTENSION_CATEGORIES
+
+__all__ = [
+    'COMPLETE_EXTENSIONS',
+    'COMPRESSION_SUFFIXES',
+    'DEFAULT_EXCLUDED_DIRS',
+    'EXPORT_MIME_TYPES',
+    'EXTENSION_CATEGORIES',
+    'LARGE_FILE_BYTES',
+    'AggregationCache',
+    'AggregationCancelled',
+    'AggregationJob',
+    'BackgroundWriter',
+    'BatchAggregator',
+    'CodeAggregator',
+    'DirectorySnapshot',
+    'EncodingDetector',
+    'ExclusionTrie',
+    'ExportCheckpoint',
+    'GitIndexSnapshot',
+    'GitIgnoreMatcher',
+    'ShardedExportWriter',
+    'SnapshotRegistry',
+    'StageTimer',
+    'available_compressions',
+    'estimate_tokens',
+    'open_export_reader',
+    'open_export_writer',
+    'read_git_index',
+]
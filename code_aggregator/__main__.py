@@ -0,0 +1,6 @@
+"""Allow ``python -m code_aggregator``."""
+import sys
+
+from .cli import main
+
+sys.exit(main())
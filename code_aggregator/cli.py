@@ -0,0 +1,248 @@
+"""Command line front end: the Streamlit sidebar options as flags.
+
+    python -m code_aggregator ./my-project -o export.txt --workers 8 --zip
+    python -m code_aggregator --batch-children ~/services -o exports/ --jobs 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import datetime
+from typing import List, Optional
+
+from .engine import COMPRESSION_SUFFIXES, BatchAggregator, CodeAggregator, available_compressions
+from .extensions import DEFAULT_EXCLUDED_DIRS, EXTENSION_CATEGORIES
+
+
+def _split_extensions(value: str) -> List[str]:
+    return ['.' + ext.strip().lstrip('.') for ext in value.split(',') if ext.strip()]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m code_aggregator',
+        description="Aggregate the code files of a directory into a single export.",
+        fromfile_prefix_chars='@',
+    )
+    parser.add_argument('source_dir', nargs='+',
+                        help="Directory to aggregate (several with --batch; @FILE reads them one per line)")
+    parser.add_argument('-o', '--output',
+                        help="Output file (default: code_export_<timestamp>.txt plus compression suffix); "
+                             "with --batch, the output folder (default: code_export_<timestamp>)")
+
+    files = parser.add_argument_group("file types")
+    files.add_argument('--category', action='append', choices=list(EXTENSION_CATEGORIES), dest='categories',
+                       help="Include a file-type category; repeatable (default: all categories)")
+    files.add_argument('--ext', default='', help="Custom extensions to include, comma-separated")
+    files.add_argument('--exclude-ext', default='', help="Extensions to skip, comma-separated")
+
+    features = parser.add_argument_group("features")
+    features.add_argument('--line-numbers', action='store_true', help="Add line numbers to each file")
+    features.add_argument('--no-gitignore', action='store_true', help="Do not skip files listed in .gitignore")
+    features.add_argument('--git-tracked', action='store_true',
+                          help="In a git work tree, export only tracked files, listed from the git index "
+                               "instead of walking the folder")
+    features.add_argument('--include-hidden', action='store_true',
+                          help="Include files and folders starting with '.'")
+    features.add_argument('--exclude', action='append', default=[], metavar='FOLDER',
+                          help="Folder to exclude (name or relative path); repeatable")
+    features.add_argument('--no-default-excludes', action='store_true',
+                          help=f"Do not exclude {', '.join(DEFAULT_EXCLUDED_DIRS)}")
+    features.add_argument('--dedup', action='store_true',
+                          help="Write identical file contents once; later copies reference the first")
+    features.add_argument('--max-file-size-mb', type=float, default=10, help="Skip larger files (default: 10)")
+    features.add_argument('--zip', action='store_true', help="Also write a ZIP of the exported files")
+    features.add_argument('--zip-level', type=int, default=6, choices=range(10), metavar='0-9',
+                          help="ZIP deflate level (default: 6)")
+
+    output = parser.add_argument_group("output")
+    output.add_argument('--compression', choices=available_compressions(),
+                        help="Compress the export while writing it")
+    output.add_argument('--compression-level', type=int, help="Codec-specific compression level")
+    output.add_argument('--background-compression', action='store_true',
+                        help="Compress on a separate thread")
+    output.add_argument('--shard-tokens', type=int, metavar='N',
+                        help="Split the export into shards of at most N estimated tokens, plus a manifest")
+    output.add_argument('--shard-bytes', type=int, metavar='N',
+                        help="Split the export into shards of at most N bytes, plus a manifest")
+
+    performance = parser.add_argument_group("performance")
+    performance.add_argument('--workers', type=int,
+                             help="Files read and prepared concurrently (default: min(4, CPUs); 1 with --batch)")
+    performance.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                             help="Worker pool type (default: thread)")
+    performance.add_argument('--cache', action='store_true',
+                             help="Reuse prepared blocks of unchanged files from previous exports")
+    performance.add_argument('--cache-dir', help="Persistent cache location (implies --cache)")
+    performance.add_argument('--checkpoint', metavar='PATH',
+                             help="Save progress to PATH periodically so an interrupted export can be resumed")
+    performance.add_argument('--checkpoint-interval', type=float, default=30, metavar='SECONDS',
+                             help="Seconds between checkpoints (default: 30)")
+    performance.add_argument('--resume', action='store_true',
+                             help="Continue from --checkpoint if it was saved with the same settings")
+    performance.add_argument('--profile', action='store_true',
+                             help="Time each stage and find the slowest files; saved as <output>.timings.json")
+
+    batch = parser.add_argument_group("batch")
+    batch.add_argument('--batch', action='store_true',
+                       help="Export each source_dir separately into the -o folder, plus a combined "
+                            f"{BatchAggregator.SUMMARY_NAME}")
+    batch.add_argument('--batch-children', action='store_true',
+                       help="Like --batch, with every child folder of each source_dir as a repository")
+    batch.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                       help="Repositories exported at once, each in its own process (default: CPUs)")
+    batch.add_argument('--memory-limit-mb', type=float, metavar='MB',
+                       help="Only start another repository while the running ones' expected peak memory fits")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print errors")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    batch = args.batch or args.batch_children
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if len(args.source_dir) > 1 and not batch:
+        parser.error("several source directories need --batch")
+    if batch and (args.checkpoint or args.zip or args.executor == 'process'):
+        parser.error("--batch does not support --checkpoint, --zip or --executor process")
+    for source_dir in args.source_dir:
+        if not os.path.isdir(source_dir):
+            print(f"error: directory not found: {source_dir}", file=sys.stderr)
+            return 2
+
+    include_ext = [ext for name in (args.categories or EXTENSION_CATEGORIES)
+                   for ext in EXTENSION_CATEGORIES[name]]
+    include_ext = list(set(include_ext + _split_extensions(args.ext)))
+    exclude_dirs = list(args.exclude)
+    if not args.no_default_excludes:
+        exclude_dirs.extend(d for d in DEFAULT_EXCLUDED_DIRS if d not in exclude_dirs)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    cache_dir = args.cache_dir
+    if args.cache and not cache_dir:
+        cache_dir = os.path.join(tempfile.gettempdir(), 'code_aggregator_cache')
+    export_kwargs = dict(
+        include_ext=include_ext,
+        exclude_ext=_split_extensions(args.exclude_ext),
+        exclude_dirs=exclude_dirs,
+        include_line_numbers=args.line_numbers,
+        respect_gitignore=not args.no_gitignore,
+        max_file_size_mb=args.max_file_size_mb,
+        include_hidden=args.include_hidden,
+        workers=args.workers or (1 if batch else min(4, os.cpu_count() or 1)),
+        executor_type=args.executor,
+        cache_dir=cache_dir,
+        compression=args.compression,
+        compression_level=args.compression_level,
+        background_compression=args.background_compression,
+        shard_max_bytes=args.shard_bytes,
+        shard_max_tokens=args.shard_tokens,
+        deduplicate=args.dedup,
+        profile=args.profile,
+        git_tracked=args.git_tracked,
+    )
+    if batch:
+        return _run_batch(args, export_kwargs, args.output or f"code_export_{timestamp}")
+    
+    output_file = args.output
+    if not output_file:
+        output_file = f"code_export_{timestamp}.txt{COMPRESSION_SUFFIXES.get(args.compression, '')}"
+
+    def report_progress(progress: dict) -> None:
+        eta = f"{progress['eta']:.0f}s" if progress['eta'] is not None else "?"
+        print(f"\r{progress['files_done']:,}/{progress['files_total']:,} files  "
+              f"{progress['bytes_done'] / 1e6:,.1f}/{progress['bytes_total'] / 1e6:,.1f} MB  "
+              f"{progress['bytes_per_sec'] / 1e6:,.1f} MB/s  ETA {eta}   ",
+              end='', file=sys.stderr, flush=True)
+
+    show_progress = not args.quiet and sys.stderr.isatty()
+    aggregator = CodeAggregator(progress_callback=report_progress if show_progress else None,
+                                error_callback=lambda message: print(message, file=sys.stderr))
+    success, result, stats = aggregator.traverse_and_write_code(
+        source_dir=args.source_dir[0],
+        output_file=output_file,
+        **export_kwargs,
+        checkpoint_path=args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+        resume=args.resume,
+    )
+    if show_progress:
+        print(file=sys.stderr)
+    if not success:
+        print(f"error: {result}", file=sys.stderr)
+        return 1
+
+    if not args.quiet:
+        print(f"Wrote {result}")
+        print(f"  files: {stats['total_files']:,}  lines: {stats['total_lines']:,}  "
+              f"bytes: {stats['total_bytes']:,}  time: {stats['processing_time']:.2f}s")
+        print(f"  skipped: {stats['binary_files']} binary, {stats['large_files']} large, "
+              f"{stats['ignored_files']} ignored; errors: {stats['errors']}")
+        if stats['file_source'] != 'walk':
+            print(f"  listed from: {stats['file_source']} (tracked files only)")
+        if stats['resumed_files']:
+            print(f"  resumed: {stats['resumed_files']:,} files were already exported by an interrupted run")
+        if stats['duplicate_files']:
+            print(f"  duplicates: {stats['duplicate_files']:,} files referenced, "
+                  f"{stats['duplicate_bytes_saved']:,} bytes saved")
+        if 'shards' in stats:
+            shards = stats['shards']
+            print(f"  shards: {len(shards)}  largest: {max(s['tokens'] for s in shards):,} tokens / "
+                  f"{max(s['bytes'] for s in shards):,} bytes")
+        if 'timings' in stats:
+            timings = stats['timings']
+            print(f"  timings: {timings['files_per_sec']:,.0f} files/s, "
+                  f"{timings['bytes_per_sec'] / 1e6:,.1f} MB/s; saved to {stats['timings_path']}")
+            for stage in timings['stages'][:6]:
+                print(f"    {stage['stage']:<20} {stage['seconds']:8.3f}s {stage['calls']:>9,} calls  ({stage['where']})")
+            for slow in timings['slowest_files'][:3]:
+                print(f"    slow: {slow['path']} ({slow['seconds'] * 1000:.1f} ms)")
+
+    if args.zip and stats['total_files'] > 0:
+        base = output_file
+        suffix = COMPRESSION_SUFFIXES.get(args.compression, '')
+        if suffix and base.endswith(suffix):
+            base = base[:-len(suffix)]
+        zip_path = os.path.splitext(base)[0] + '.zip'
+        zip_success, zip_result, zip_count = aggregator.create_zip_archive(
+            zip_path, compression_level=args.zip_level, workers=export_kwargs['workers'])
+        if not zip_success:
+            print(f"error: ZIP failed: {zip_result}", file=sys.stderr)
+            return 1
+        if not args.quiet:
+            print(f"Wrote {zip_result} ({zip_count} files)")
+    return 0
+
+
+def _run_batch(args: argparse.Namespace, export_kwargs: dict, output_dir: str) -> int:
+    sources = []
+    for source_dir in args.source_dir:
+        sources.extend(BatchAggregator.find_repositories(source_dir) if args.batch_children else [source_dir])
+    
+    def report_job(job: dict) -> None:
+        if job['success'] and not args.quiet:
+            print(f"[{job['done']}/{job['total']}] ok      {job['source_dir']}  "
+                  f"{job['stats']['total_files']:,} files  {job['seconds']:.1f}s")
+        elif not job['success']:
+            print(f"[{job['done']}/{job['total']}] FAILED  {job['source_dir']}: {job['error']}", file=sys.stderr)
+    
+    batcher = BatchAggregator(args.jobs, args.memory_limit_mb, progress_callback=report_job)
+    success, result, summary = batcher.run(sources, output_dir, **export_kwargs)
+    if not success:
+        print(f"error: {result}", file=sys.stderr)
+        return 1
+    
+    if not args.quiet:
+        totals = summary['totals']
+        peak = summary['peak_job_rss_mb']
+        print(f"Wrote {result}")
+        print(f"  repositories: {summary['succeeded']:,} exported, {summary['failed']:,} failed  "
+              f"time: {summary['wall_time']:.2f}s  largest job: {f'{peak:,.0f} MB' if peak else '?'}")
+        if totals:
+            print(f"  files: {totals['total_files']:,}  lines: {totals['total_lines']:,}  "
+                  f"bytes: {totals['total_bytes']:,}")
+            print(f"  skipped: {totals['binary_files']} binary, {totals['large_files']} large, "
+                  f"{totals['ignored_files']} ignored; errors: {totals['errors']}")
+    return 1 if summary['failed'] else 0
@@ -0,0 +1,2813 @@
+"""Aggregation engine: walking, filtering, decoding and writing code exports.
+
+Nothing here imports Streamlit, so the engine can be scripted or driven from
+the command line (see code_aggregator.cli) as well as from app.py.
+"""
+import os
+import re
+import gzip
+import codecs
+import functools
+import hashlib
+import heapq
+import secrets
+import importlib.util
+import io
+import itertools
+import json
+import logging
+import lzma
+import math
+import queue
+import stat
+import struct
+import sys
+from datetime import datetime
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple, Optional
+import threading
+import zlib
+
+from .extensions import COMPLETE_EXTENSIONS
+
+if TYPE_CHECKING:
+    import zipfile
+
+logger = logging.getLogger(__name__)
+
+def _glob_to_regex(pattern: str) -> str:
+    """Translate one gitignore glob (no leading/trailing slash) into a regex fragment."""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    out.append('.*')  # trailing "/**": everything inside
+                    i += 2
+                    continue
+                if pattern[i + 2] == '/':
+                    out.append('(?:.*/)?')  # "**/": zero or more directories
+                    i += 3
+                    continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            out.append('[^/]*')
+            continue
+        if c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            j = i + 1
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                out.append('\\[')
+            else:
+                body = pattern[i + 1:j].replace('\\', '\\\\')
+                if body[0] in '!^':
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = j
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+class GitIgnoreMatcher:
+    """Compiled .gitignore rules for one source tree.
+    
+    Reads .git/info/exclude and the root .gitignore up front, and nested
+    .gitignore files as the walk enters each directory. Each ignore file is
+    compiled into lookup tables: literal basenames and "*.ext" suffixes go into
+    dicts, remaining globs into alternation regexes bucketed by leading character.
+    A path is resolved by the highest-numbered matching rule, which is git's
+    "last match wins" precedence; deeper ignore files override their parents.
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+        self._scopes: Dict[str, Tuple] = {}
+        self._chains: Dict[str, List[Tuple]] = {}
+        
+        lines = []
+        for path in (os.path.join(root, '.git', 'info', 'exclude'), os.path.join(root, '.gitignore')):
+            lines.extend(self._read_lines(path))
+        self._add_scope('', lines)
+    
+    @staticmethod
+    def _read_lines(path: str) -> List[str]:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                return f.read().splitlines()
+        except OSError:
+            return []
+    
+    @staticmethod
+    def parse_rule(line: str) -> Optional[Tuple[str, bool, bool, bool]]:
+        """Parse one ignore-file line into (glob, negate, dir_only, anchored), or None for blanks/comments."""
+        if not line or line.startswith('#'):
+            return None
+        # Trailing spaces are ignored unless escaped
+        while line.endswith(' ') and not line.endswith('\\ '):
+            line = line[:-1]
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        # A slash at the start or middle anchors the pattern to the ignore file's directory
+        anchored = '/' in line
+        line = line.lstrip('/')
+        if not line:
+            return None
+        return line, negate, dir_only, anchored
+    
+    @staticmethod
+    def _compile_rules(rules: List[Tuple[int, Tuple[str, bool, bool, bool]]]) -> Optional[Tuple]:
+        """Index (rule_number, rule) pairs into (names, suffixes, basename, path and deep regex indexes)."""
+        if not rules:
+            return None
+        names: Dict[str, int] = {}
+        suffixes: Dict[str, int] = {}
+        basename_globs, path_globs, deep_globs = [], [], []
+        for number, (glob, _, _, anchored) in rules:
+            # "**/x" means "x" at any depth
+            deep = False
+            while anchored and glob.startswith('**/'):
+                glob, deep = glob[3:], True
+                anchored = '/' in glob
+            if anchored and deep:
+                # Tried at each segment boundary instead of backtracking over ".*/"
+                deep_globs.append((number, glob))
+            elif anchored:
+                path_globs.append((number, glob))
+            elif not any(c in glob for c in '*?[\\'):
+                names[glob] = number
+            elif glob.startswith('*.') and not any(c in glob[1:] for c in '*?[\\'):
+                suffixes[glob[1:]] = number
+            else:
+                basename_globs.append((number, glob))
+        
+        def combine(globs):
+            # Bucket by leading literal character ('' for wildcards) so a lookup only
+            # tries rules that can match; within a bucket rules are reversed so the
+            # first alternative that matches is the last rule in the file
+            buckets: Dict[str, List[Tuple[int, str]]] = {}
+            for number, glob in globs:
+                key = '' if glob[0] in '*?[\\' else glob[0]
+                buckets.setdefault(key, []).append((number, glob))
+            index = {}
+            for key, bucket in buckets.items():
+                bucket.reverse()
+                pattern = '|'.join(f'({_glob_to_regex(glob)})' for _, glob in bucket)
+                index[key] = (re.compile(f'(?:{pattern})\\Z', re.DOTALL), [number for number, _ in bucket])
+            return index
+        
+        return names, suffixes, combine(basename_globs), combine(path_globs), combine(deep_globs)
+    
+    def _add_scope(self, base: str, lines: List[str]) -> None:
+        rules = tuple(rule for rule in (self.parse_rule(line) for line in lines) if rule)
+        if not rules:
+            return
+        self._scopes[base] = (base,) + self._compile_scope(rules)
+    
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _compile_scope(rules: Tuple[Tuple[str, bool, bool, bool], ...]) -> Tuple:
+        """Negations plus compiled directory and file rules of one ignore file.
+        
+        Cached per process: the same .gitignore often recurs within a tree and across
+        the repositories of a batch, and the compiled tables are only ever read.
+        """
+        numbered = list(enumerate(rules))
+        negations = [rule[1] for rule in rules]
+        dir_rules = GitIgnoreMatcher._compile_rules(numbered)
+        file_rules = GitIgnoreMatcher._compile_rules([(n, rule) for n, rule in numbered if not rule[2]])
+        return negations, dir_rules, file_rules
+    
+    @staticmethod
+    def _match_index(index: Dict[str, Tuple], subject: str, pos: int = 0) -> int:
+        best = -1
+        for key in (subject[pos:pos + 1], ''):
+            entry = index.get(key)
+            if entry is not None:
+                match = entry[0].match(subject, pos)
+                if match:
+                    best = max(best, entry[1][match.lastindex - 1])
+        return best
+    
+    @classmethod
+    def _last_match(cls, compiled: Tuple, rel_path: str, name: str) -> int:
+        names, suffixes, basename_index, path_index, deep_index = compiled
+        best = names.get(name, -1)
+        if suffixes:
+            dot = name.find('.')
+            while dot != -1:
+                best = max(best, suffixes.get(name[dot:], -1))
+                dot = name.find('.', dot + 1)
+        if basename_index:
+            best = max(best, cls._match_index(basename_index, name))
+        if path_index:
+            best = max(best, cls._match_index(path_index, rel_path))
+        if deep_index:
+            start = 0
+            while start != -1:
+                best = max(best, cls._match_index(deep_index, rel_path, start))
+                start = rel_path.find('/', start) + 1 or -1
+        return best
+    
+    def enter_directory(self, rel_dir: str, has_gitignore: bool) -> None:
+        """Register a directory reached by the walk, loading its .gitignore if it has one.
+        
+        rel_dir uses '/' separators and '' for the root.
+        """
+        if rel_dir and has_gitignore:
+            self._add_scope(rel_dir, self._read_lines(os.path.join(self.root, rel_dir, '.gitignore')))
+        parent_chain = []
+        if rel_dir:
+            parent = rel_dir.rpartition('/')[0]
+            if parent not in self._chains:
+                self.enter_directory(parent, False)
+            parent_chain = self._chains[parent]
+        scope = self._scopes.get(rel_dir)
+        self._chains[rel_dir] = [scope] + parent_chain if scope else parent_chain
+    
+    def is_ignored(self, rel_path: str, is_dir: bool) -> bool:
+        """Return True if rel_path ('/'-separated, relative to root) is ignored."""
+        parent, _, name = rel_path.rpartition('/')
+        chain = self._chains.get(parent)
+        if chain is None:
+            self.enter_directory(parent, False)
+            chain = self._chains[parent]
+        # Deeper ignore files take precedence over their parents
+        for base, negations, dir_rules, file_rules in chain:
+            compiled = dir_rules if is_dir else file_rules
+            if compiled is None:
+                continue
+            best = self._last_match(compiled, rel_path[len(base) + 1:] if base else rel_path, name)
+            if best >= 0:
+                return not negations[best]
+        return False
+
+class ExclusionTrie:
+    """Excluded folders indexed by path component.
+    
+    'build' excludes build/ and everything below it but not buildtools/, and a
+    walker pays one dict lookup per child directory regardless of how many
+    folders are excluded.
+    """
+    
+    _EXCLUDED = ''  # Marker key; real path components are never empty
+    
+    def __init__(self, paths: Optional[List[str]] = None):
+        self._root: Dict[str, Dict] = {}
+        for path in paths or []:
+            self.add(path)
+    
+    @staticmethod
+    def _components(rel_path: str) -> List[str]:
+        rel_path = rel_path.replace('\\', '/').replace(os.sep, '/')
+        return [part for part in rel_path.split('/') if part and part != '.']
+    
+    def add(self, rel_path: str) -> None:
+        parts = self._components(rel_path)
+        if not parts:
+            return
+        node = self._root
+        for part in parts:
+            node = node.setdefault(part, {})
+        node[self._EXCLUDED] = {}
+    
+    def __bool__(self) -> bool:
+        return bool(self._root)
+    
+    def is_excluded(self, rel_path: str) -> bool:
+        """Return True if rel_path is an excluded folder or lies inside one."""
+        node = self._root
+        for part in self._components(rel_path):
+            node = node.get(part)
+            if node is None:
+                return False
+            if self._EXCLUDED in node:
+                return True
+        return False
+    
+    def prune(self, rel_dir: str, dirs: List[str]) -> List[str]:
+        """Return the subdirectory names of rel_dir that are not excluded."""
+        node = self._root
+        for part in self._components(rel_dir):
+            node = node.get(part)
+            if node is None:
+                return dirs
+        if not node:
+            return dirs
+        return [d for d in dirs if self._EXCLUDED not in node.get(d, ())]
+
+class DirectorySnapshot:
+    """Cached os.scandir listing of one source tree, shared by every walker.
+    
+    Directories are scanned lazily the first time a walk reaches them, capturing
+    entry names, types, sizes and mtimes, so pruned folders (node_modules, .git,
+    excluded paths) are never listed. refresh() re-stats the scanned directories
+    and drops any whose mtime changed so they are rescanned on the next walk.
+    """
+    
+    _serials = itertools.count()
+    
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.serial = next(self._serials)  # Distinguishes a rebuilt snapshot of the same root
+        self.generation = 0  # Bumped whenever refresh() finds a change
+        # rel_dir -> (dir mtime_ns, sorted subdir names, symlinked subdir names, {file: (size, mtime_ns, inode) or None})
+        self._listings: Dict[str, Tuple[int, List[str], set, Dict[str, Optional[Tuple[int, int, int]]]]] = {}
+        self._lock = threading.RLock()
+    
+    def _scan(self, rel_dir: str):
+        path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+            dirs, links, files = [], set(), {}
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                        if entry.is_symlink():
+                            links.add(entry.name)  # Listed but not descended, like os.walk
+                        continue
+                    try:
+                        st_info = entry.stat()
+                        files[entry.name] = (st_info.st_size, st_info.st_mtime_ns, st_info.st_ino)
+                    except OSError:
+                        files[entry.name] = None
+        except OSError:
+            return None
+        dirs.sort()
+        return dir_mtime, dirs, links, dict(sorted(files.items()))
+    
+    def _listing(self, rel_dir: str):
+        listing = self._listings.get(rel_dir)
+        if listing is None:
+            with self._lock:
+                listing = self._listings.get(rel_dir)
+                if listing is None:
+                    listing = self._scan(rel_dir)
+                    if listing is not None:
+                        self._listings[rel_dir] = listing
+        return listing
+    
+    @staticmethod
+    def _rel(rel_dir: str) -> str:
+        return '' if rel_dir in ('', '.') else rel_dir
+    
+    def walk(self, top: Optional[str] = None):
+        """Top-down (root, dirs, files) generator with the os.walk contract.
+        
+        Callers may prune or reorder `dirs` in place. Paths are joined onto `top`
+        (default: the snapshot root) so output matches os.walk(top).
+        """
+        top = self.root if top is None else top
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            listing = self._listing(rel_dir)
+            if listing is None:
+                continue
+            _, subdirs, links, files = listing
+            dirs = list(subdirs)
+            yield (os.path.join(top, rel_dir) if rel_dir else top), dirs, list(files)
+            for name in reversed(dirs):
+                if name not in links:
+                    stack.append(os.path.join(rel_dir, name) if rel_dir else name)
+    
+    def subdirs(self, rel_dir: str = '') -> List[str]:
+        """Sorted subfolder names of one folder, scanning only that folder if needed."""
+        listing = self._listing(self._rel(rel_dir))
+        return list(listing[1]) if listing is not None else []
+    
+    def file_info(self, rel_dir: str, name: str) -> Optional[Tuple[int, int, int]]:
+        """Return (size, mtime_ns, inode) captured for a file, or None if it could not be stat'ed."""
+        listing = self._listing(self._rel(rel_dir))
+        return listing[3].get(name) if listing is not None else None
+    
+    @property
+    def change_token(self) -> str:
+        """Cheap key that changes whenever refresh() (or a rebuild) may have changed listings.
+        
+        Memoized views of the tree (folder list, preview) include it in their cache key.
+        """
+        return f"{self.serial}:{self.generation}"
+    
+    def refresh(self, check_files: bool = False) -> bool:
+        """Drop scanned directories whose mtime changed; return True if anything was dropped.
+        
+        Directory mtimes only change when entries are added, removed or renamed,
+        so check_files=True also re-stats cached files to catch in-place edits.
+        """
+        changed = False
+        with self._lock:
+            for rel_dir, (dir_mtime, _, _, files) in list(self._listings.items()):
+                path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+                try:
+                    stale = os.stat(path).st_mtime_ns != dir_mtime
+                except OSError:
+                    stale = True
+                if not stale and check_files:
+                    for name, info in files.items():
+                        try:
+                            st_info = os.stat(os.path.join(path, name))
+                            current = (st_info.st_size, st_info.st_mtime_ns, st_info.st_ino)
+                        except OSError:
+                            current = None
+                        if current != info:
+                            stale = True
+                            break
+                if stale:
+                    del self._listings[rel_dir]
+                    changed = True
+            if changed:
+                self.generation += 1
+        return changed
+
+def _find_git_dir(path: str) -> Optional[Tuple[str, str]]:
+    """Return (work tree root, git dir) of the repository containing path, or None."""
+    current = os.path.abspath(path)
+    while True:
+        dot_git = os.path.join(current, '.git')
+        if os.path.isdir(dot_git):
+            return current, dot_git
+        if os.path.isfile(dot_git):
+            # Worktrees and submodules: ".git" is a file pointing at the real git dir
+            try:
+                with open(dot_git, 'r', encoding='utf-8') as f:
+                    line = f.readline().strip()
+            except OSError:
+                return None
+            if line.startswith('gitdir:'):
+                return current, os.path.normpath(os.path.join(current, line[len('gitdir:'):].strip()))
+            return None
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+def _git_hash_size(git_dir: str) -> int:
+    """20 for SHA-1 repositories, 32 when extensions.objectFormat is sha256."""
+    config_dirs = [git_dir]
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+            config_dirs.append(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        pass
+    for config_dir in config_dirs:
+        try:
+            with open(os.path.join(config_dir, 'config'), 'r', encoding='utf-8', errors='ignore') as f:
+                for line in f:
+                    key, _, value = line.partition('=')
+                    if key.strip().lower() == 'objectformat' and value.strip().lower() == 'sha256':
+                        return 32
+        except OSError:
+            pass
+    return 20
+
+def _parse_git_index(data: bytes, hash_size: int = 20) -> Optional[Tuple[List[str], List[str]]]:
+    """Paths ('/'-separated) of the files and symlinks, and of the submodules, in a .git/index.
+    
+    Reads index versions 2-4. Conflicted paths (several stages) are listed once and
+    sparse directory entries are left out. Returns None for anything this parser does
+    not handle (other versions, a split index whose entries live in a shared file).
+    """
+    if len(data) < 12 or data[:4] != b'DIRC':
+        return None
+    version, count = struct.unpack_from('>II', data, 4)
+    if version not in (2, 3, 4):
+        return None
+    stat_size = 40 + hash_size  # ctime, mtime, dev, ino, mode, uid, gid, size, then the object name
+    paths, submodules = [], []
+    previous = b''
+    pos = 12
+    for _ in range(count):
+        start = pos
+        mode = struct.unpack_from('>I', data, pos + 24)[0]
+        flags = struct.unpack_from('>H', data, pos + stat_size)[0]
+        pos += stat_size + (4 if flags & 0x4000 else 2)  # Extended entries carry a second flags word
+        if version == 4:
+            # Prefix-compressed: drop `strip` bytes from the previous path, then append the rest
+            byte = data[pos]
+            pos += 1
+            strip = byte & 0x7f
+            while byte & 0x80:
+                byte = data[pos]
+                pos += 1
+                strip = ((strip + 1) << 7) | (byte & 0x7f)
+            end = data.index(b'\0', pos)
+            name = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b'\0', pos)
+            name = data[pos:end]
+            pos = start + ((end - start + 8) & ~7)  # NUL-padded to a multiple of 8 bytes
+        if name != previous:
+            if mode & 0o170000 in (0o100000, 0o120000):
+                paths.append(os.fsdecode(name))
+            elif mode & 0o170000 == 0o160000:
+                submodules.append(os.fsdecode(name))
+        previous = name
+    # Extensions follow the entries, up to the trailing checksum
+    while pos + 8 <= len(data) - hash_size:
+        signature, size = data[pos:pos + 4], struct.unpack_from('>I', data, pos + 4)[0]
+        if signature == b'link':
+            return None
+        pos += 8 + size
+    return paths, submodules
+
+def _git_ls_files(work_tree: str) -> Optional[Tuple[List[str], List[str]]]:
+    """Tracked paths and submodules from `git ls-files`, for indexes _parse_git_index cannot read."""
+    # Deferred: only needed when the index cannot be parsed directly
+    import subprocess
+    try:
+        output = subprocess.run(['git', '-C', work_tree, 'ls-files', '-z', '--stage'],
+                                capture_output=True, check=True, timeout=300).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    paths, submodules = [], []
+    previous = None
+    for record in output.split(b'\0'):
+        meta, _, name = record.partition(b'\t')
+        if not name or name == previous:
+            continue
+        (submodules if meta.startswith(b'160000') else paths).append(os.fsdecode(name))
+        previous = name
+    return paths, submodules
+
+def read_git_index(directory: str) -> Optional[Tuple[List[str], str, str]]:
+    """List the files git tracks under directory, without walking it.
+    
+    Returns (paths relative to directory, '/'-separated; 'git-index' or 'git-ls-files';
+    path of the index file), or None when directory is not inside a git work tree or
+    neither the index nor git could be read. Checked-out submodules are listed from
+    their own indexes.
+    """
+    found = _find_git_dir(directory)
+    if found is None:
+        return None
+    work_tree, git_dir = found
+    index_path = os.path.join(git_dir, 'index')
+    try:
+        with open(index_path, 'rb') as f:
+            listed = _parse_git_index(f.read(), _git_hash_size(git_dir))
+        source = 'git-index'
+    except FileNotFoundError:
+        listed, source = ([], []), 'git-index'  # Nothing added yet
+    except (OSError, ValueError, IndexError, struct.error):
+        listed = None
+    if listed is None:
+        listed, source = _git_ls_files(work_tree), 'git-ls-files'
+        if listed is None:
+            return None
+    paths, submodules = listed
+    for submodule in submodules:
+        # Uninitialized submodules are empty folders; don't mistake the parent repository for theirs
+        if os.path.exists(os.path.join(work_tree, submodule, '.git')):
+            nested = read_git_index(os.path.join(work_tree, submodule))
+            if nested is not None:
+                paths.extend(f"{submodule}/{path}" for path in nested[0])
+    prefix = os.path.relpath(os.path.abspath(directory), work_tree).replace(os.sep, '/')
+    if prefix != '.':
+        prefix += '/'
+        paths = [path[len(prefix):] for path in paths if path.startswith(prefix)]
+    return paths, source, index_path
+
+class GitIndexSnapshot(DirectorySnapshot):
+    """DirectorySnapshot of only the files git tracks, listed from the index (see read_git_index).
+    
+    Untracked and ignored folders (build output, virtualenvs, scratch files) are never
+    listed. The index's own stat data is only as fresh as the last `git add`, so each
+    tracked file is still stat'ed when the walk first reaches its folder, and tracked
+    files missing from the working tree are left out. refresh() starts over when the
+    index file changes.
+    """
+    
+    def __init__(self, root: str, paths: List[str], source: str, index_path: str):
+        super().__init__(root)
+        self.source = source  # 'git-index' or 'git-ls-files'
+        self.index_path = index_path
+        self._index_stamp = self._stamp(index_path)
+        self._build(paths)
+    
+    @staticmethod
+    def _stamp(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st_info = os.stat(path)
+            return st_info.st_mtime_ns, st_info.st_size
+        except OSError:
+            return None
+    
+    def _build(self, paths: List[str]) -> None:
+        # rel_dir (os.sep-separated, '' for the root) -> (subfolder names, tracked file names)
+        tree: Dict[str, Tuple[set, List[str]]] = {'': (set(), [])}
+        for path in paths:
+            parts = path.split('/')
+            rel_dir = ''
+            for part in parts[:-1]:
+                child = os.path.join(rel_dir, part) if rel_dir else part
+                if child not in tree:
+                    tree[rel_dir][0].add(part)
+                    tree[child] = (set(), [])
+                rel_dir = child
+            tree[rel_dir][1].append(parts[-1])
+        self._tree = tree
+    
+    def _scan(self, rel_dir: str):
+        node = self._tree.get(rel_dir)
+        if node is None:
+            return None
+        path = os.path.join(self.root, rel_dir) if rel_dir else self.root
+        try:
+            dir_mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        files = {}
+        for name in sorted(node[1]):
+            try:
+                st_info = os.stat(os.path.join(path, name))
+            except OSError:
+                continue  # Deleted (or outside a sparse checkout) since it was staged
+            if not stat.S_ISDIR(st_info.st_mode):
+                files[name] = (st_info.st_size, st_info.st_mtime_ns, st_info.st_ino)
+        return dir_mtime, sorted(node[0]), set(), files
+    
+    def refresh(self, check_files: bool = False) -> bool:
+        stamp = self._stamp(self.index_path)
+        if stamp != self._index_stamp:
+            listed = read_git_index(self.root)
+            if listed is not None:
+                with self._lock:
+                    self._build(listed[0])
+                    self.source = listed[1]
+                    self._index_stamp = stamp
+                    self._listings.clear()
+                    self.generation += 1
+                return True
+        return super().refresh(check_files)
+
+class SnapshotRegistry:
+    """Thread-safe map of source directory -> DirectorySnapshot.
+    
+    The Streamlit app keeps one registry alive across reruns so the folder list,
+    tree preview, aggregation and ZIP all share a single scan. At most max_roots
+    directories are kept (per kind of snapshot); the least recently used is
+    dropped when another is added.
+    """
+    
+    def __init__(self, max_roots: int = 8):
+        if max_roots < 1:
+            raise ValueError("max_roots must be at least 1")
+        self.max_roots = max_roots
+        self._snapshots: 'OrderedDict[str, DirectorySnapshot]' = OrderedDict()
+        self._tracked: 'OrderedDict[str, GitIndexSnapshot]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, directory: str, check_files: bool = False, git_tracked: bool = False) -> DirectorySnapshot:
+        """Return the snapshot for directory, revalidated against the filesystem.
+        
+        With git_tracked, a GitIndexSnapshot of the tracked files when directory is in
+        a git work tree (the full snapshot otherwise).
+        """
+        key = os.path.abspath(directory)
+        if git_tracked:
+            with self._lock:
+                snapshot = self._lookup(self._tracked, key)
+            if snapshot is not None:
+                snapshot.refresh(check_files=check_files)
+                return snapshot
+            listed = read_git_index(key)
+            if listed is not None:
+                with self._lock:
+                    snapshot = self._lookup(self._tracked, key)
+                    if snapshot is None:
+                        snapshot = self._add(self._tracked, key, GitIndexSnapshot(key, *listed))
+                return snapshot
+        with self._lock:
+            snapshot = self._lookup(self._snapshots, key)
+            if snapshot is None:
+                return self._add(self._snapshots, key, DirectorySnapshot(key))
+        snapshot.refresh(check_files=check_files)
+        return snapshot
+    
+    @staticmethod
+    def _lookup(snapshots: 'OrderedDict[str, DirectorySnapshot]', key: str) -> Optional[DirectorySnapshot]:
+        """Snapshot for key, marked most recently used; call with the lock held."""
+        snapshot = snapshots.get(key)
+        if snapshot is not None:
+            snapshots.move_to_end(key)
+        return snapshot
+    
+    def _add(self, snapshots: 'OrderedDict[str, DirectorySnapshot]', key: str,
+             snapshot: DirectorySnapshot) -> DirectorySnapshot:
+        """Store a new snapshot, evicting the least recently used; call with the lock held."""
+        snapshots[key] = snapshot
+        while len(snapshots) > self.max_roots:
+            snapshots.popitem(last=False)
+        return snapshot
+    
+    def invalidate(self, directory: str) -> None:
+        """Forget one directory's snapshots so the next get() rescans it from scratch."""
+        with self._lock:
+            self._snapshots.pop(os.path.abspath(directory), None)
+            self._tracked.pop(os.path.abspath(directory), None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshots.clear()
+            self._tracked.clear()
+
+class AggregationCache:
+    """Persistent SQLite cache of prepared file blocks for repeat exports.
+    
+    Entries are keyed by absolute path plus the render options that shape a
+    block, and are only reused while the file's size, mtime and inode match.
+    Each entry keeps the detected encoding, binary flag, line count, content
+    hash (for deduplicating runs) and the rendered block (zlib-compressed). Least recently used entries are evicted
+    on close() once max_entries or max_bytes is exceeded.
+    """
+    
+    # Bump when the rendered block format or decoded text changes so stale blocks are never reused
+    FORMAT_VERSION = 3
+    
+    def __init__(self, cache_dir: str, max_entries: int = 200_000, max_bytes: int = 1024 * 1024 * 1024):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"blocks-v{self.FORMAT_VERSION}.sqlite")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._touched: List[str] = []
+        import sqlite3  # deferred: only cached runs need it
+        self._conn = sqlite3.connect(self.path, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blocks ("
+            " key TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER,"
+            " encoding TEXT, encoding_path TEXT, is_binary INTEGER, lines INTEGER,"
+            " file_type TEXT, block BLOB, stored_bytes INTEGER, last_used REAL, content_hash TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS blocks_last_used ON blocks (last_used)")
+    
+    @staticmethod
+    def make_key(abs_path: str, rel_path: str, include_line_numbers: bool) -> str:
+        return f"{abs_path}\0{rel_path}\0{int(include_line_numbers)}"
+    
+    def get(self, key: str, file_info: Tuple[int, int, int]) -> Optional[Dict]:
+        """Return a cached block dict for an unchanged file, or None on a miss."""
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, inode, encoding, encoding_path, is_binary, lines, file_type, block, content_hash"
+            " FROM blocks WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or tuple(row[:3]) != tuple(file_info):
+            return None
+        self._touched.append(key)
+        if row[5]:
+            return {'status': 'binary', 'size': row[0], 'cached': True}
+        abs_path, rel_path, _ = key.split('\0')
+        block = {'status': 'ok', 'text': zlib.decompress(row[8]).decode('utf-8'),
+                 'path': abs_path, 'arcname': _archive_name(abs_path, rel_path), 'type': row[7], 'lines': row[6],
+                 'size': row[0], 'encoding': row[3], 'encoding_path': row[4], 'cached': True}
+        if row[9] is not None:
+            block['hash'] = row[9]
+        return block
+    
+    def put(self, key: str, file_info: Tuple[int, int, int], block: Dict) -> None:
+        """Store a freshly prepared 'ok' or 'binary' block."""
+        if block['status'] == 'binary':
+            payload, lines, file_type, encoding, encoding_path = b'', 0, '', '', ''
+        else:
+            payload = zlib.compress(block['text'].encode('utf-8'), 1)
+            lines, file_type = block['lines'], block['type']
+            encoding, encoding_path = block.get('encoding', ''), block['encoding_path']
+        self._conn.execute(
+            "INSERT OR REPLACE INTO blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, file_info[0], file_info[1], file_info[2], encoding, encoding_path,
+             int(block['status'] == 'binary'), lines, file_type, payload, len(payload), time.time(),
+             block.get('hash'))
+        )
+    
+    def close(self) -> None:
+        """Record hits, enforce the eviction limits and commit."""
+        try:
+            now = time.time()
+            self._conn.executemany("UPDATE blocks SET last_used = ? WHERE key = ?",
+                                   ((now, key) for key in self._touched))
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_bytes), 0) FROM blocks").fetchone()
+            if count > self.max_entries or total > self.max_bytes:
+                # Walk from least recently used until both limits are met
+                evict, removed_count, removed_bytes = [], 0, 0
+                for key, stored in self._conn.execute("SELECT key, stored_bytes FROM blocks ORDER BY last_used"):
+                    if count - removed_count <= self.max_entries and total - removed_bytes <= self.max_bytes:
+                        break
+                    evict.append((key,))
+                    removed_count += 1
+                    removed_bytes += stored
+                self._conn.executemany("DELETE FROM blocks WHERE key = ?", evict)
+            self._conn.commit()
+        finally:
+            self._conn.close()
+
+class ExportCheckpoint:
+    """Periodic snapshot of a running export, so an interrupted one can resume.
+    
+    The state file (JSON, replaced atomically) records how many walk candidates
+    were written, the last one's path, the export's length at that point, stats,
+    progress and learned encodings. processed_files and the deduplication hashes
+    grow with the tree, so they are appended to a journal (`<path>.journal`)
+    and only its length is stored. A state is only reused by a run whose
+    settings have the same fingerprint (see make_fingerprint).
+    """
+    
+    # Bump when the state or journal layout changes
+    VERSION = 1
+    
+    def __init__(self, path: str, output_file: str, fingerprint: str, interval: float = 30.0):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.output_file = os.path.abspath(output_file)
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.position = 0  # Walk candidates written so far, whatever their status
+        self.last_path: Optional[str] = None
+        self.generated: Optional[str] = None  # Header timestamp; a resumed export keeps the original
+        self._journaled_files = 0
+        self._journaled_hashes = 0
+        self._journal = None
+        self._last_save = time.monotonic()
+    
+    @staticmethod
+    def make_fingerprint(**settings) -> str:
+        """Digest of the settings that shape an export's bytes (not workers or caching)."""
+        payload = json.dumps(dict(settings, version=ExportCheckpoint.VERSION), sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def peek(path: str) -> Optional[Dict]:
+        """Read a saved state without checking whose it is, or None if there is none."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def load(self) -> Optional[Dict]:
+        """Return the saved state if it matches this run's settings and its export is still there."""
+        state = self.peek(self.path)
+        if state is None or state.get('fingerprint') != self.fingerprint:
+            return None
+        try:
+            if os.path.getsize(self.output_file) < state['output_bytes']:
+                return None
+            if os.path.getsize(self.journal_path) < state['journal_bytes']:
+                return None
+        except OSError:
+            return None
+        self.generated = state['generated']
+        return state
+    
+    def read_journal(self, state: Dict) -> Tuple[List[Dict], Dict[str, str]]:
+        """Rebuild processed_files and the content hashes recorded up to `state`."""
+        with open(self.journal_path, 'rb') as f:
+            data = f.read(state['journal_bytes'])
+        files, hashes = [], {}
+        for line in data.splitlines():
+            kind, *values = json.loads(line)
+            if kind == 'file':
+                files.append(dict(zip(('path', 'arcname', 'type', 'lines', 'size'), values)))
+            else:
+                hashes[values[0]] = values[1]
+        self._journaled_files, self._journaled_hashes = len(files), len(hashes)
+        self.position, self.last_path = state['position'], state['last_path']
+        return files, hashes
+    
+    def open_journal(self, length: int = 0) -> None:
+        """Open the journal for appending, cut back to `length` bytes (0 starts a new one)."""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._journal = open(self.journal_path, 'r+b' if length else 'wb')
+        self._journal.truncate(length)
+        self._journal.seek(length)
+    
+    def due(self) -> bool:
+        return time.monotonic() - self._last_save >= self.interval
+    
+    def save(self, txt_file, state: Dict, processed_files: List[Dict], content_hashes: Dict[str, str]) -> None:
+        """Make the export and journal durable up to now, then record `state` with their lengths."""
+        entries = [['file', f['path'], f['arcname'], f['type'], f['lines'], f['size']]
+                   for f in processed_files[self._journaled_files:]]
+        entries.extend(['hash', content_hash, path] for content_hash, path
+                       in itertools.islice(content_hashes.items(), self._journaled_hashes, None))
+        self._journal.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries).encode('utf-8'))
+        self._journaled_files, self._journaled_hashes = len(processed_files), len(content_hashes)
+        for f in (txt_file, self._journal):
+            f.flush()
+            os.fsync(f.fileno())
+        state = dict(state, version=self.VERSION, fingerprint=self.fingerprint, output_file=self.output_file,
+                     generated=self.generated, position=self.position, last_path=self.last_path, output_bytes=txt_file.buffer.tell(),
+                     journal_bytes=self._journal.tell())
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._last_save = time.monotonic()
+    
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+    
+    def discard(self) -> None:
+        """Close and delete the state and journal, e.g. once the export is complete."""
+        self.close()
+        for path in (self.path, self.journal_path, self.path + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)
+
+class EncodingDetector:
+    """Encoding detection with a strict UTF-8 fast path and learned fallbacks.
+    
+    Most sources are UTF-8/ASCII, so a strict decode is tried first. Files that
+    fail it reuse the encoding chardet found for the same directory + extension
+    (or extension) earlier in the run, and only go to chardet when that fails too.
+    Only multi-byte encodings are learned: single-byte ones (latin-1, cp1251, ...)
+    decode almost any input, so reusing them would turn other charsets into mojibake.
+    """
+    
+    def __init__(self):
+        self.by_directory: Dict[Tuple[str, str], str] = {}
+        self.by_extension: Dict[str, str] = {}
+    
+    @staticmethod
+    def fast_decode(raw_data: bytes) -> Optional[str]:
+        """Strict UTF-8 (BOM-aware) decode with newline translation, or None if not UTF-8."""
+        try:
+            content = raw_data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return None
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+    
+    def decode(self, raw_data: bytes, file_path: str) -> Tuple[str, str, str]:
+        """Decode a non-UTF-8 buffer.
+        
+        Returns (content, encoding, path) where path is 'learned' or 'chardet'.
+        """
+        directory, file_name = os.path.split(file_path)
+        file_ext = os.path.splitext(file_name)[1].lower()
+        for encoding in (self.by_directory.get((directory, file_ext)), self.by_extension.get(file_ext)):
+            if not encoding or not _rejects_foreign_text(encoding):
+                continue
+            try:
+                content = raw_data.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                continue
+            if '\r' in content:
+                content = content.replace('\r\n', '\n').replace('\r', '\n')
+            return content, encoding, 'learned'
+        
+        encoding = CodeAggregator.detect_encoding_from_bytes(raw_data)
+        content = CodeAggregator.decode_text(raw_data, encoding)
+        self.remember(file_path, encoding)
+        return content, encoding, 'chardet'
+    
+    def remember(self, file_path: str, encoding: str) -> None:
+        """Record a chardet result as the default for the file's directory and extension."""
+        if not _rejects_foreign_text(encoding):
+            return
+        directory, file_name = os.path.split(file_path)
+        file_ext = os.path.splitext(file_name)[1].lower()
+        self.by_directory[(directory, file_ext)] = encoding
+        self.by_extension[file_ext] = encoding
+
+@functools.lru_cache(maxsize=None)
+def _rejects_foreign_text(encoding: str) -> bool:
+    """Whether a strict decode can tell text in another charset apart: True for multi-byte codecs.
+    
+    A single-byte codec maps each of the 256 byte values to one character (undefined
+    ones aside), so strict decodes of other charsets succeed and return mojibake.
+    """
+    try:
+        return len(bytes(range(256)).decode(encoding, 'replace')) < 256
+    except (LookupError, TypeError):
+        return False
+
+# Streaming compressors for exports: name -> file suffix
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'xz': '.xz', 'zstd': '.zst'}
+
+EXPORT_MIME_TYPES = {'gzip': 'application/gzip', 'xz': 'application/x-xz', 'zstd': 'application/zstd'}
+
+def available_compressions() -> List[str]:
+    """Compression names usable here; zstd needs the optional `zstandard` package."""
+    names = ['gzip', 'xz']
+    # find_spec avoids paying for the import until zstd is actually used
+    if importlib.util.find_spec('zstandard') is not None:
+        names.append('zstd')
+    return names
+
+class BackgroundWriter(io.RawIOBase):
+    """Binary sink that hands writes to a thread, so compression overlaps file reading.
+    
+    Writes are queued (bounded, so memory stays flat) and performed on the target
+    by a worker thread; errors from the worker are re-raised on the next call.
+    """
+    
+    def __init__(self, target, max_pending: int = 16):
+        self._target = target
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def _run(self) -> None:
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._error is None:
+                try:
+                    self._target.write(data)
+                except BaseException as e:
+                    self._error = e
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(bytes(data))
+        return len(data)
+    
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._target.close()
+        finally:
+            super().close()
+        if self._error is not None:
+            raise self._error
+
+def open_export_writer(output_file: str, compression: Optional[str] = None,
+                       level: Optional[int] = None, background: bool = False):
+    """Open an export for text writing, optionally through a streaming compressor.
+    
+    compression is None or a key of COMPRESSION_SUFFIXES; level uses each codec's
+    own scale (gzip 1-9, xz 0-9, zstd 1-22). With background=True compression runs
+    on a separate thread.
+    """
+    if not compression:
+        return open(output_file, 'w', encoding='utf-8')
+    if compression == 'gzip':
+        stream = gzip.open(output_file, 'wb', compresslevel=6 if level is None else level)
+    elif compression == 'xz':
+        stream = lzma.open(output_file, 'wb', preset=6 if level is None else level)
+    elif compression == 'zstd':
+        import zstandard
+        stream = zstandard.ZstdCompressor(level=3 if level is None else level).stream_writer(
+            open(output_file, 'wb'), closefd=True)
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+    if background:
+        stream = BackgroundWriter(stream)
+    # Large buffer so the compressor (or queue) sees few, big writes
+    return io.TextIOWrapper(io.BufferedWriter(stream, buffer_size=1024 * 1024), encoding='utf-8')
+
+def _reopen_export(output_file: str, length: int):
+    """Reopen a plain export to append after its first `length` bytes (see ExportCheckpoint)."""
+    raw = open(output_file, 'r+b')
+    raw.truncate(length)
+    raw.seek(length)
+    return io.TextIOWrapper(raw, encoding='utf-8')
+
+def _split_export_name(output_file: str, compression: Optional[str] = None) -> Tuple[str, str, str]:
+    """Split an export path into (base, extension, compression suffix)."""
+    suffix = COMPRESSION_SUFFIXES.get(compression, '')
+    name = output_file[:-len(suffix)] if suffix and output_file.endswith(suffix) else output_file
+    return os.path.splitext(name) + (suffix,)
+
+def _sidecar_path(output_file: str, compression: Optional[str], kind: str) -> str:
+    """Path of a JSON file kept next to an export: `<base>.<kind>.json`."""
+    return f"{_split_export_name(output_file, compression)[0]}.{kind}.json"
+
+def open_export_reader(path: str):
+    """Open an export for text reading, decompressing based on its suffix."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.xz'):
+        return lzma.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        import zstandard
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+                                encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+# Code averages roughly 3-4 characters per BPE token; the low end errs toward smaller shards
+CHARS_PER_TOKEN = 3.5
+
+def estimate_tokens(text: str) -> int:
+    """Fast LLM token estimate: characters / CHARS_PER_TOKEN, rounded up.
+    
+    Where exact counts matter, pass a real tokenizer as token_estimator instead,
+    e.g. `lambda text: len(encoding.encode(text))`.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class ShardedExportWriter:
+    """Export sink that spreads writes over numbered shard files capped by bytes and/or tokens.
+    
+    Shards are named `<name>.partNNN<ext>` and each starts with `header` and a shard line.
+    Every write() stays whole within one shard; only a unit too big for an empty shard is
+    cut at line ends, each later piece headed by a `// CONTINUED:` marker. Byte caps count
+    uncompressed UTF-8. Per-shard stats accumulate in `shards`; write_manifest() saves them.
+    A cut file counts (file_count, files, lines) only in the shard where it starts; the
+    shards holding its later pieces list it under continued_files.
+    """
+    
+    def __init__(self, output_file: str, max_bytes: Optional[int] = None, max_tokens: Optional[int] = None,
+                 header: str = '', compression: Optional[str] = None, compression_level: Optional[int] = None,
+                 background: bool = False, token_estimator: Optional[Callable[[str], int]] = None):
+        if not max_bytes and not max_tokens:
+            raise ValueError("Sharding needs max_bytes or max_tokens")
+        self._base, self._ext, self._suffix = _split_export_name(output_file, compression)
+        self.manifest_path = _sidecar_path(output_file, compression, 'manifest')
+        self.max_bytes = max_bytes
+        self.max_tokens = max_tokens
+        self.header = header
+        self.token_estimator = token_estimator or estimate_tokens
+        self._open_args = (compression, compression_level, background)
+        self.shards: List[Dict] = []
+        self._file = None
+        self._units = 0  # Writes in the current shard, not counting its header
+        if self._load(*self._measure(self._shard_header(1))) >= 1:
+            raise ValueError("Shard cap is smaller than the export header")
+    
+    def __enter__(self) -> 'ShardedExportWriter':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def shard_path(self, index: int) -> str:
+        return f"{self._base}.part{index:03d}{self._ext}{self._suffix}"
+    
+    def _shard_header(self, index: int) -> str:
+        return f"{self.header}Shard: {index}\n" + "=" * 100 + "\n\n"
+    
+    def _measure(self, text: str) -> Tuple[int, int]:
+        return _utf8_length(text), self.token_estimator(text)
+    
+    def _load(self, size: int, tokens: int) -> float:
+        """Fraction of a shard's cap(s) taken by `size` bytes and `tokens` tokens."""
+        return max(size / self.max_bytes if self.max_bytes else 0.0,
+                   tokens / self.max_tokens if self.max_tokens else 0.0)
+    
+    def _fits(self, size: int, tokens: int) -> bool:
+        shard = self.shards[-1]
+        return ((not self.max_bytes or shard['bytes'] + size <= self.max_bytes) and
+                (not self.max_tokens or shard['tokens'] + tokens <= self.max_tokens))
+    
+    def _open_shard(self) -> None:
+        self._close_shard()
+        index = len(self.shards) + 1
+        self.shards.append({'index': index, 'path': self.shard_path(index), 'bytes': 0, 'tokens': 0,
+                            'file_count': 0, 'lines': 0, 'files': [], 'continued_files': []})
+        self._file = open_export_writer(self.shards[-1]['path'], *self._open_args)
+        self._emit(self._shard_header(index))
+        self._units = 0
+    
+    def _close_shard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def _emit(self, text: str, size: Optional[int] = None, tokens: Optional[int] = None) -> None:
+        if size is None:
+            size, tokens = self._measure(text)
+        _write_text(self._file, text)
+        shard = self.shards[-1]
+        shard['bytes'] += size
+        shard['tokens'] += tokens
+        self._units += 1
+    
+    def _record(self, block: Optional[Dict], first: bool = True) -> None:
+        # Streamed blocks carry the line count from their scan (see _scan_large_file)
+        if block is None or block.get('status') not in ('ok', 'stream'):
+            return
+        shard = self.shards[-1]
+        if not first:
+            shard['continued_files'].append(block['arcname'])
+            return
+        shard['file_count'] += 1
+        shard['files'].append(block['arcname'])
+        shard['lines'] += block['lines']
+    
+    def _pieces(self, text: str, budget: float, room: Optional[float] = None):
+        """Cut text at line ends (inside a line only if it alone is too long) into pieces within budget.
+        
+        The first piece is limited to `room` instead when that is smaller (what is left of
+        the current shard); a line that does not fit there starts the next piece.
+        """
+        limit = budget if room is None else min(room, budget)
+        piece, used = [], 0.0
+        for line in text.splitlines(keepends=True):
+            cost = self._load(*self._measure(line))
+            if used + cost > limit and (piece or limit < budget):
+                if piece:
+                    yield ''.join(piece)
+                piece, used, limit = [], 0.0, budget
+            while cost > budget:
+                cut = max(1, int(len(line) * budget / cost))
+                while cut > 1 and self._load(*self._measure(line[:cut])) > budget:
+                    cut = cut * 9 // 10
+                yield line[:cut]
+                line = line[cut:]
+                cost = self._load(*self._measure(line))
+            if line:
+                piece.append(line)
+                used += cost
+        if piece:
+            yield ''.join(piece)
+    
+    def write(self, text: str) -> int:
+        """Write one unit (header text, the summary trailer, ...) into the current or a new shard."""
+        self._write_unit(text, None)
+        return len(text)
+    
+    def write_block(self, block: Dict) -> None:
+        """Write a prepared file block and count it in its shard's stats."""
+        self._write_unit(block['text'], block)
+    
+    def _write_unit(self, text: str, block: Optional[Dict]) -> None:
+        size, tokens = self._measure(text)
+        if not self.shards or (self._units and not self._fits(size, tokens)):
+            self._open_shard()
+        if self._fits(size, tokens):
+            self._emit(text, size, tokens)
+            self._record(block)
+            return
+        
+        # Too big even for an empty shard
+        self._write_split((text,), block)
+    
+    def write_stream(self, block: Dict, pieces) -> None:
+        """Write a streamed block (see CodeAggregator._stream_block) arriving as text pieces.
+        
+        The block's text_bytes / text_chars decide up front whether it fits whole; with a
+        custom token_estimator the token count is unknown, so pieces are packed as they come.
+        """
+        tokens = None
+        if self.token_estimator is estimate_tokens:
+            tokens = math.ceil(block['text_chars'] / CHARS_PER_TOKEN)
+        if not self.shards or (tokens is not None and self._units and not self._fits(block['text_bytes'], tokens)):
+            self._open_shard()
+        if tokens is not None and self._fits(block['text_bytes'], tokens):
+            for piece in pieces:
+                self._emit(piece)
+            self._record(block)
+            return
+        self._write_split(pieces, block)
+    
+    def _write_split(self, pieces, block: Optional[Dict]) -> None:
+        """Pack a block's text into as many shards as it needs, cutting at line ends.
+        
+        Each shard after the first starts with a `// CONTINUED:` marker naming the file.
+        """
+        marker = f"// CONTINUED: {block['path']}\n" if block is not None and 'path' in block else "// CONTINUED\n"
+        budget = (1.0 - self._load(*self._measure(self._shard_header(len(self.shards) + 1)))
+                  - self._load(*self._measure(marker)))
+        if budget <= 0:
+            raise ValueError("Shard cap leaves no room for content after the shard header")
+        first = True
+        for text in pieces:
+            shard = self.shards[-1]
+            for piece in self._pieces(text, budget, 1.0 - self._load(shard['bytes'], shard['tokens'])):
+                size, tokens = self._measure(piece)
+                if not self._fits(size, tokens):
+                    self._open_shard()
+                    if not first:
+                        piece = marker + piece
+                        size, tokens = self._measure(piece)
+                        self._record(block, first=False)
+                self._emit(piece, size, tokens)
+                if first:
+                    self._record(block)
+                    first = False
+    
+    def close(self) -> None:
+        self._close_shard()
+    
+    def write_manifest(self, **info) -> str:
+        """Write the shard manifest (JSON) next to the shards and return its path.
+        
+        `info` (source directory, generation time, ...) is stored alongside the caps,
+        totals and one entry per shard: file name, bytes, tokens, file count, lines, files
+        and continued_files (files that started in an earlier shard).
+        """
+        manifest = dict(info)
+        manifest.update({
+            'max_bytes': self.max_bytes,
+            'max_tokens': self.max_tokens,
+            'token_estimator': getattr(self.token_estimator, '__name__', 'custom'),
+            'total_bytes': sum(shard['bytes'] for shard in self.shards),
+            'total_tokens': sum(shard['tokens'] for shard in self.shards),
+            'shards': [dict({'file': os.path.basename(shard['path'])},
+                            **{key: value for key, value in shard.items() if key != 'path'})
+                       for shard in self.shards],
+        })
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        return self.manifest_path
+
+class AggregationCancelled(Exception):
+    """Raised inside a run after CodeAggregator.cancel(); reported as a failed result."""
+
+class StageTimer:
+    """Cumulative time and call counts per export stage, plus the slowest files.
+    
+    A disabled timer makes every method a no-op, so the calls can stay in the
+    hot paths. Stages timed on the writer thread nest exclusively: while an inner
+    stage runs (e.g. the walk pulled in while waiting on the pool), the outer one
+    is paused. Worker stages arrive with their blocks via add(); with several
+    workers they run concurrently, so their sum can exceed the wall time.
+    """
+    
+    def __init__(self, enabled: bool = True, slowest: int = 10):
+        self.enabled = enabled
+        self.slowest = slowest
+        self.stages: Dict[str, List] = {}  # stage -> [seconds, calls]
+        self.worker_stages = set()
+        self._files: List[Tuple] = []  # Min-heap of (seconds, order, path, size, stages)
+        self._order = itertools.count()
+        self._stack: List[str] = []
+        self._since = 0.0
+        self._file: Optional[Dict[str, float]] = None  # Stage times of the file being written
+    
+    def start(self, stage: str) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._stack:
+            self._charge(self._stack[-1], now - self._since, 0)
+        self._stack.append(stage)
+        self._since = now
+    
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._charge(self._stack.pop(), now - self._since, 1)
+        self._since = now
+    
+    def _charge(self, stage: str, seconds: float, calls: int) -> None:
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = [0.0, 0]
+        entry[0] += seconds
+        entry[1] += calls
+        if self._file is not None:
+            self._file[stage] = self._file.get(stage, 0.0) + seconds
+    
+    def timed(self, iterable, stage: str):
+        """Iterate `iterable`, charging the time spent producing each item to `stage`."""
+        if not self.enabled:
+            return iterable
+        return self._timed(iter(iterable), stage)
+    
+    def _timed(self, iterator, stage: str):
+        while True:
+            self.start(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.stop()
+            yield item
+    
+    def begin_file(self, profile: Optional[Dict] = None) -> None:
+        """Charge writer stages to one file until end_file(); `profile` holds its worker stages."""
+        if not self.enabled:
+            return
+        self._file = {}
+        if profile is not None:
+            for stage, seconds in profile['stages'].items():
+                self._charge(stage, seconds, 1)
+                self.worker_stages.add(stage)
+    
+    def end_file(self, path: Optional[str], size: int) -> None:
+        """Offer the current file's total time for the slowest-files list."""
+        if not self.enabled:
+            return
+        stages, self._file = self._file, None
+        if path is None:
+            return
+        seconds = sum(stages.values())
+        entry = (seconds, next(self._order), path, size, stages)
+        if len(self._files) < self.slowest:
+            heapq.heappush(self._files, entry)
+        elif seconds > self._files[0][0]:
+            heapq.heapreplace(self._files, entry)
+    
+    def report(self, wall_time: float, files: int, total_bytes: int) -> Dict:
+        """Stages (slowest first), slowest files and throughput as JSON-ready data."""
+        return {
+            'wall_time': wall_time,
+            'files_per_sec': files / wall_time if wall_time else 0.0,
+            'bytes_per_sec': total_bytes / wall_time if wall_time else 0.0,
+            'stages': [{'stage': stage, 'seconds': seconds, 'calls': calls,
+                        'where': 'workers' if stage in self.worker_stages else 'writer'}
+                       for stage, (seconds, calls) in sorted(self.stages.items(),
+                                                             key=lambda item: item[1][0], reverse=True)],
+            'slowest_files': [{'path': path, 'size': size, 'seconds': seconds, 'stages': stages}
+                              for seconds, _, path, size, stages in sorted(self._files, reverse=True)],
+        }
+
+class CodeAggregator:
+    def __init__(self, snapshots: Optional[SnapshotRegistry] = None,
+                 progress_callback: Optional[Callable[[Dict], None]] = None,
+                 error_callback: Optional[Callable[[str], None]] = None):
+        # Directory snapshots may be shared across instances (e.g. Streamlit reruns)
+        self.snapshots = snapshots if snapshots is not None else SnapshotRegistry()
+        # Front ends hook in here: progress gets a dict (see _report_progress)
+        self.progress_callback = progress_callback
+        self.error_callback = error_callback if error_callback is not None else logger.error
+        self.progress: Dict = {}
+        self._cancelled = threading.Event()
+        self.stats = self._empty_stats()
+        self.processed_files = []
+        self.encoding_detector = EncodingDetector()
+        self.content_hashes: Dict[str, str] = {}  # Content hash -> path of its first copy (deduplicate)
+        self.timer = StageTimer(enabled=False)
+        self.checkpoint: Optional[ExportCheckpoint] = None
+    
+    def cancel(self) -> None:
+        """Ask a running traverse_and_write_code / create_zip_archive to stop.
+        
+        Safe to call from another thread. The run returns (False, 'Aggregation cancelled', ...)
+        after the block being written; the instance stays cancelled, so use a new one to rerun.
+        """
+        self._cancelled.set()
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+    
+    @staticmethod
+    def _empty_stats() -> Dict:
+        return {
+            'total_files': 0,
+            'total_lines': 0,
+            'total_bytes': 0,
+            'files_by_type': {},
+            'processing_time': 0,
+            'files_found': 0,
+            'ignored_files': 0,
+            'errors': 0,
+            'binary_files': 0,
+            'large_files': 0,
+            'encoding_fast_path': 0,
+            'encoding_learned': 0,
+            'encoding_chardet': 0,
+            'cache_hits': 0,
+            'cache_misses': 0,
+            'cache_hit_rate': 0.0,
+            'duplicate_files': 0,
+            'duplicate_bytes_saved': 0,
+            'streamed_files': 0,
+            'resumed_files': 0,
+            'file_source': 'walk'
+        }
+    
+    def detect_encoding(self, file_path: str) -> str:
+        """Detect file encoding using chardet."""
+        try:
+            with open(file_path, 'rb') as f:
+                return self.detect_encoding_from_bytes(f.read(10000))  # Read up to 10KB
+        except Exception as e:
+            return 'utf-8'
+    
+    @staticmethod
+    def detect_encoding_from_bytes(raw_data: bytes) -> str:
+        """Detect encoding of an in-memory buffer using chardet (first 10KB)."""
+        if not raw_data:
+            return 'utf-8'
+        import chardet  # deferred: only needed for files that are not UTF-8
+        result = chardet.detect(raw_data[:10000])
+        return result.get('encoding', 'utf-8') or 'utf-8'
+    
+    def is_binary(self, file_path: str) -> bool:
+        """Check if file is binary by reading first chunk."""
+        try:
+            with open(file_path, 'rb') as f:
+                return self.is_binary_data(f.read(1024))
+        except:
+            return True
+    
+    @staticmethod
+    def is_binary_data(raw_data: bytes) -> bool:
+        """Check if a buffer looks binary (null byte in the first 1KB)."""
+        return b'\0' in raw_data[:1024]  # Binary files typically contain null bytes
+    
+    @staticmethod
+    def decode_text(raw_data: bytes, encoding: str) -> str:
+        """Decode a buffer the way text-mode open() would (errors ignored, universal newlines)."""
+        content = raw_data.decode(encoding, errors='ignore')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+    
+    @staticmethod
+    def probe_file(file_path: str) -> Tuple[bool, str, str]:
+        """Read a file once and derive binary flag, encoding and content from that buffer.
+        
+        Returns (is_binary, encoding, content); content is empty for binary files.
+        """
+        with open(file_path, 'rb') as f:
+            raw_data = f.read()
+        if CodeAggregator.is_binary_data(raw_data):
+            return True, '', ''
+        content = EncodingDetector.fast_decode(raw_data)
+        if content is not None:
+            return False, 'utf-8', content
+        encoding = CodeAggregator.detect_encoding_from_bytes(raw_data)
+        return False, encoding, CodeAggregator.decode_text(raw_data, encoding)
+    
+    def get_folders(self, directory: str, max_depth: int = None) -> List[Dict]:
+        """Get all folders recursively with their paths and levels, limited by max_depth."""
+        folders = []
+        try:
+            for root, dirs, files in self.snapshots.get(directory).walk(directory):
+                # Skip hidden directories
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                
+                level = root.replace(directory, '').count(os.sep)
+                
+                # Skip if beyond max depth
+                if max_depth is not None and level > max_depth:
+                    dirs[:] = []  # Don't traverse deeper
+                    continue
+                
+                rel_path = os.path.relpath(root, directory)
+                if rel_path == '.':
+                    continue
+                    
+                folders.append({
+                    'path': root,
+                    'name': os.path.basename(root),
+                    'rel_path': rel_path,
+                    'level': level
+                })
+        except Exception as e:
+            self.error_callback(f"Error reading folders: {str(e)}")
+        
+        return sorted(folders, key=lambda x: x['rel_path'])
+    
+    def get_child_folders(self, directory: str, rel_dir: str = '') -> List[Dict]:
+        """List the non-hidden subfolders of one folder ('' is the root), like get_folders() entries.
+        
+        Only that folder is scanned, so a folder tree can load children as they are expanded.
+        """
+        folders = []
+        try:
+            for name in self.snapshots.get(directory).subdirs(rel_dir):
+                if name.startswith('.'):
+                    continue
+                rel_path = os.path.join(rel_dir, name) if rel_dir else name
+                folders.append({
+                    'path': os.path.join(directory, rel_path),
+                    'name': name,
+                    'rel_path': rel_path,
+                    'level': rel_path.count(os.sep) + 1
+                })
+        except Exception as e:
+            self.error_callback(f"Error reading folders: {str(e)}")
+        return folders
+    
+    def get_file_tree(self, directory: str, max_depth: int = 3, max_files_per_dir: int = 10, 
+                      excluded_folders: List[str] = None, folder_depth: int = None) -> str:
+        """Generate ASCII file tree structure with excluded folders and depth control."""
+        tree = []
+        exclusions = ExclusionTrie(excluded_folders)
+            
+        try:
+            for root, dirs, files in self.snapshots.get(directory).walk(directory):
+                # Skip hidden directories
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+                
+                level = root.replace(directory, '').count(os.sep)
+                
+                # Apply depth limit for tree display
+                if max_depth is not None and level > max_depth:
+                    dirs[:] = []  # Don't traverse deeper
+                    continue
+                
+                # Filter out excluded subdirectories
+                rel_path = os.path.relpath(root, directory)
+                dirs[:] = exclusions.prune(rel_path, dirs)
+                
+                indent = ' ' * 2 * level
+                dir_name = os.path.basename(root)
+                if level == 0:
+                    dir_name = os.path.basename(directory) or directory
+                tree.append(f"{indent}📁 {dir_name}/")
+                
+                subindent = ' ' * 2 * (level + 1)
+                # Sort files by extension
+                files.sort()
+                shown_files = 0
+                for file in files:
+                    if shown_files >= max_files_per_dir:
+                        break
+                    # Skip hidden files
+                    if file.startswith('.'):
+                        continue
+                    ext = os.path.splitext(file)[1]
+                    icon = "📄" if ext in COMPLETE_EXTENSIONS else "📎"
+                    tree.append(f"{subindent}{icon} {file}")
+                    shown_files += 1
+                
+                if len(files) > max_files_per_dir:
+                    tree.append(f"{subindent}... and {len(files) - max_files_per_dir} more files")
+        except Exception as e:
+            tree.append(f"Error reading directory: {str(e)}")
+        
+        return '\n'.join(tree)
+    
+    def _iter_candidates(self, source_dir: str, snapshot: DirectorySnapshot,
+                         include_ext_set: set, exclude_ext_set: set,
+                         exclusions: ExclusionTrie, ignore_matcher: Optional[GitIgnoreMatcher],
+                         max_file_size_mb: int, include_hidden: bool, stats: Optional[Dict] = None):
+        """Walk source_dir in sorted order and yield files that pass all cheap filters.
+        
+        Yields (file_path, rel_path, file_ext, file_info) where file_info is the snapshot's
+        (size, mtime_ns, inode); skipped files are counted in `stats` (default self.stats).
+        """
+        if stats is None:
+            stats = self.stats
+        for root, dirs, files in snapshot.walk(source_dir):
+            # Remove excluded directories from traversal
+            rel_path = os.path.relpath(root, source_dir)
+            dirs[:] = exclusions.prune(rel_path, dirs)
+            
+            # Remove hidden directories if not included
+            if not include_hidden:
+                dirs[:] = [d for d in dirs if not d.startswith('.')]
+            
+            # Prune gitignored directories instead of filtering their files one by one
+            if ignore_matcher is not None:
+                ignore_rel = '' if rel_path == '.' else rel_path.replace(os.sep, '/')
+                ignore_prefix = ignore_rel + '/' if ignore_rel else ''
+                ignore_matcher.enter_directory(ignore_rel, '.gitignore' in files)
+                dirs[:] = [d for d in dirs if not ignore_matcher.is_ignored(ignore_prefix + d, True)]
+            
+            # Sort for consistent output
+            dirs.sort()
+            files.sort()
+            stats['files_found'] += len(files)
+            
+            for file in files:
+                # Skip hidden files if not included
+                if not include_hidden and file.startswith('.'):
+                    stats['ignored_files'] += 1
+                    continue
+                
+                file_path = os.path.join(root, file)
+                file_ext = os.path.splitext(file)[1].lower()
+                
+                # Skip based on gitignore patterns
+                if ignore_matcher is not None and ignore_matcher.is_ignored(ignore_prefix + file, False):
+                    stats['ignored_files'] += 1
+                    continue
+                
+                # Check file size first (captured by the snapshot scan)
+                file_info = snapshot.file_info(rel_path, file)
+                if file_info is None:
+                    stats['errors'] += 1
+                    continue
+                file_size = file_info[0]
+                if file_size > max_file_size_mb * 1024 * 1024:
+                    stats['large_files'] += 1
+                    continue
+                
+                # Apply extension filters
+                if include_ext_set and file_ext not in include_ext_set:
+                    continue
+                if exclude_ext_set and file_ext in exclude_ext_set:
+                    continue
+                
+                yield file_path, rel_path, file_ext, file_info
+    
+    def traverse_and_write_code(self, source_dir: str, output_file: str, 
+                               include_ext: List[str] = None,
+                               exclude_ext: List[str] = None,
+                               exclude_dirs: List[str] = None,
+                               include_line_numbers: bool = False,
+                               respect_gitignore: bool = False,
+                               max_file_size_mb: int = 5,
+                               include_hidden: bool = False,
+                               workers: int = 1,
+                               executor_type: str = 'thread',
+                               cache_dir: Optional[str] = None,
+                               compression: Optional[str] = None,
+                               compression_level: Optional[int] = None,
+                               background_compression: bool = False,
+                               shard_max_bytes: Optional[int] = None,
+                               shard_max_tokens: Optional[int] = None,
+                               token_estimator: Optional[Callable[[str], int]] = None,
+                               deduplicate: bool = False,
+                               profile: bool = False,
+                               slowest_files: int = 10,
+                               checkpoint_path: Optional[str] = None,
+                               checkpoint_interval: float = 30.0,
+                               resume: bool = False,
+                               git_tracked: bool = False) -> Tuple[bool, str, Dict]:
+        """Enhanced version with exact paths and all features.
+        
+        With workers > 1, files are read and rendered concurrently on a thread or
+        process pool (executor_type) while blocks are still written in walk order,
+        so the export is byte-identical to a sequential run. With cache_dir set,
+        unchanged files are served from an AggregationCache instead of being re-read.
+        With compression set ('gzip', 'xz' or 'zstd'), the export is compressed as it
+        is written (see open_export_writer). With shard_max_bytes and/or shard_max_tokens
+        set, blocks are spread over capped shard files (see ShardedExportWriter); their
+        stats go in stats['shards'] and the path returned is the shard manifest.
+        With deduplicate, files whose content was already exported are written as a
+        short reference to the first copy (counted in duplicate_files / duplicate_bytes_saved).
+        With profile, time per stage (scan, walk, read, decode, render, write, ...) and the
+        slowest_files slowest files go in stats['timings'] (see StageTimer.report) and in a
+        `<name>.timings.json` sidecar, whose path is stats['timings_path'].
+        With checkpoint_path, progress is saved there every checkpoint_interval seconds
+        (see ExportCheckpoint) and removed once the export completes. With resume as well,
+        a run with the same settings picks up after the last checkpoint and produces the
+        same export as an uninterrupted run; stats['resumed_files'] counts the files it
+        skipped. Checkpoints need a plain export (no compression or shards).
+        With git_tracked, a source_dir inside a git work tree is listed from the index
+        (see GitIndexSnapshot) instead of walked: only tracked files are exported, and
+        .gitignore rules are not consulted since git never ignores tracked files.
+        stats['file_source'] says which listing was used ('git-index', 'git-ls-files' or 'walk').
+        """
+        
+        # Reset stats
+        self.stats = self._empty_stats()
+        self.processed_files = []
+        self.encoding_detector = EncodingDetector()
+        self.content_hashes = {}
+        self.timer = StageTimer(enabled=profile, slowest=slowest_files)
+        self.checkpoint = None
+        
+        start_time = time.time()
+        
+        # Default values
+        if include_ext is None:
+            include_ext = list(COMPLETE_EXTENSIONS.keys())
+        if exclude_ext is None:
+            exclude_ext = []
+        if exclude_dirs is None:
+            exclude_dirs = ['.git', '__pycache__', 'node_modules', '.venv', 'venv', 
+                           'env', 'dist', 'build', '.idea', '.vscode', '.DS_Store']
+        
+        # Convert to sets for faster lookup
+        include_ext_set = set(include_ext)
+        exclude_ext_set = set(exclude_ext)
+        
+        # Compile .gitignore rules if requested; nested files are loaded during the walk
+        ignore_matcher = GitIgnoreMatcher(source_dir) if respect_gitignore else None
+        
+        try:
+            # Ensure output directory exists
+            os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+            
+            sharded = bool(shard_max_bytes or shard_max_tokens)
+            state = None
+            if checkpoint_path:
+                if sharded or compression:
+                    raise ValueError("Checkpoints need a plain export, without compression or shards")
+                self.checkpoint = ExportCheckpoint(checkpoint_path, output_file, ExportCheckpoint.make_fingerprint(
+                    source_dir=os.path.abspath(source_dir), output_file=os.path.abspath(output_file),
+                    include_ext=sorted(include_ext_set) if include_ext else [], exclude_ext=sorted(exclude_ext_set),
+                    exclude_dirs=sorted(exclude_dirs), include_line_numbers=include_line_numbers,
+                    respect_gitignore=respect_gitignore, max_file_size_mb=max_file_size_mb,
+                    include_hidden=include_hidden, deduplicate=deduplicate, git_tracked=git_tracked),
+                    checkpoint_interval)
+                if resume:
+                    state = self.checkpoint.load()
+            
+            # Header, with excluded folders (repeated at the top of every shard)
+            generated = state['generated'] if state else datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            header = ("Code Aggregator Export\n"
+                      + "=" * 100 + "\n"
+                      + f"Generated: {generated}\n"
+                      + f"Source Directory: {os.path.abspath(source_dir)}\n"
+                      + "=" * 100 + "\n\n")
+            if exclude_dirs:
+                header += ("Excluded Folders:\n"
+                           + "".join(f"  - {folder}\n" for folder in exclude_dirs)
+                           + "=" * 100 + "\n\n")
+            
+            timings_path = _sidecar_path(output_file, compression, 'timings')
+            if sharded:
+                sink = ShardedExportWriter(output_file, shard_max_bytes, shard_max_tokens, header,
+                                           compression, compression_level, background_compression,
+                                           token_estimator)
+                self.stats['shards'] = sink.shards
+            elif state is not None:
+                sink = _reopen_export(output_file, state['output_bytes'])
+            else:
+                sink = open_export_writer(output_file, compression, compression_level, background_compression)
+            
+            with sink as txt_file:
+                if not sharded and state is None:
+                    txt_file.write(header)
+                walk_stats = self.stats
+                if self.checkpoint is not None:
+                    self.checkpoint.generated = generated
+                    if state is not None:
+                        self._restore_checkpoint(state)
+                    self.checkpoint.open_journal(state['journal_bytes'] if state else 0)
+                    # Walk counters are rebuilt by every (resumed) walk, so they stay out of checkpoints
+                    walk_stats = self._empty_stats()
+                
+                self.timer.start('scan')
+                snapshot = self.snapshots.get(source_dir, check_files=True, git_tracked=git_tracked)
+                self.timer.stop()
+                if isinstance(snapshot, GitIndexSnapshot):
+                    ignore_matcher = None
+                    self.stats['file_source'] = snapshot.source
+                filters = (include_ext_set if include_ext else set(), exclude_ext_set,
+                           ExclusionTrie(exclude_dirs))
+                
+                # Progress needs totals up front: count candidates over the (in-memory) snapshot
+                files_total = bytes_total = None
+                if self.progress_callback is not None:
+                    self.timer.start('count')
+                    files_total = bytes_total = 0
+                    for _, _, _, file_info in self._iter_candidates(
+                            source_dir, snapshot, *filters,
+                            GitIgnoreMatcher(source_dir) if ignore_matcher is not None else None,
+                            max_file_size_mb, include_hidden, stats=self._empty_stats()):
+                        files_total += 1
+                        bytes_total += file_info[0]
+                    self.timer.stop()
+                self.progress = {'files_done': 0, 'files_total': files_total,
+                                 'bytes_done': 0, 'bytes_total': bytes_total, 'started': time.time()}
+                
+                candidates = self._iter_candidates(
+                    source_dir, snapshot, *filters, ignore_matcher, max_file_size_mb, include_hidden, walk_stats
+                )
+                if state is not None:
+                    candidates = _skip_written(candidates, state['position'], state['last_path'])
+                    self.progress.update(files_done=state['position'], bytes_done=state['bytes_done'])
+                candidates = self.timer.timed(candidates, 'walk')
+                cache = AggregationCache(cache_dir) if cache_dir else None
+                pending = deque()  # Path, cache key and file info of each block in flight, in walk order
+                jobs = self._iter_jobs(candidates, include_line_numbers, cache, pending, deduplicate, profile)
+                
+                try:
+                    if workers and workers > 1:
+                        pool_class = ThreadPoolExecutor
+                        if executor_type == 'process':
+                            # Deferred: pulls in multiprocessing, which most runs never need
+                            from concurrent.futures import ProcessPoolExecutor as pool_class
+                        with pool_class(max_workers=workers) as executor:
+                            # Time the writer spends idle, waiting for the pool
+                            blocks = self.timer.timed(
+                                _ordered_map(executor, _prepare_file_block, jobs, workers * 4), 'wait')
+                            self._write_blocks(txt_file, blocks, cache, pending, deduplicate)
+                    else:
+                        blocks = (job if isinstance(job, dict) else _prepare_file_block(*job) for job in jobs)
+                        self._write_blocks(txt_file, blocks, cache, pending, deduplicate)
+                finally:
+                    if cache is not None:
+                        cache.close()
+                
+                if walk_stats is not self.stats:
+                    for key in ('files_found', 'ignored_files', 'large_files', 'errors'):
+                        self.stats[key] += walk_stats[key]
+                
+                lookups = self.stats['cache_hits'] + self.stats['cache_misses']
+                self.stats['cache_hit_rate'] = self.stats['cache_hits'] / lookups if lookups else 0.0
+                
+                # Totals come from the single walk above, so they go in a trailer
+                txt_file.write("Export Summary\n"
+                               + "=" * 100 + "\n"
+                               + f"Total Files Found: {self.stats['files_found']}\n"
+                               + f"Files Exported: {self.stats['total_files']}\n"
+                               + f"Total Lines: {self.stats['total_lines']:,}\n"
+                               + "=" * 100 + "\n")
+            
+            if self.checkpoint is not None:
+                self.checkpoint.discard()
+            if sharded:
+                output_file = sink.write_manifest(source_dir=os.path.abspath(source_dir), generated=generated,
+                                                  files_exported=self.stats['total_files'],
+                                                  total_lines=self.stats['total_lines'])
+            self.stats['processing_time'] = time.time() - start_time
+            if profile:
+                self.stats['timings'] = self.timer.report(self.stats['processing_time'],
+                                                          self.stats['total_files'], self.stats['total_bytes'])
+                self.stats['timings_path'] = timings_path
+                with open(timings_path, 'w', encoding='utf-8') as f:
+                    json.dump(dict(source_dir=os.path.abspath(source_dir), generated=generated,
+                                   workers=workers, executor=executor_type, files_exported=self.stats['total_files'],
+                                   bytes_exported=self.stats['total_bytes'], **self.stats['timings']),
+                              f, indent=2, ensure_ascii=False)
+            return True, output_file, self.stats
+            
+        except Exception as e:
+            return False, str(e), self.stats
+        finally:
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+    
+    def _iter_jobs(self, candidates, include_line_numbers: bool,
+                   cache: Optional[AggregationCache], pending: deque, hash_content: bool = False,
+                   profile: bool = False):
+        """Turn candidates into _prepare_file_block argument tuples.
+        
+        Files with a valid cache entry are yielded as ready block dicts instead
+        (unless hash_content is set and the entry was stored without a hash).
+        For every item, its path and (cache key, file info) are queued on `pending` for the writer.
+        """
+        for file_path, rel_path, file_ext, file_info in candidates:
+            key = None
+            if cache is not None:
+                self.timer.start('cache_lookup')
+                key = AggregationCache.make_key(os.path.abspath(file_path), rel_path, include_line_numbers)
+                cached = cache.get(key, file_info)
+                self.timer.stop()
+                if cached is not None and (not hash_content or cached['status'] == 'binary' or 'hash' in cached):
+                    pending.append((file_path, None))
+                    if cached.get('encoding_path') == 'chardet':
+                        self.encoding_detector.remember(file_path, cached['encoding'])
+                    yield cached
+                    continue
+            pending.append((file_path, (key, file_info)))
+            yield file_path, rel_path, file_ext, file_info[0], include_line_numbers, hash_content, profile
+    
+    def _write_blocks(self, txt_file, blocks, cache: Optional[AggregationCache] = None,
+                      pending: Optional[deque] = None, deduplicate: bool = False) -> None:
+        """Write prepared file blocks in order and fold their results into self.stats.
+        
+        With deduplicate, an 'ok' block whose content hash was seen before is written
+        as a reference to the first copy (see _duplicate_block) when that is shorter.
+        """
+        timer = self.timer
+        checkpoint = self.checkpoint
+        for block in blocks:
+            if self._cancelled.is_set():
+                raise AggregationCancelled("Aggregation cancelled")
+            file_path, cache_entry = pending.popleft() if pending is not None else (None, None)
+            if cache is not None:
+                self.stats['cache_hits' if block.get('cached') else 'cache_misses'] += 1
+            
+            if not timer.enabled:
+                block = self._write_block(txt_file, block, cache, cache_entry, deduplicate)
+            else:
+                # The file's worker stages plus the writer stages below make up its total
+                profile = block.pop('profile', None)
+                timer.begin_file(profile)
+                block = self._write_block(txt_file, block, cache, cache_entry, deduplicate)
+                timer.end_file(profile['path'] if profile else block.get('path'), block.get('size', 0))
+            
+            self.progress['files_done'] += 1
+            self.progress['bytes_done'] += block.get('size', 0)
+            if self.progress['files_done'] % 10 == 0:
+                self._report_progress()
+            
+            if checkpoint is not None:
+                checkpoint.position += 1
+                checkpoint.last_path = file_path
+                if checkpoint.due():
+                    timer.start('checkpoint')
+                    self._save_checkpoint(txt_file)
+                    timer.stop()
+        
+        self._report_progress()
+    
+    def _save_checkpoint(self, txt_file) -> None:
+        """Record everything a resumed run needs that the walk cannot rebuild."""
+        detector = self.encoding_detector
+        state = {'stats': self.stats, 'bytes_done': self.progress['bytes_done'],
+                 'encodings': {'by_directory': [[directory, ext, encoding] for (directory, ext), encoding
+                                                in detector.by_directory.items()],
+                               'by_extension': detector.by_extension}}
+        self.checkpoint.save(txt_file, state, self.processed_files, self.content_hashes)
+    
+    def _restore_checkpoint(self, state: Dict) -> None:
+        """Continue from a saved state: stats, learned encodings, processed files and dedup hashes."""
+        self.stats.update(state['stats'])
+        encodings = state['encodings']
+        self.encoding_detector.by_directory = {(directory, ext): encoding
+                                               for directory, ext, encoding in encodings['by_directory']}
+        self.encoding_detector.by_extension = dict(encodings['by_extension'])
+        self.processed_files, self.content_hashes = self.checkpoint.read_journal(state)
+        self.stats['resumed_files'] = self.checkpoint.position
+    
+    def _write_block(self, txt_file, block: Dict, cache: Optional[AggregationCache],
+                     cache_entry: Optional[Tuple], deduplicate: bool) -> Dict:
+        """Write one prepared block and fold it into self.stats; returns the block as written."""
+        if block['status'] == 'undecoded':
+            self.timer.start('encoding_detection')
+            block = self._decode_block(block)
+            self.timer.stop()
+        
+        if cache is not None and cache_entry is not None and block['status'] in ('ok', 'binary'):
+            self.timer.start('cache_store')
+            cache.put(cache_entry[0], cache_entry[1], block)
+            self.timer.stop()
+        
+        if block['status'] == 'binary':
+            self.stats['binary_files'] += 1
+            return block
+        
+        if deduplicate and block['status'] in ('ok', 'stream'):
+            self.timer.start('dedup')
+            first_path = self.content_hashes.setdefault(block['hash'], block['path'])
+            if first_path != block['path']:
+                reference = _duplicate_block(block, first_path)
+                text_bytes = _utf8_length(block['text']) if 'text' in block else block['text_bytes']
+                saved = text_bytes - _utf8_length(reference['text'])
+                if saved > 0:
+                    self.stats['duplicate_files'] += 1
+                    self.stats['duplicate_bytes_saved'] += saved
+                    block = reference
+            self.timer.stop()
+        
+        self.timer.start('write')
+        try:
+            if block['status'] == 'stream':
+                try:
+                    self._stream_block(txt_file, block)
+                except (OSError, UnicodeDecodeError) as e:
+                    # Changed or removed since it was scanned: the partial block ends in an error marker
+                    txt_file.write(_error_block(block['path'], e)['text'])
+                    self.stats['errors'] += 1
+                    return block
+                self.stats['streamed_files'] += 1
+            elif isinstance(txt_file, ShardedExportWriter):
+                txt_file.write_block(block)
+            else:
+                _write_text(txt_file, block['text'])
+        finally:
+            self.timer.stop()
+        
+        if block['status'] == 'error':
+            self.stats['errors'] += 1
+            return block
+        
+        # Update statistics
+        self.stats['total_files'] += 1
+        self.stats['total_lines'] += block['lines']
+        self.stats['total_bytes'] += block['size']
+        if not block.get('cached'):
+            self.stats[f"encoding_{block['encoding_path']}"] += 1
+        
+        # Count by file type
+        file_type = block['type']
+        self.stats['files_by_type'][file_type] = self.stats['files_by_type'].get(file_type, 0) + 1
+        
+        # Store for processed files list
+        self.processed_files.append({
+            'path': block['path'],
+            'arcname': block['arcname'],
+            'type': file_type,
+            'lines': block['lines'],
+            'size': block['size']
+        })
+        return block
+    
+    def _stream_block(self, txt_file, block: Dict) -> None:
+        """Copy a large file into the export in chunks: the second pass after _scan_large_file."""
+        chunks = _iter_text_chunks(block['path'])
+        body = _numbered_stream(chunks) if block['numbered'] else chunks
+        pieces = itertools.chain((block['header'],), body, (BLOCK_FOOTER,))
+        if isinstance(txt_file, ShardedExportWriter):
+            txt_file.write_stream(block, pieces)
+        else:
+            for piece in pieces:
+                _write_text(txt_file, piece)
+    
+    def _report_progress(self) -> None:
+        """Send progress to the callback: counts done/total plus elapsed, throughput and ETA.
+        
+        Keys: files_done, files_total, bytes_done, bytes_total, elapsed, files_per_sec,
+        bytes_per_sec and eta (seconds, None until it can be estimated).
+        """
+        if self.progress_callback is None:
+            return
+        progress = dict(self.progress)
+        elapsed = max(time.time() - progress.pop('started'), 1e-6)
+        progress['elapsed'] = elapsed
+        progress['files_per_sec'] = progress['files_done'] / elapsed
+        progress['bytes_per_sec'] = progress['bytes_done'] / elapsed
+        progress['eta'] = None
+        if progress['bytes_total'] and progress['bytes_done']:
+            # Bytes track the work better than file counts when sizes vary a lot
+            remaining = max(progress['bytes_total'] - progress['bytes_done'], 0)
+            progress['eta'] = remaining / progress['bytes_per_sec']
+        elif progress['files_total'] and progress['files_done']:
+            progress['eta'] = (progress['files_total'] - progress['files_done']) / progress['files_per_sec']
+        self.progress_callback(progress)
+    
+    def _decode_block(self, block: Dict) -> Dict:
+        """Finish a block whose bytes failed the UTF-8 fast path.
+        
+        Runs in the writer so learned encodings are applied in walk order,
+        keeping parallel and sequential exports identical.
+        """
+        file_path, rel_path, file_ext, file_size, include_line_numbers = block['job']
+        try:
+            content, encoding, path = self.encoding_detector.decode(block['raw'], file_path)
+            rendered = _render_block(os.path.abspath(file_path), rel_path, file_ext, file_size,
+                                     content, include_line_numbers, encoding, path)
+            if 'hash' in block:
+                rendered['hash'] = block['hash']
+            return rendered
+        except Exception as e:
+            return _error_block(file_path, e, file_size)
+    
+    def create_zip_archive(self, output_zip: str, files: Optional[List[Dict]] = None,
+                           compression_level: int = 6, workers: int = 1) -> Tuple[bool, str, int]:
+        """Create a ZIP archive of the files accepted by the last traverse_and_write_code.
+        
+        Members come from processed_files (or `files`), so the archive matches the
+        export exactly without walking the tree again. Files are read and deflated
+        on a thread pool and written pre-compressed in export order; already
+        compressed types, and files deflate cannot shrink, are stored as-is.
+        Files over LARGE_FILE_BYTES are never held in memory: the writer streams
+        them through ZipFile.write, which deflates in chunks.
+        """
+        if files is None:
+            files = self.processed_files
+        import zipfile  # deferred: only needed when a ZIP is requested
+        file_count = 0
+        try:
+            jobs = ((info['path'], info.get('arcname') or os.path.basename(info['path']), compression_level)
+                    for info in files)
+            with zipfile.ZipFile(output_zip, 'w') as zipf, \
+                    ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                for path, zinfo, data in _ordered_map(executor, _compress_zip_member, jobs, max(1, workers) * 4):
+                    if self._cancelled.is_set():
+                        raise AggregationCancelled("ZIP creation cancelled")
+                    if data is None:
+                        zipf.write(path, zinfo.filename, compress_type=zinfo.compress_type,
+                                   compresslevel=compression_level)
+                    else:
+                        _write_precompressed(zipf, zinfo, data)
+                    file_count += 1
+            
+            return True, output_zip, file_count
+        except Exception as e:
+            return False, str(e), file_count
+
+class AggregationJob:
+    """Run an export (and optionally its ZIP) on a background thread.
+    
+    The handle is what front ends keep: poll `status` and `progress`, call cancel(),
+    and read `result` / `zip_result` once `done`. `meta` is free-form data the
+    front end wants back with the job (file names, labels, ...).
+    """
+    
+    def __init__(self, aggregator: CodeAggregator, export_kwargs: Dict,
+                 zip_kwargs: Optional[Dict] = None, meta: Optional[Dict] = None):
+        self.id = secrets.token_hex(8)
+        self.aggregator = aggregator
+        self.export_kwargs = export_kwargs
+        self.zip_kwargs = zip_kwargs
+        self.meta = meta or {}
+        self.status = 'pending'  # pending, running, done, failed or cancelled
+        self.progress: Dict = {}
+        self.result: Optional[Tuple[bool, str, Dict]] = None
+        self.zip_result: Optional[Tuple[bool, str, int]] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._forward_progress = aggregator.progress_callback
+        aggregator.progress_callback = self._on_progress
+        self._thread = threading.Thread(target=self._run, name=f"aggregation-{self.id}", daemon=True)
+    
+    def start(self) -> 'AggregationJob':
+        self.status = 'running'
+        self.started_at = time.time()
+        self._thread.start()
+        return self
+    
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes (or timeout); returns whether it is done."""
+        self._thread.join(timeout)
+        return self.done
+    
+    def cancel(self) -> None:
+        self.aggregator.cancel()
+    
+    def _on_progress(self, progress: Dict) -> None:
+        self.progress = progress
+        if self._forward_progress is not None:
+            self._forward_progress(progress)
+    
+    def _run(self) -> None:
+        status = 'failed'
+        try:
+            self.result = self.aggregator.traverse_and_write_code(**self.export_kwargs)
+            if self.result[0] and self.zip_kwargs and self.result[2]['total_files'] > 0:
+                self.zip_result = self.aggregator.create_zip_archive(**self.zip_kwargs)
+            if self.aggregator.cancelled:
+                status = 'cancelled'
+                # Cancelled outputs stop mid-file; don't leave them looking like results
+                paths = [self.export_kwargs.get('output_file'), (self.zip_kwargs or {}).get('output_zip')]
+                paths.extend(shard['path'] for shard in self.aggregator.stats.get('shards', []))
+                if self.aggregator.checkpoint is not None:
+                    paths.extend((self.aggregator.checkpoint.path, self.aggregator.checkpoint.journal_path))
+                for path in paths:
+                    if path and os.path.exists(path):
+                        os.remove(path)
+            elif self.result[0]:
+                status = 'done'
+        except Exception as e:
+            self.result = (False, str(e), self.aggregator.stats)
+        finally:
+            self.finished_at = time.time()
+            self.status = status
+
+class BatchAggregator:
+    """Export many repositories in one run, one export each, on a process pool.
+    
+    The `concurrency` worker processes live for the whole batch, so imports, the hash
+    algorithm and compiled .gitignore rules stay warm from one repository to the next.
+    With memory_limit_mb, another repository only starts while the running jobs' expected
+    peak RSS fits in the limit; the estimate is the largest job peak seen so far
+    (JOB_MEMORY_MB until a job has finished), and one job always runs. A worker that dies
+    (e.g. killed for memory) breaks the pool and every job running on it; those are retried
+    once each, alone on a new pool, so only the job that kills its worker again fails.
+    """
+    
+    JOB_MEMORY_MB = 256
+    SUMMARY_NAME = 'batch_summary.json'
+    
+    def __init__(self, concurrency: Optional[int] = None, memory_limit_mb: Optional[float] = None,
+                 progress_callback: Optional[Callable[[Dict], None]] = None):
+        self.concurrency = max(1, concurrency or os.cpu_count() or 1)
+        self.memory_limit_mb = memory_limit_mb
+        # Called in this process after each repository with its job entry plus 'done' / 'total'
+        self.progress_callback = progress_callback
+        self.job_memory_mb: Optional[float] = None
+    
+    @staticmethod
+    def find_repositories(parent: str) -> List[str]:
+        """The non-hidden child folders of parent, sorted: one repository each."""
+        with os.scandir(parent) as entries:
+            return sorted(entry.path for entry in entries
+                          if entry.is_dir() and not entry.name.startswith('.'))
+    
+    @staticmethod
+    def output_names(sources: List[str], suffix: str = '.txt') -> List[str]:
+        """Export file names from the folder names, numbered where two repositories share one."""
+        names, seen = [], {}
+        for source in sources:
+            base = os.path.basename(os.path.normpath(os.path.abspath(source))) or 'root'
+            seen[base] = seen.get(base, 0) + 1
+            names.append(f"{base}{suffix}" if seen[base] == 1 else f"{base}-{seen[base]}{suffix}")
+        return names
+    
+    @staticmethod
+    def merge_stats(totals: Dict, stats: Dict) -> None:
+        """Add one export's counters (and files_by_type) to the batch totals."""
+        for key, value in stats.items():
+            if key == 'files_by_type':
+                by_type = totals.setdefault(key, {})
+                for file_type, count in value.items():
+                    by_type[file_type] = by_type.get(file_type, 0) + count
+            elif isinstance(value, (int, float)) and not isinstance(value, bool) and key != 'cache_hit_rate':
+                totals[key] = totals.get(key, 0) + value
+        lookups = totals.get('cache_hits', 0) + totals.get('cache_misses', 0)
+        totals['cache_hit_rate'] = totals.get('cache_hits', 0) / lookups if lookups else 0.0
+    
+    def _admits(self, running: int) -> bool:
+        if running >= self.concurrency:
+            return False
+        if running == 0 or not self.memory_limit_mb:
+            return True
+        return (running + 1) * (self.job_memory_mb or self.JOB_MEMORY_MB) <= self.memory_limit_mb
+    
+    def run(self, sources: List[str], output_dir: str, **export_kwargs) -> Tuple[bool, str, Dict]:
+        """Export every source directory into output_dir and write the combined summary there.
+        
+        export_kwargs are passed to each traverse_and_write_code call (file pools inside a
+        job use threads). Returns (True, summary path, summary) once every repository has
+        been tried, failed ones included (see summary['failed'] and each job's 'error').
+        """
+        # Deferred: pulls in multiprocessing, which single exports never need
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+        from concurrent.futures.process import BrokenProcessPool
+        
+        summary = {'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                   'output_dir': os.path.abspath(output_dir), 'concurrency': self.concurrency,
+                   'memory_limit_mb': self.memory_limit_mb, 'repositories': len(sources),
+                   'succeeded': 0, 'failed': 0, 'wall_time': 0.0, 'peak_job_rss_mb': None,
+                   'totals': {}, 'jobs': []}
+        start_time = time.time()
+        executor = None
+        try:
+            if export_kwargs.get('executor_type', 'thread') != 'thread':
+                raise ValueError("Batch jobs already run in separate processes; use executor_type='thread'")
+            os.makedirs(output_dir, exist_ok=True)
+            suffix = '.txt' + COMPRESSION_SUFFIXES.get(export_kwargs.get('compression'), '')
+            outputs = [os.path.join(output_dir, name) for name in self.output_names(sources, suffix)]
+            jobs: List[Optional[Dict]] = [None] * len(sources)
+            retried = [False] * len(sources)
+            queued = deque(range(len(sources)))
+            running: Dict[Future, int] = {}
+            executor = ProcessPoolExecutor(max_workers=self.concurrency)
+            while queued or running:
+                while queued and self._admits(len(running)):
+                    index = queued[0]
+                    # Retries run alone, so a job that kills its worker cannot take others with it
+                    if running and (retried[index] or any(retried[i] for i in running.values())):
+                        break
+                    queued.popleft()
+                    running[executor.submit(_run_batch_job, sources[index], outputs[index], export_kwargs)] = index
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = []
+                for future in finished:
+                    index = running.pop(future)
+                    try:
+                        jobs[index] = future.result()
+                    except BrokenProcessPool:
+                        broken.append(index)
+                        continue
+                    except Exception as e:
+                        jobs[index] = _failed_batch_job(sources[index], str(e))
+                    self._finish(summary, jobs[index])
+                if broken:
+                    # Every job running on a broken pool fails with it: retry each once on a new pool
+                    broken.extend(running.values())
+                    running.clear()
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    executor = ProcessPoolExecutor(max_workers=self.concurrency)
+                    for index in sorted(broken, reverse=True):
+                        if retried[index]:
+                            jobs[index] = _failed_batch_job(sources[index], "Worker process died (out of memory?)")
+                            self._finish(summary, jobs[index])
+                        else:
+                            retried[index] = True
+                            queued.appendleft(index)
+            summary['jobs'] = jobs
+            summary['wall_time'] = time.time() - start_time
+            summary_path = os.path.join(output_dir, self.SUMMARY_NAME)
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, indent=2, ensure_ascii=False)
+            return True, summary_path, summary
+            
+        except Exception as e:
+            return False, str(e), summary
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+    
+    def _finish(self, summary: Dict, job: Dict) -> None:
+        if job['success']:
+            summary['succeeded'] += 1
+            self.merge_stats(summary['totals'], job['stats'])
+        else:
+            summary['failed'] += 1
+        if job['peak_rss_mb'] is not None:
+            self.job_memory_mb = max(self.job_memory_mb or 0, job['peak_rss_mb'])
+            summary['peak_job_rss_mb'] = self.job_memory_mb
+        if self.progress_callback is not None:
+            self.progress_callback(dict(job, done=summary['succeeded'] + summary['failed'],
+                                        total=summary['repositories']))
+
+def _run_batch_job(source_dir: str, output_file: str, export_kwargs: Dict) -> Dict:
+    """Export one repository of a batch (in a pool process) and return its job entry."""
+    _reset_peak_rss()
+    start_time = time.time()
+    success, result, stats = CodeAggregator().traverse_and_write_code(source_dir, output_file, **export_kwargs)
+    return {'source_dir': os.path.abspath(source_dir), 'success': success,
+            'output': result if success else None, 'error': None if success else result,
+            'seconds': time.time() - start_time, 'peak_rss_mb': _peak_rss_mb(), 'stats': stats}
+
+def _failed_batch_job(source_dir: str, error: str) -> Dict:
+    return {'source_dir': os.path.abspath(source_dir), 'success': False, 'output': None, 'error': error,
+            'seconds': None, 'peak_rss_mb': None, 'stats': None}
+
+def _reset_peak_rss() -> None:
+    """Reset this process's peak RSS to its current RSS (Linux only; elsewhere the peak is lifelong)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _prepare_file_block(file_path: str, rel_path: str, file_ext: str, file_size: int,
+                        include_line_numbers: bool, hash_content: bool = False, profile: bool = False) -> Dict:
+    """Read one file and render its export block.
+    
+    Module-level so it can run on a thread or process pool; returns a plain dict
+    with status 'ok', 'binary', 'undecoded' or 'error'. Files that are not UTF-8
+    come back 'undecoded' with their raw bytes for the writer to finish. UTF-8
+    files over LARGE_FILE_BYTES come back as 'stream' blocks, which the writer
+    copies into the export in chunks. With hash_content, text blocks carry a
+    'hash' of the file's bytes (see _content_hash). With profile, blocks carry
+    the file's time per stage in 'profile' (see StageTimer).
+    """
+    laps = _Laps(file_path) if profile else _NO_LAPS
+    try:
+        # Get EXACT absolute path
+        abs_path = os.path.abspath(file_path)
+        
+        if file_size > LARGE_FILE_BYTES:
+            block = _scan_large_file(abs_path, rel_path, file_ext, file_size, include_line_numbers, hash_content)
+            laps.lap('large_file_scan')
+            if block is not None:
+                return laps.done(block)
+        
+        # Single read: binary check, encoding detection and decoding share one buffer
+        with open(file_path, 'rb') as f:
+            raw_data = f.read()
+        laps.lap('read')
+        if CodeAggregator.is_binary_data(raw_data):
+            laps.lap('binary_probe')
+            return laps.done({'status': 'binary', 'size': file_size})
+        laps.lap('binary_probe')
+        
+        content_hash = _content_hash(raw_data) if hash_content else None
+        laps.lap('hash')
+        content = EncodingDetector.fast_decode(raw_data)
+        laps.lap('decode')
+        if content is None:
+            block = {'status': 'undecoded', 'raw': raw_data,
+                     'job': (file_path, rel_path, file_ext, file_size, include_line_numbers)}
+        else:
+            line_count = _count_lines(raw_data)
+            # Drop the bytes before rendering so a large file is not held three times over
+            del raw_data
+            block = _render_block(abs_path, rel_path, file_ext, file_size, content,
+                                  include_line_numbers, 'utf-8', 'fast_path', line_count)
+            laps.lap('render')
+        if content_hash is not None:
+            block['hash'] = content_hash
+        return laps.done(block)
+    except Exception as e:
+        laps.lap('error')
+        return laps.done(_error_block(file_path, e, file_size))
+
+class _Laps:
+    """Stage times of one file in a worker: lap(stage) charges the time since the previous lap."""
+    __slots__ = ('path', 'stages', '_last')
+    
+    def __init__(self, file_path: str):
+        self.path = os.path.abspath(file_path)
+        self.stages: Dict[str, float] = {}
+        self._last = time.perf_counter()
+    
+    def lap(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+    
+    def done(self, block: Dict) -> Dict:
+        block['profile'] = {'path': self.path, 'stages': self.stages}
+        return block
+
+class _NoLaps:
+    """Stand-in for _Laps when profiling is off."""
+    __slots__ = ()
+    
+    def lap(self, stage: str) -> None:
+        pass
+    
+    def done(self, block: Dict) -> Dict:
+        return block
+
+_NO_LAPS = _NoLaps()
+
+# Formats deflate cannot usefully shrink; stored in ZIPs without recompression
+STORED_EXTENSIONS = {
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.zst', '.7z', '.rar', '.jar', '.whl',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.ico', '.mp3', '.mp4', '.mov',
+    '.woff', '.woff2', '.pdf', '.docx', '.xlsx', '.pptx',
+}
+
+def _archive_name(abs_path: str, rel_dir: str) -> str:
+    """Archive member name for a file, from its directory relative to the export root."""
+    return os.path.normpath(os.path.join(rel_dir, os.path.basename(abs_path)))
+
+def _compress_zip_member(path: str, arcname: str,
+                         compression_level: int) -> Tuple[str, 'zipfile.ZipInfo', Optional[bytes]]:
+    """Read and raw-deflate one archive member; runs on the ZIP thread pool.
+    
+    Members over LARGE_FILE_BYTES come back with no data and only their
+    compress_type decided; the writer streams those from disk.
+    """
+    import zipfile
+    zinfo = zipfile.ZipInfo.from_file(path, arcname)
+    if zinfo.file_size > LARGE_FILE_BYTES:
+        deflate = compression_level > 0 and os.path.splitext(path)[1].lower() not in STORED_EXTENSIONS
+        zinfo.compress_type = zipfile.ZIP_DEFLATED if deflate else zipfile.ZIP_STORED
+        return path, zinfo, None
+    with open(path, 'rb') as f:
+        raw_data = f.read()
+    zinfo.file_size = len(raw_data)
+    zinfo.CRC = zlib.crc32(raw_data)
+    data = raw_data
+    zinfo.compress_type = zipfile.ZIP_STORED
+    if compression_level > 0 and os.path.splitext(path)[1].lower() not in STORED_EXTENSIONS:
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(raw_data) + compressor.flush()
+        if len(deflated) < len(raw_data):
+            data = deflated
+            zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.compress_size = len(data)
+    return path, zinfo, data
+
+def _write_precompressed(zipf: 'zipfile.ZipFile', zinfo: 'zipfile.ZipInfo', data: bytes) -> None:
+    """Append an already compressed member to an open ZipFile.
+    
+    Mirrors what ZipFile.open(..., 'w') does on close, but with CRC and sizes known
+    up front, so the local header is written once and no recompression happens.
+    
+    This reaches into ZipFile internals (fp, start_dir, filelist, NameToInfo),
+    checked against the zipfile module of CPython 3.8 through 3.13. Later
+    members, and close(), seek to start_dir before writing, so it must stay
+    in step; no write handle may be open (ZipFile._writing) while this runs.
+    """
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader())
+    zipf.fp.write(data)
+    zipf.start_dir = zipf.fp.tell()
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+
+def _render_block(abs_path: str, rel_path: str, file_ext: str, file_size: int, content: str,
+                  include_line_numbers: bool, encoding: str, encoding_path: str,
+                  line_count: Optional[int] = None) -> Dict:
+    """Render decoded content into an export block dict with status 'ok'.
+    
+    line_count may be passed in when already known (see _count_lines).
+    """
+    # Calculate line count
+    if line_count is None:
+        line_count = content.count('\n') + 1 if content else 0
+    file_type = COMPLETE_EXTENSIONS.get(file_ext, 'Unknown')
+    
+    # Block with EXACT path; numbered content is produced in chunks straight into the join
+    header = _block_header(abs_path, rel_path, file_type, file_size, line_count)
+    body = _numbered_chunks(content) if include_line_numbers else (content,)
+    text = ''.join(itertools.chain((header,), body, (BLOCK_FOOTER,)))
+    return {'status': 'ok', 'text': text, 'path': abs_path, 'arcname': _archive_name(abs_path, rel_path), 'type': file_type,
+            'lines': line_count, 'size': file_size, 'encoding': encoding, 'encoding_path': encoding_path}
+
+BLOCK_FOOTER = "\n\n" + "=" * 100 + "\n\n"
+
+def _block_header(abs_path: str, rel_path: str, file_type: str, file_size: int, line_count: int) -> str:
+    return (f"// FILE: {abs_path}\n"
+            f"// RELATIVE: {rel_path}\n"
+            f"// TYPE: {file_type} | SIZE: {file_size:,} bytes | LINES: {line_count:,}\n"
+            + "=" * 100 + "\n\n")
+
+# Lines numbered per %-format call: one C-level format per batch instead of an f-string per line
+_NUMBER_BATCH = 1024
+_NUMBER_FORMAT = '%4d | %s\n' * _NUMBER_BATCH
+
+def _format_numbered(lines: List[str], number: int, final: bool):
+    """Yield lines prefixed from `number` on, each ending in a newline except the last when final."""
+    for first in range(0, len(lines), _NUMBER_BATCH):
+        batch = lines[first:first + _NUMBER_BATCH]
+        fmt = _NUMBER_FORMAT if len(batch) == _NUMBER_BATCH else '%4d | %s\n' * len(batch)
+        if final and first + _NUMBER_BATCH >= len(lines):
+            fmt = fmt[:-1]  # The final line has no newline of its own
+        yield fmt % tuple(itertools.chain.from_iterable(zip(range(number, number + len(batch)), batch)))
+        number += len(batch)
+
+def _numbered_chunks(content: str, chunk_chars: int = 1024 * 1024):
+    """Yield content with "NNNN | " line prefixes, a batch of lines at a time.
+    
+    Same output as joining f"{i:4d} | {line}" over content.split('\n'), but only
+    one ~chunk_chars slice is split into lines at once.
+    """
+    number, start, length = 1, 0, len(content)
+    while True:
+        cut = content.find('\n', start + chunk_chars) if start + chunk_chars < length else -1
+        last_chunk = cut == -1
+        lines = content[start:length if last_chunk else cut].split('\n')
+        yield from _format_numbered(lines, number, last_chunk)
+        if last_chunk:
+            return
+        number += len(lines)
+        start = cut + 1
+
+def _numbered_stream(chunks):
+    """Like _numbered_chunks, for text arriving as chunks cut anywhere (see _iter_text_chunks)."""
+    number, carry = 1, ''
+    for chunk in chunks:
+        text = carry + chunk
+        cut = text.rfind('\n')
+        if cut == -1:
+            carry = text
+            continue
+        lines = text[:cut].split('\n')
+        carry = text[cut + 1:]
+        yield from _format_numbered(lines, number, False)
+        number += len(lines)
+    yield from _format_numbered(carry.split('\n'), number, True)
+
+def _numbered_prefix_chars(line_count: int) -> int:
+    """Characters added by numbering line_count lines: "%4d | " is 7 wide, plus digits beyond four."""
+    total = 7 * line_count
+    digits = 5
+    while line_count >= 10 ** (digits - 1):
+        total += (min(line_count, 10 ** digits - 1) - 10 ** (digits - 1) + 1) * (digits - 4)
+        digits += 1
+    return total
+
+# Files above this size are streamed: the worker only scans them, the writer copies them in chunks
+LARGE_FILE_BYTES = 8 * 1024 * 1024
+_STREAM_CHUNK_BYTES = 1024 * 1024
+
+def _iter_text_chunks(path: str, hasher=None):
+    """Decode a UTF-8 file chunk by chunk, with fast_decode's BOM handling and newline translation.
+    
+    Raises UnicodeDecodeError for invalid UTF-8 and ValueError for binary data
+    (a null byte in the first 1KB). `hasher`, if given, is updated with the raw bytes.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')('strict')
+    pending_cr = ''  # A trailing CR waits for the next chunk in case it starts a CRLF
+    with open(path, 'rb') as f:
+        # The first read covers the 1KB that is_binary_data inspects
+        raw_data = f.read(max(_STREAM_CHUNK_BYTES, 1024))
+        if CodeAggregator.is_binary_data(raw_data):
+            raise ValueError("binary data")
+        while True:
+            if hasher is not None and raw_data:
+                hasher.update(raw_data)
+            final = not raw_data
+            text = pending_cr + decoder.decode(raw_data, final)
+            pending_cr = ''
+            if not final and text.endswith('\r'):
+                text, pending_cr = text[:-1], '\r'
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
+            if text:
+                yield text
+            if final:
+                return
+            raw_data = f.read(_STREAM_CHUNK_BYTES)
+
+def _scan_large_file(abs_path: str, rel_path: str, file_ext: str, file_size: int,
+                     include_line_numbers: bool, hash_content: bool) -> Optional[Dict]:
+    """First pass over a large file: validate UTF-8 and measure it without keeping it in memory.
+    
+    Returns a 'binary' block, a 'stream' block (header rendered, exact text size known;
+    the writer reads the content again, see CodeAggregator._stream_block), or None when
+    the file is not UTF-8 and needs the whole-file path with encoding detection.
+    """
+    hasher = _new_hasher() if hash_content else None
+    chars = content_bytes = newlines = 0
+    try:
+        for text in _iter_text_chunks(abs_path, hasher):
+            chars += len(text)
+            content_bytes += _utf8_length(text)
+            newlines += text.count('\n')
+    except UnicodeDecodeError:
+        return None
+    except ValueError:
+        return {'status': 'binary', 'size': file_size}
+    
+    line_count = newlines + 1 if chars else 0
+    file_type = COMPLETE_EXTENSIONS.get(file_ext, 'Unknown')
+    header = _block_header(abs_path, rel_path, file_type, file_size, line_count)
+    prefix_chars = _numbered_prefix_chars(newlines + 1) if include_line_numbers else 0
+    block = {'status': 'stream', 'header': header, 'path': abs_path, 'arcname': _archive_name(abs_path, rel_path),
+             'type': file_type, 'lines': line_count, 'size': file_size, 'encoding': 'utf-8',
+             'encoding_path': 'fast_path', 'numbered': include_line_numbers,
+             'text_chars': len(header) + chars + prefix_chars + len(BLOCK_FOOTER),
+             'text_bytes': _utf8_length(header) + content_bytes + prefix_chars + len(BLOCK_FOOTER)}
+    if hasher is not None:
+        block['hash'] = _hash_prefix() + hasher.hexdigest()
+    return block
+
+def _count_lines(raw_data: bytes) -> int:
+    """Line count of UTF-8 bytes as fast_decode sees them (CRLF and lone CR end lines too).
+    
+    Counting on bytes is safe for UTF-8: CR and LF never occur inside multi-byte sequences.
+    """
+    if not raw_data or raw_data == b'\xef\xbb\xbf':
+        return 0
+    return raw_data.count(b'\n') + raw_data.count(b'\r') - raw_data.count(b'\r\n') + 1
+
+def _write_text(txt_file, text: str, chunk_chars: int = 1024 * 1024) -> None:
+    """Write text in slices, so the file's encoder never builds one encoded copy of a huge block."""
+    if len(text) <= chunk_chars:
+        txt_file.write(text)
+        return
+    for start in range(0, len(text), chunk_chars):
+        txt_file.write(text[start:start + chunk_chars])
+
+def _duplicate_block(block: Dict, first_path: str) -> Dict:
+    """Replace a block's content with a reference to the first file exported with the same bytes.
+    
+    Keeps the FILE / RELATIVE / TYPE header lines, so parsers see the usual block shape.
+    """
+    text = block['text'] if 'text' in block else block['header']
+    header_end = text.index('\n', text.index('\n', text.index('\n') + 1) + 1) + 1
+    return dict(block, status='ok', text=f"{text[:header_end]}// DUPLICATE OF: {first_path}\n" + "=" * 100 + "\n\n")
+
+@functools.lru_cache(maxsize=None)
+def _hash_algorithm() -> Tuple[str, Callable]:
+    try:
+        import xxhash  # From requirements.txt; several times faster than BLAKE2, which stays the fallback
+        return 'xxh3:', xxhash.xxh3_128
+    except ImportError:
+        return 'b2:', functools.partial(hashlib.blake2b, digest_size=16)
+
+def _hash_prefix() -> str:
+    return _hash_algorithm()[0]
+
+def _new_hasher(data: bytes = b''):
+    return _hash_algorithm()[1](data)
+
+def _content_hash(raw_data: bytes) -> str:
+    """128-bit content hash: xxh3 if the `xxhash` package is installed, else BLAKE2b.
+    
+    Prefixed with the algorithm so hashes from different environments never compare equal.
+    """
+    return _hash_prefix() + _new_hasher(raw_data).hexdigest()
+
+def _utf8_length(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode('utf-8'))
+
+def _error_block(file_path: str, error: Exception, file_size: int = 0) -> Dict:
+    """Render the inline error marker written for files that could not be read."""
+    error_msg = f"// Error reading {file_path}: {str(error)[:200]}\n"
+    return {'status': 'error', 'text': error_msg + "=" * 100 + "\n\n", 'size': file_size}
+
+def _skip_written(candidates, position: int, last_path: Optional[str]):
+    """Drop the first `position` candidates, already in a resumed export; the last must be last_path."""
+    candidates = iter(candidates)
+    skipped = None
+    for skipped in itertools.islice(candidates, position):
+        pass
+    if position and (skipped is None or skipped[0] != last_path):
+        raise ValueError("The source tree changed since the checkpoint; start a new export")
+    yield from candidates
+
+def _ordered_map(executor: Executor, fn, jobs, window: int):
+    """Like executor.map over argument tuples, but with at most `window` jobs in flight.
+    
+    Results are yielded in submission order, so the writer sees files in walk order.
+    """
+    pending = deque()
+    for job in jobs:
+        if isinstance(job, dict):
+            # Already prepared (e.g. a cache hit): keep its place in the order
+            future = Future()
+            future.set_result(job)
+            pending.append(future)
+        else:
+            pending.append(executor.submit(fn, *job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
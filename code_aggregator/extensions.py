@@ -0,0 +1,139 @@
+"""File extension tables shared by the engine, the CLI and the Streamlit app."""
+
+# COMPLETE LIST OF FILE EXTENSIONS (Enhanced)
+COMPLETE_EXTENSIONS = {
+    # Programming Languages
+    '.py': 'Python', '.pyw': 'Python Window', '.pyx': 'Cython', '.pyi': 'Python Stub',
+    '.js': 'JavaScript', '.jsx': 'React JSX', '.ts': 'TypeScript', '.tsx': 'React TSX',
+    '.java': 'Java', '.class': 'Java Class', '.jar': 'Java Archive',
+    '.cpp': 'C++', '.cxx': 'C++', '.cc': 'C++', '.c': 'C', '.h': 'C Header',
+    '.hpp': 'C++ Header', '.hxx': 'C++ Header', '.cs': 'C#', '.vb': 'VB.NET',
+    '.fs': 'F#', '.fsx': 'F# Script', '.go': 'Go', '.rs': 'Rust', '.rb': 'Ruby',
+    '.rbw': 'Ruby Window', '.rake': 'Ruby Rake', '.php': 'PHP', '.php3': 'PHP',
+    '.php4': 'PHP', '.php5': 'PHP', '.phtml': 'PHP HTML', '.pl': 'Perl',
+    '.pm': 'Perl Module', '.t': 'Perl Test', '.pod': 'Perl POD', '.swift': 'Swift',
+    '.kt': 'Kotlin', '.kts': 'Kotlin Script', '.scala': 'Scala', '.sc': 'Scala Script',
+    '.groovy': 'Groovy', '.gvy': 'Groovy', '.gy': 'Groovy', '.gsh': 'Groovy Shell',
+    '.clj': 'Clojure', '.cljs': 'ClojureScript', '.cljc': 'Clojure Common',
+    '.lua': 'Lua', '.r': 'R', '.R': 'R', '.rdata': 'R Data', '.rds': 'R Data',
+    '.m': 'Objective-C/Matlab', '.mm': 'Objective-C++', '.f': 'Fortran',
+    '.f90': 'Fortran 90', '.f95': 'Fortran 95', '.f03': 'Fortran 2003',
+    '.pas': 'Pascal', '.pp': 'Pascal', '.d': 'D', '.dart': 'Dart',
+    '.elm': 'Elm', '.erl': 'Erlang', '.hrl': 'Erlang Header', '.ex': 'Elixir',
+    '.exs': 'Elixir Script', '.hs': 'Haskell', '.lhs': 'Literate Haskell',
+    '.ml': 'OCaml', '.mli': 'OCaml Interface', '.fsi': 'F# Signature',
+    '.fsx': 'F# Script', '.v': 'Verilog', '.vh': 'Verilog Header',
+    '.sv': 'SystemVerilog', '.svh': 'SystemVerilog Header', '.vhd': 'VHDL',
+    
+    # Web Technologies
+    '.html': 'HTML', '.htm': 'HTML', '.xhtml': 'XHTML', '.html5': 'HTML5',
+    '.css': 'CSS', '.scss': 'SASS', '.sass': 'SASS', '.less': 'LESS',
+    '.styl': 'Stylus', '.vue': 'Vue.js', '.svelte': 'Svelte', '.astro': 'Astro',
+    '.php': 'PHP', '.asp': 'ASP', '.aspx': 'ASP.NET', '.jsp': 'JavaServer Pages',
+    '.jspx': 'JavaServer Pages XML', '.wasm': 'WebAssembly',
+    
+    # Configuration Files
+    '.json': 'JSON', '.jsonc': 'JSON with Comments', '.json5': 'JSON5',
+    '.jsonld': 'JSON-LD', '.xml': 'XML', '.xml.dist': 'XML Distribution',
+    '.xsl': 'XSLT', '.xslt': 'XSLT', '.xsd': 'XML Schema', '.dtd': 'DTD',
+    '.yaml': 'YAML', '.yml': 'YAML', '.yaml.dist': 'YAML Distribution',
+    '.toml': 'TOML', '.ini': 'INI', '.cfg': 'Config', '.conf': 'Config',
+    '.properties': 'Properties', '.env': 'Environment', '.env.example': 'Env Example',
+    '.editorconfig': 'Editor Config', '.prettierrc': 'Prettier', '.eslintrc': 'ESLint',
+    '.babelrc': 'Babel', '.npmrc': 'NPM', '.yarnrc': 'Yarn', '.pnp.cjs': 'Plug n Play',
+    
+    # Shell Scripts
+    '.sh': 'Shell', '.bash': 'Bash', '.zsh': 'Zsh', '.fish': 'Fish',
+    '.ps1': 'PowerShell', '.psm1': 'PowerShell Module', '.psd1': 'PowerShell Data',
+    '.ps1xml': 'PowerShell XML', '.bat': 'Batch', '.cmd': 'Command',
+    '.vbs': 'VBScript', '.vbe': 'VBScript Encoded', '.wsf': 'Windows Script',
+    '.wsh': 'Windows Script Host', '.awk': 'AWK', '.sed': 'SED',
+    
+    # Database
+    '.sql': 'SQL', '.psql': 'PostgreSQL', '.ddl': 'DDL', '.dml': 'DML',
+    '.sqlite': 'SQLite', '.db': 'Database', '.sqlitedb': 'SQLite DB',
+    '.mdb': 'Access DB', '.frm': 'MySQL Format', '.myi': 'MySQL Index',
+    '.myd': 'MySQL Data', '.ibd': 'InnoDB Data',
+    
+    # Documentation
+    '.md': 'Markdown', '.markdown': 'Markdown', '.mdown': 'Markdown',
+    '.mdwn': 'Markdown', '.mkd': 'Markdown', '.mkdn': 'Markdown',
+    '.rst': 'reStructuredText', '.tex': 'LaTeX', '.ltx': 'LaTeX',
+    '.aux': 'LaTeX Aux', '.bib': 'BibTeX', '.txt': 'Text', '.rtf': 'Rich Text',
+    '.doc': 'Word', '.docx': 'Word', '.odt': 'OpenDocument Text',
+    
+    # Build & Package Managers
+    '.dockerfile': 'Dockerfile', 'Dockerfile': 'Dockerfile',
+    '.makefile': 'Makefile', 'Makefile': 'Makefile', 'makefile': 'Makefile',
+    '.gradle': 'Gradle', '.gradle.kts': 'Gradle Kotlin', '.pom': 'Maven POM',
+    '.xml': 'Maven POM', '.cmake': 'CMake', '.bazel': 'Bazel', '.bzl': 'Bazel',
+    '.bazelrc': 'Bazel Config', '.buckconfig': 'Buck Config',
+    
+    # IDE & Editor
+    '.vscode': 'VS Code', '.code-workspace': 'VS Code Workspace',
+    '.idea': 'IntelliJ IDEA', '.iml': 'IntelliJ Module',
+    '.sln': 'Visual Studio', '.csproj': 'C# Project', '.vcxproj': 'C++ Project',
+    '.fsproj': 'F# Project', '.vbproj': 'VB Project', '.xproj': '.NET Core Project',
+    
+    # Data & Serialization
+    '.csv': 'CSV', '.tsv': 'TSV', '.xlsx': 'Excel', '.xls': 'Excel',
+    '.parquet': 'Parquet', '.feather': 'Feather', '.arrow': 'Arrow',
+    '.h5': 'HDF5', '.hdf5': 'HDF5', '.nc': 'NetCDF', '.zarr': 'Zarr',
+    '.avro': 'Avro', '.orc': 'ORC', '.pkl': 'Pickle', '.pickle': 'Pickle',
+    '.joblib': 'Joblib', '.npy': 'NumPy Array', '.npz': 'NumPy Zipped',
+    
+    # Web Assets
+    '.svg': 'SVG', '.svgz': 'SVG', '.ai': 'Illustrator', '.eps': 'EPS',
+    '.ps': 'PostScript', '.psd': 'Photoshop', '.xcf': 'GIMP',
+    '.sketch': 'Sketch', '.fig': 'Figma',
+    
+    # Fonts
+    '.ttf': 'TrueType', '.otf': 'OpenType', '.woff': 'Web Open Font',
+    '.woff2': 'Web Open Font 2', '.eot': 'Embedded OpenType',
+    
+    # Executables & Libraries
+    '.exe': 'Executable', '.dll': 'Dynamic Library', '.so': 'Shared Object',
+    '.dylib': 'Dynamic Library', '.lib': 'Static Library', '.a': 'Static Archive',
+    '.o': 'Object File', '.obj': 'Object File', '.class': 'Java Class',
+    
+    # Archives
+    '.zip': 'ZIP Archive', '.tar': 'TAR Archive', '.gz': 'GZIP Archive',
+    '.tgz': 'GZIP TAR', '.bz2': 'BZIP2 Archive', '.xz': 'XZ Archive',
+    '.rar': 'RAR Archive', '.7z': '7-Zip Archive', '.zst': 'Zstandard',
+    
+    # Version Control
+    '.gitignore': 'Git Ignore', '.gitattributes': 'Git Attributes',
+    '.gitmodules': 'Git Modules', '.gitkeep': 'Git Keep',
+    '.svn': 'SVN', '.hgignore': 'Mercurial Ignore', '.hg': 'Mercurial',
+    
+    # CI/CD
+    '.travis.yml': 'Travis CI', '.circleci': 'CircleCI', '.gitlab-ci.yml': 'GitLab CI',
+    '.jenkinsfile': 'Jenkins', '.drone.yml': 'Drone CI', '.github': 'GitHub Actions',
+    '.azure-pipelines.yml': 'Azure Pipelines', '.codefresh.yml': 'Codefresh',
+    
+    # Logs & Outputs
+    '.log': 'Log', '.out': 'Output', '.err': 'Error', '.debug': 'Debug',
+    '.trace': 'Trace', '.dump': 'Dump',
+    
+    # Temporary
+    '.tmp': 'Temporary', '.temp': 'Temporary', '.bak': 'Backup',
+    '.backup': 'Backup', '.old': 'Old', '.orig': 'Original',
+    
+    # Misc
+    '.lock': 'Lock', '.pid': 'PID', '.socket': 'Socket',
+    '.key': 'Key', '.pem': 'PEM', '.crt': 'Certificate', '.csr': 'CSR',
+}
+
+# Sidebar file-type categories; the CLI's --category option (repeatable) uses the same names
+EXTENSION_CATEGORIES = {
+    "Programming": ['.py', '.js', '.java', '.cpp', '.c', '.go', '.rs', '.rb', '.php', '.cs', '.swift', '.kt'],
+    "Web": ['.html', '.css', '.jsx', '.tsx', '.vue', '.svelte', '.scss', '.less'],
+    "Config": ['.json', '.yaml', '.toml', '.ini', '.xml', '.env'],
+    "Scripts": ['.sh', '.bash', '.ps1', '.bat', '.cmd', '.vbs'],
+    "Data": ['.csv', '.sql', '.parquet', '.json', '.xml'],
+    "Docs": ['.md', '.txt', '.rst', '.tex']
+}
+
+# Folders always excluded from an aggregation, on top of the user's selection
+DEFAULT_EXCLUDED_DIRS = ['.git', '__pycache__', 'node_modules', '.venv', 'venv',
+                         'env', 'dist', 'build', '.idea', '.vscode', '.DS_Store']
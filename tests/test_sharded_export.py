@@ -0,0 +1,59 @@
+"""Shard manifests must account for every exported file, streamed ones included."""
+import json
+import os
+import tempfile
+import unittest
+
+from code_aggregator import LARGE_FILE_BYTES, CodeAggregator
+
+class ShardedStreamedManifestTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'src')
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, 'small.py'), 'w') as f:
+            f.write("print('hello')\n" * 10)
+        # UTF-8 and over LARGE_FILE_BYTES, so it is streamed rather than rendered in memory
+        self.big_lines = LARGE_FILE_BYTES // 20 + 1
+        with open(os.path.join(self.source, 'fixture.sql'), 'w') as f:
+            for i in range(self.big_lines):
+                f.write(f"INSERT INTO t VALUES ({i:012d});\n")
+    
+    def tearDown(self):
+        self.tmp.cleanup()
+    
+    def export(self, shard_max_bytes):
+        output = os.path.join(self.tmp.name, 'export.txt')
+        success, manifest_path, stats = CodeAggregator().traverse_and_write_code(
+            self.source, output, max_file_size_mb=100, shard_max_bytes=shard_max_bytes)
+        self.assertTrue(success, manifest_path)
+        self.assertEqual(stats['streamed_files'], 1)
+        with open(manifest_path, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def assert_consistent(self, manifest):
+        shards = manifest['shards']
+        self.assertEqual(manifest['files_exported'], 2)
+        self.assertEqual(sum(shard['file_count'] for shard in shards), manifest['files_exported'])
+        self.assertEqual(sum(shard['lines'] for shard in shards), manifest['total_lines'])
+        self.assertEqual({name for shard in shards for name in shard['files']}, {'fixture.sql', 'small.py'})
+    
+    def test_streamed_file_within_one_shard(self):
+        manifest = self.export(shard_max_bytes=4 * LARGE_FILE_BYTES)
+        self.assertEqual(len(manifest['shards']), 1)
+        self.assert_consistent(manifest)
+        self.assertEqual(manifest['shards'][0]['file_count'], 2)
+        self.assertEqual(manifest['shards'][0]['continued_files'], [])
+    
+    def test_streamed_file_cut_across_shards(self):
+        manifest = self.export(shard_max_bytes=LARGE_FILE_BYTES // 2)
+        self.assertGreater(len(manifest['shards']), 2)
+        self.assert_consistent(manifest)
+        owner = [shard for shard in manifest['shards'] if 'fixture.sql' in shard['files']][0]
+        self.assertGreaterEqual(owner['lines'], self.big_lines)
+        later = manifest['shards'][manifest['shards'].index(owner) + 1:]
+        self.assertTrue(later and all(shard['continued_files'] == ['fixture.sql'] for shard in later))
+
+if __name__ == '__main__':
+    unittest.main()